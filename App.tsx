@@ -39,10 +39,20 @@ import {
   CormorantGaramond_600SemiBold,
 } from '@expo-google-fonts/cormorant-garamond';
 
-import { calcMoonDays, calcMoonMonth, LunarDay } from './src/domain/moon/lunar';
+import { calcMoonDays, calcMoonMonth, LunarDay, moonPhaseRange } from './src/domain/moon/lunar';
 import { calcMoonInfo } from './src/domain/moon/moonInfo';
-import { calcMoonZodiac } from './src/domain/zodiac/zodiac';
-import { AppLocale, City, getAllCities, getMoonDayInfo, getZodiacInfo } from './src/data/content';
+import { calcMoonZodiac, moonSignRange } from './src/domain/zodiac/zodiac';
+import {
+  AppLocale,
+  City,
+  citySearchKey,
+  getAllCities,
+  getMoonDayInfo,
+  getMoonPhases,
+  getMoonSigns,
+  getZodiacInfo,
+  searchCities,
+} from './src/data/content';
 import { NoteRecord } from './src/notes/notesRepository';
 import { useNotes } from './src/notes/useNotes';
 import {
@@ -457,7 +467,9 @@ const resolveMoonData = async (
   const sunIllum = suncalc.getMoonIllumination(midDay);
   const moonInfo = calcMoonInfo(moonDay);
 
-  const zodiac = calcMoonZodiac(moonDays, moonDay.number);
+  const signRange = moonSignRange([moonDay]);
+  const signs = await getMoonSigns(signRange.from, signRange.to);
+  const zodiac = calcMoonZodiac(moonDays, moonDay.number, signs);
   const zodiacInfo = await getZodiacInfo(zodiac, locale);
 
   const dayInfo = await getMoonDayInfo(moonDay.number, locale, zodiac);
@@ -493,6 +505,8 @@ function AppContent() {
   const [city, setCity] = useState<City | null>(null);
   const [cities, setCities] = useState<City[]>([]);
   const [cityQuery, setCityQuery] = useState('');
+  // searchCities results, tagged with the search key and locale they answer.
+  const [cityMatches, setCityMatches] = useState<{ key: string; locale: AppLocale; matches: City[] } | null>(null);
   const [cityPickerVisible, setCityPickerVisible] = useState(false);
   const [cityLoading, setCityLoading] = useState(true);
   const [loading, setLoading] = useState(true);
@@ -826,54 +840,62 @@ function AppContent() {
     setLoading(true);
     setError(null);
 
-    const location = city ?? fallbackCity;
-    const nowMs = Date.now();
-    const moonDaysForDate = sortMoonDays(calcMoonDays(selectedDate, location.latitude, location.longitude, timezone));
-
-    if (moonDaysForDate.length === 0) {
-      setMoonDayOptions([]);
-      setSelectedMoonDay(null);
-      setError('No lunar day data available.');
-      setLoading(false);
-      return () => {
-        active = false;
-      };
-    }
+    const loadMoonDay = async () => {
+      const location = city ?? fallbackCity;
+      const nowMs = Date.now();
+      const range = moonPhaseRange(selectedDate, timezone, false);
+      const phases = await getMoonPhases(range.from, range.to);
+      if (!active) return;
+      const moonDaysForDate = sortMoonDays(
+        calcMoonDays(selectedDate, location.latitude, location.longitude, timezone, phases)
+      );
+
+      if (moonDaysForDate.length === 0) {
+        setMoonDayOptions([]);
+        setSelectedMoonDay(null);
+        setError('No lunar day data available.');
+        setLoading(false);
+        return;
+      }
 
-    const isToday = isSameDayInTz(new Date(nowMs), selectedDate, timezone);
-    const activeMoonDay = isToday ? pickActiveMoonDay(moonDaysForDate, nowMs) : moonDaysForDate[0];
-    const inOptions =
-      selectedMoonDay && moonDaysForDate.some((day) => isSameMoonDay(day, selectedMoonDay));
-    const shouldAutoSelect = !selectedMoonDay || !isManualMoonDaySelection || !inOptions;
-    const effectiveMoonDay = shouldAutoSelect ? activeMoonDay : selectedMoonDay;
+      const isToday = isSameDayInTz(new Date(nowMs), selectedDate, timezone);
+      const activeMoonDay = isToday ? pickActiveMoonDay(moonDaysForDate, nowMs) : moonDaysForDate[0];
+      const inOptions =
+        selectedMoonDay && moonDaysForDate.some((day) => isSameMoonDay(day, selectedMoonDay));
+      const shouldAutoSelect = !selectedMoonDay || !isManualMoonDaySelection || !inOptions;
+      const effectiveMoonDay = shouldAutoSelect ? activeMoonDay : selectedMoonDay;
 
-    if (active) {
       setMoonDayOptions(moonDaysForDate);
       if (shouldAutoSelect && effectiveMoonDay && !isSameMoonDay(effectiveMoonDay, selectedMoonDay)) {
         setSelectedMoonDay(effectiveMoonDay);
         setIsManualMoonDaySelection(false);
       }
-    }
 
-    if (!effectiveMoonDay) {
-      setError('No lunar day data available.');
+      if (!effectiveMoonDay) {
+        setError('No lunar day data available.');
+        setLoading(false);
+        return;
+      }
+
+      const data = await resolveMoonData(
+        selectedDate,
+        location,
+        locale,
+        strings,
+        timezone,
+        effectiveMoonDay,
+        moonDaysForDate
+      );
+      if (!active) return;
+      setMoonData(data);
       setLoading(false);
-      return () => {
-        active = false;
-      };
-    }
+    };
 
-    resolveMoonData(selectedDate, location, locale, strings, timezone, effectiveMoonDay, moonDaysForDate)
-      .then((data) => {
-        if (!active) return;
-        setMoonData(data);
-        setLoading(false);
-      })
-      .catch((err: Error) => {
-        if (!active) return;
-        setError(err.message ?? 'Unable to load moon data.');
-        setLoading(false);
-      });
+    loadMoonDay().catch((err: Error) => {
+      if (!active) return;
+      setError(err.message ?? 'Unable to load moon data.');
+      setLoading(false);
+    });
 
     return () => {
       active = false;
@@ -918,14 +940,20 @@ function AppContent() {
     const loadCalendar = async () => {
       setCalendarLoading(true);
       const location = city ?? fallbackCity;
-      const monthData = calcMoonMonth(calendarMonth, location.latitude, location.longitude, timezone);
+      const range = moonPhaseRange(calendarMonth, timezone, true);
+      const phases = await getMoonPhases(range.from, range.to);
+      if (!active) return;
+      const monthData = calcMoonMonth(calendarMonth, location.latitude, location.longitude, timezone, phases);
+      const signRange = moonSignRange(monthData.flat());
+      const signs = await getMoonSigns(signRange.from, signRange.to);
+      if (!active) return;
       const dayMap: Record<number, CalendarDayData> = {};
 
       for (let i = 0; i < monthData.length; i += 1) {
         const lunarDays = monthData[i];
         if (!lunarDays || lunarDays.length === 0) continue;
         const uniqueNumbers = Array.from(new Set(lunarDays.map((day) => day.number))).sort((a, b) => a - b);
-        const zodiac = calcMoonZodiac(lunarDays);
+        const zodiac = calcMoonZodiac(lunarDays, undefined, signs);
         const midDay = moment.tz(calendarMonth, timezone)
           .date(i + 1)
           .hour(12)
@@ -956,11 +984,28 @@ function AppContent() {
     };
   }, [activeTab, calendarMonth, city, timezone]);
 
+  useEffect(() => {
+    const key = citySearchKey(cityQuery);
+    if (!key) return;
+    let active = true;
+    searchCities(cityQuery, locale).then((matches) => {
+      if (active) setCityMatches({ key, locale, matches });
+    });
+    return () => {
+      active = false;
+    };
+  }, [cityQuery, locale]);
+
   const filteredCities = useMemo(() => {
-    if (!cityQuery) return cities;
-    const query = cityQuery.trim().toLowerCase();
-    return cities.filter((item) => item.name.toLowerCase().includes(query));
-  }, [cityQuery, cities]);
+    const query = citySearchKey(cityQuery);
+    if (!query) return cities;
+    const customMatches = customCities.filter((item) => citySearchKey(item.name).includes(query));
+    // Until searchCities answers this query, show no database matches rather than the previous query's.
+    const current = cityMatches && cityMatches.key === query && cityMatches.locale === locale ? cityMatches.matches : [];
+    // Drop database matches that a custom city replaces, as mergeCities does for the full list.
+    const baseMatches = mergeCities(customCities, current).slice(customCities.length);
+    return [...mergeCities(customMatches, []), ...baseMatches];
+  }, [cityQuery, cities, customCities, cityMatches, locale]);
 
   const formattedDate = useMemo(() => dateFormatter.format(selectedDate), [dateFormatter, selectedDate]);
   const selectedCityName = city?.name ?? fallbackCity.name;
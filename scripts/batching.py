@@ -0,0 +1,131 @@
+"""Token-budget request packing shared by the translate scripts.
+
+- Token counts are estimated from text length: CJK characters count as one
+  token each, other non-ASCII (e.g. Cyrillic) as half a token, ASCII as a
+  quarter. That is close enough to fill a budget without a tokenizer.
+- Items are packed greedily in input order, so responses can be matched back
+  by key and results still come out in source order.
+- A group (e.g. one moon-day row) stays in one request when it fits the
+  budget and is split into field chunks when it does not.
+- A batch whose response is unparsable or miscounted is bisected and retried,
+  so one bad item no longer aborts the whole run.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Hashable, Sequence, TypeVar
+
+T = TypeVar("T")
+K = TypeVar("K", bound=Hashable)
+R = TypeVar("R")
+
+# JSON keys, quotes and separators around every packed item.
+ITEM_OVERHEAD_TOKENS = 8
+
+
+def estimate_tokens(text: str) -> int:
+    ascii_chars = 0
+    cjk_chars = 0
+    other_chars = 0
+    for ch in text:
+        code = ord(ch)
+        if code < 0x80:
+            ascii_chars += 1
+        elif 0x3000 <= code <= 0x9FFF or 0xF900 <= code <= 0xFAFF or 0xFF00 <= code <= 0xFFEF:
+            cjk_chars += 1
+        else:
+            other_chars += 1
+    return cjk_chars + (other_chars + 1) // 2 + (ascii_chars + 3) // 4
+
+
+def item_tokens(text: str) -> int:
+    return estimate_tokens(text) + ITEM_OVERHEAD_TOKENS
+
+
+def pack_by_budget(
+    items: Sequence[T],
+    cost: Callable[[T], int],
+    budget: int,
+    max_items: int | None = None,
+) -> list[list[T]]:
+    """Split `items` into consecutive batches whose total cost stays within `budget`.
+
+    Zero-cost items (e.g. cache hits) ride along without counting toward
+    either limit. An item costing more than the budget gets a batch of its own.
+    """
+    batches: list[list[T]] = []
+    current: list[T] = []
+    current_cost = 0
+    current_count = 0
+    for item in items:
+        item_cost = cost(item)
+        if item_cost and current_count and (
+            current_cost + item_cost > budget or (max_items is not None and current_count >= max_items)
+        ):
+            batches.append(current)
+            current, current_cost, current_count = [], 0, 0
+        current.append(item)
+        if item_cost:
+            current_cost += item_cost
+            current_count += 1
+    if current:
+        batches.append(current)
+    return batches
+
+
+def pack_groups(groups: Sequence[Sequence[tuple[K, str]]], budget: int) -> list[list[tuple[K, str]]]:
+    """Pack keyed texts so each group lands in one request unless it alone exceeds `budget`."""
+
+    def text_cost(item: tuple[K, str]) -> int:
+        return item_tokens(item[1])
+
+    units: list[list[tuple[K, str]]] = []
+    for group in groups:
+        if not group:
+            continue
+        if sum(text_cost(item) for item in group) <= budget:
+            units.append(list(group))
+        else:
+            units.extend(pack_by_budget(group, text_cost, budget))
+
+    batches: list[list[tuple[K, str]]] = []
+    for unit_batch in pack_by_budget(units, lambda unit: sum(text_cost(item) for item in unit), budget):
+        batches.append([item for unit in unit_batch for item in unit])
+    return batches
+
+
+class BatchResponseError(ValueError):
+    """A response that does not line up with the batch that was sent."""
+
+
+def bisect_batch(
+    batch: Sequence[T],
+    attempt: Callable[[list[T]], list[R]],
+    on_failure: Callable[[T, Exception], R],
+    leaf_retries: int = 1,
+) -> list[R]:
+    """Run `attempt` on `batch`, halving it on bad responses until only the bad items remain.
+
+    Results come back in batch order. An item that still fails on its own
+    after `leaf_retries` extra tries is handed to `on_failure`, whose return
+    value stands in for its result.
+    """
+    items = list(batch)
+    tries = 1 + (leaf_retries if len(items) == 1 else 0)
+    error: Exception | None = None
+    for _ in range(tries):
+        try:
+            results = attempt(items)
+            if len(results) != len(items):
+                raise BatchResponseError(f"Translation count mismatch. Expected {len(items)} got {len(results)}")
+            return results
+        except ValueError as exc:
+            error = exc
+
+    assert error is not None
+    if len(items) == 1:
+        return [on_failure(items[0], error)]
+    mid = len(items) // 2
+    return bisect_batch(items[:mid], attempt, on_failure, leaf_retries) + bisect_batch(
+        items[mid:], attempt, on_failure, leaf_retries
+    )
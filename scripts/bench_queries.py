@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Replay the app's read queries against a built DB and gate on regressions.
+
+- Runs the SQL from src/data/content.ts (getCityByName, getMoonDayInfo with
+  and without the zodiac garden join, getAllCities, searchCities,
+  getZodiacInfo) for every locale with real parameters taken from the DB,
+  plus getMoonPhases and getMoonSigns over a month window for each month of
+  2020-2030.
+- Reports p50/p99 latency, SQLite VM steps per call (a deterministic proxy
+  for rows scanned) and the EXPLAIN QUERY PLAN of each query shape.
+- Fails when a point lookup plans a full scan, or when steps or p50 latency
+  exceed the stored baseline by more than the allowed tolerance.
+
+Example:
+  python scripts/bench_queries.py
+  python scripts/bench_queries.py --update-baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import NamedTuple
+
+from city_search import KEY_END, LIST_SQL, SEARCH_SQL, search_key
+from migrate_schema import GARDEN_TABLES, LOCALE_SUFFIXES, moon_day_sql
+from moon_phases import RANGE_SQL as PHASES_SQL
+from moon_signs import RANGE_SQL as SIGNS_SQL
+
+DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+BASELINE_DEFAULT = "scripts/query_baseline.json"
+REPEAT_DEFAULT = 20
+# Shapes with few parameter sets are repeated until they have this many samples.
+MIN_SAMPLES = 500
+STEPS_TOLERANCE_DEFAULT = 0.1
+LATENCY_TOLERANCE_DEFAULT = 1.0
+# Latency regressions smaller than this are timer noise, not plan changes.
+LATENCY_FLOOR_US = 50.0
+DAY_MS = 86_400_000
+# About the first day of each month of 2020-2030, the windows getMoonPhases/getMoonSigns are replayed over.
+MONTH_STARTS = [1_577_836_800_000 + round(i * 30.436875 * DAY_MS) for i in range(132)]
+
+
+class QueryShape(NamedTuple):
+    name: str
+    sql: str
+    params: list[tuple]
+
+
+def content_queries(conn: sqlite3.Connection, locales: list[str]) -> list[QueryShape]:
+    shapes = []
+    for locale in locales:
+        suffix = LOCALE_SUFFIXES[locale]
+        cities = f"CITIES_{suffix}"
+        names = [(row[0],) for row in conn.execute(f"SELECT NAME FROM {cities}")]
+        shapes.append(
+            QueryShape(
+                f"getCityByName[{locale}]",
+                f"select NAME, LATITUDE, LONGITUDE from {cities} where NAME = ? collate nocase limit 1",
+                names,
+            )
+        )
+        shapes.append(QueryShape(f"getAllCities[{locale}]", LIST_SQL, [(locale,)]))
+        # What a user types: the first one to three characters of each name.
+        keys = sorted({search_key(name)[:n] for (name,) in names for n in (1, 2, 3)} - {""})
+        shapes.append(
+            QueryShape(f"searchCities[{locale}]", SEARCH_SQL, [(locale, locale, key, key + KEY_END) for key in keys])
+        )
+
+        moon_days = f"MOON_DAY_INFO_{suffix}"
+        days = list(range(1, 31))
+        shapes.append(QueryShape(f"getMoonDayInfo[{locale}]", moon_day_sql(moon_days), [(day,) for day in days]))
+
+        zodiac = f"ZODIAC_INFO_{suffix}"
+        signs = [row[0] for row in conn.execute(f"SELECT ZODIAC FROM {zodiac}")]
+        shapes.append(
+            QueryShape(
+                f"getZodiacInfo[{locale}]",
+                f"select ZODIAC, NAME, INFO from {zodiac} where ZODIAC = ? collate nocase limit 1",
+                [(sign,) for sign in signs],
+            )
+        )
+
+        garden = GARDEN_TABLES.get(locale)
+        if garden:
+            shapes.append(
+                QueryShape(
+                    f"getMoonDayInfo+garden[{locale}]",
+                    moon_day_sql(moon_days, garden),
+                    [(sign, day) for sign in signs for day in days],
+                )
+            )
+
+    # calcMoonMonth's window (moonPhaseRange): the month with slack on both sides.
+    windows = [(start - 3 * DAY_MS, start + 33 * DAY_MS) for start in MONTH_STARTS]
+    shapes.append(QueryShape("getMoonPhases", PHASES_SQL, [(lo, lo, hi, hi) for lo, hi in windows]))
+    # The calendar's getMoonSigns call spans the month's lunar day ends.
+    shapes.append(QueryShape("getMoonSigns", SIGNS_SQL, [(lo, lo, hi, hi) for lo, hi in windows]))
+    return shapes
+
+
+def query_plan(conn: sqlite3.Connection, sql: str, params: tuple) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def vm_steps(conn: sqlite3.Connection, shape: QueryShape) -> float:
+    """Average number of SQLite VM instructions per call."""
+    steps = 0
+
+    def tick() -> int:
+        nonlocal steps
+        steps += 1
+        return 0
+
+    conn.set_progress_handler(tick, 1)
+    try:
+        for params in shape.params:
+            conn.execute(shape.sql, params).fetchall()
+    finally:
+        conn.set_progress_handler(None, 0)
+    return steps / len(shape.params)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def measure(conn: sqlite3.Connection, shape: QueryShape, repeat: int) -> dict:
+    for params in shape.params:
+        conn.execute(shape.sql, params).fetchall()
+    samples = []
+    passes = max(repeat, -(-MIN_SAMPLES // len(shape.params)))
+    for _ in range(passes):
+        for params in shape.params:
+            started = time.perf_counter_ns()
+            conn.execute(shape.sql, params).fetchall()
+            samples.append((time.perf_counter_ns() - started) / 1000)
+    return {
+        "calls": len(samples),
+        "p50_us": round(percentile(samples, 0.5), 1),
+        "p99_us": round(percentile(samples, 0.99), 1),
+        "steps": round(vm_steps(conn, shape), 1),
+        "plan": query_plan(conn, shape.sql, shape.params[0]),
+    }
+
+
+def check(
+    shape: QueryShape,
+    result: dict,
+    baseline: dict | None,
+    steps_tolerance: float,
+    latency_tolerance: float,
+) -> list[str]:
+    problems = []
+    for detail in result["plan"]:
+        if detail.startswith("SCAN"):
+            problems.append(f"{shape.name}: full scan ({detail})")
+    if baseline:
+        if result["steps"] > baseline["steps"] * (1 + steps_tolerance):
+            problems.append(f"{shape.name}: {result['steps']} VM steps/call, baseline {baseline['steps']}")
+        # p99 of microsecond queries is dominated by scheduler noise, so only p50 gates.
+        limit = max(baseline["p50_us"] * (1 + latency_tolerance), baseline["p50_us"] + LATENCY_FLOOR_US)
+        if result["p50_us"] > limit:
+            problems.append(f"{shape.name}: p50 {result['p50_us']}us, baseline {baseline['p50_us']}us")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark app queries and fail on plan or latency regressions.")
+    parser.add_argument("--db", default=DB_DEFAULT, help="Path to sqlite DB")
+    parser.add_argument("--baseline", default=BASELINE_DEFAULT, help="Baseline JSON to compare against")
+    parser.add_argument(
+        "--locales",
+        nargs="*",
+        choices=list(LOCALE_SUFFIXES),
+        default=list(LOCALE_SUFFIXES),
+        help="Locales to replay, e.g. only the one a shard holds",
+    )
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--repeat", type=int, default=REPEAT_DEFAULT, help="Timed passes over each shape's params")
+    parser.add_argument(
+        "--steps-tolerance",
+        type=float,
+        default=STEPS_TOLERANCE_DEFAULT,
+        help="Allowed relative increase in VM steps per call",
+    )
+    parser.add_argument(
+        "--latency-tolerance",
+        type=float,
+        default=LATENCY_TOLERANCE_DEFAULT,
+        help="Allowed relative increase in p50 latency",
+    )
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    problems = []
+    print(f"{'query':<30}{'calls':>7}{'p50 us':>9}{'p99 us':>9}{'steps':>8}  plan")
+    try:
+        for shape in content_queries(conn, args.locales):
+            result = measure(conn, shape, max(1, args.repeat))
+            results[shape.name] = result
+            plan = "; ".join(result["plan"])
+            print(
+                f"{shape.name:<30}{result['calls']:>7}{result['p50_us']:>9}{result['p99_us']:>9}"
+                f"{result['steps']:>8}  {plan}"
+            )
+            previous = baseline.get(shape.name)
+            if previous and previous["plan"] != result["plan"]:
+                print(f"  plan changed, was: {'; '.join(previous['plan'])}")
+            problems.extend(check(shape, result, previous, args.steps_tolerance, args.latency_tolerance))
+    finally:
+        conn.close()
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if problems:
+        for problem in problems:
+            print(f"[fail] {problem}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
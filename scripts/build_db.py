@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""Build the bundled SQLite asset in one pass.
+
+- Runs the seed, translate, import and schema migration steps in dependency
+  order against a working copy of the DB, then validates it and swaps it into
+  place. Validation fails if a step left a CITIES_* table with fewer rows.
+- A step is skipped when the fingerprint of its input files and the DB tables
+  it reads and writes matches the one recorded after its last run.
+- Steps that need the network (GeoNames, OpenAI) only run with --online.
+- Finishes with ANALYZE and VACUUM at SQLite's default 4096-byte page size
+  (or --page-size), then prints a size/row-count report. Smaller pages give
+  a smaller file but are not chosen automatically, since they mean more
+  page reads per query; check bench_queries.py before switching.
+- With --shards, also writes per-locale shards and their manifest.
+
+Example:
+  python scripts/build_db.py
+  python scripts/build_db.py --online --steps translate-zodiac-ja
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+from typing import Callable, NamedTuple
+
+from city_search import check as check_city_search
+from migrate_schema import migrated_tables, verify_garden
+from moon_phases import PhaseTable, structure_problems
+from moon_signs import SignTable
+from moon_signs import structure_problems as sign_structure_problems
+
+DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+STATE_DEFAULT = "scripts/.build_db_state.json"
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGE_SIZES = [1024, 2048, 4096, 8192]
+PAGE_SIZE_DEFAULT = 4096
+
+# Mirrors REQUIRED_TABLES in src/data/db.ts.
+REQUIRED_TABLES = [
+    "MOON_DAY_INFO_ENG",
+    "MOON_DAY_INFO_RU",
+    "MOON_DAY_INFO_JA",
+    "CITIES_ENG",
+    "CITIES_RU",
+    "CITIES_JA",
+    "ZODIAC_INFO_ENG",
+    "ZODIAC_INFO_RU",
+    "ZODIAC_INFO_JA",
+    "CITY_LIST",
+    "CITY_SEARCH",
+    "MOON_PHASES",
+    "MOON_SIGNS",
+]
+LOCALE_SUFFIXES = ["ENG", "RU", "JA"]
+
+
+class Step(NamedTuple):
+    name: str
+    inputs: list[str]
+    reads: list[str]
+    writes: list[str]
+    online: bool
+    run: Callable[[argparse.Namespace, str], None]
+
+
+def run_script(script: str, *args: str) -> None:
+    cmd = [sys.executable, os.path.join(SCRIPTS_DIR, script), *args]
+    print(f"$ {' '.join(cmd)}")
+    subprocess.run(cmd, check=True)
+
+
+def seed_cities_ja(args: argparse.Namespace, db: str) -> None:
+    # --append keeps the translated cities; a plain seed would delete them and
+    # translate-cities-ja --resume would not put them back.
+    run_script("seed_cities_ja.py", "--db", db, "--append")
+
+
+def translate_moon_day_ja(args: argparse.Namespace, db: str) -> None:
+    run_script("translate_moon_day_info.py", "--db", db, "--out", "scripts/moon_day_info_ja.csv", "--incremental")
+
+
+def translate_cities_ja(args: argparse.Namespace, db: str) -> None:
+    run_script("translate_cities_to_ja.py", "--db", db, "--resume")
+
+
+def translate_zodiac_ja(args: argparse.Namespace, db: str) -> None:
+    run_script("translate_zodiac_tables.py", "--db", db)
+
+
+def import_moon_day_ja(args: argparse.Namespace, db: str) -> None:
+    run_script("import_moon_day_info_csv.py", "--db", db, "--csv", "scripts/moon_day_info_ja.csv", "--truncate")
+
+
+def migrate_schema(args: argparse.Namespace, db: str) -> None:
+    run_script("migrate_schema.py", "--db", db)
+
+
+def city_search(args: argparse.Namespace, db: str) -> None:
+    run_script("city_search.py", "write", "--db", db)
+
+
+def moon_phases(args: argparse.Namespace, db: str) -> None:
+    run_script("moon_phases.py", "write", "--db", db)
+
+
+def moon_signs(args: argparse.Namespace, db: str) -> None:
+    run_script("moon_signs.py", "write", "--db", db)
+
+
+STEPS = [
+    # CITIES_JA is not fingerprinted here: later steps rewrite it, so the seed would never match and rerun every build.
+    Step("seed-cities-ja", ["scripts/seed_cities_ja.py"], [], [], True, seed_cities_ja),
+    Step(
+        "translate-moon-day-ja",
+        ["scripts/translate_moon_day_info.py"],
+        ["MOON_DAY_INFO_ENG"],
+        [],
+        True,
+        translate_moon_day_ja,
+    ),
+    Step(
+        "translate-cities-ja",
+        ["scripts/translate_cities_to_ja.py"],
+        ["CITIES_ENG"],
+        ["CITIES_JA"],
+        True,
+        translate_cities_ja,
+    ),
+    Step(
+        "translate-zodiac-ja",
+        ["scripts/translate_zodiac_tables.py"],
+        ["ZODIAC_INFO_ENG", "ZODIAC_GARDEN_RU"],
+        ["ZODIAC_INFO_JA", "ZODIAC_GARDEN_JA"],
+        True,
+        translate_zodiac_ja,
+    ),
+    Step(
+        "import-moon-day-ja",
+        ["scripts/import_moon_day_info_csv.py", "scripts/moon_day_info_ja.csv"],
+        ["MOON_DAY_INFO_ENG"],
+        ["MOON_DAY_INFO_JA"],
+        False,
+        import_moon_day_ja,
+    ),
+    Step("migrate-schema", ["scripts/migrate_schema.py"], [], migrated_tables(), False, migrate_schema),
+    Step(
+        "city-search",
+        ["scripts/city_search.py"],
+        ["CITIES_ENG", "CITIES_RU", "CITIES_JA"],
+        ["CITY_LIST", "CITY_SEARCH"],
+        False,
+        city_search,
+    ),
+    Step(
+        "moon-phases",
+        ["scripts/moon_phases.py", "scripts/lunar_engine.py"],
+        [],
+        ["MOON_PHASES"],
+        False,
+        moon_phases,
+    ),
+    Step("moon-signs", ["scripts/moon_signs.py"], [], ["MOON_SIGNS"], False, moon_signs),
+]
+
+
+def table_digest(conn: sqlite3.Connection, table: str, where: str = "", params: tuple = ()) -> str:
+    """Digest of the table's definition and rows, optionally only those matching `where`."""
+    digest = hashlib.sha256()
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    if row is None:
+        return "missing"
+    digest.update((row[0] or "").encode("utf-8"))
+    for values in conn.execute(f'SELECT * FROM "{table}"{where} ORDER BY 1, 2', params):
+        digest.update(json.dumps(values, ensure_ascii=False, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def fingerprint(step: Step, db: str) -> str:
+    digest = hashlib.sha256(step.name.encode("utf-8"))
+    for path in step.inputs:
+        digest.update(path.encode("utf-8"))
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    conn = sqlite3.connect(db)
+    try:
+        for table in step.reads + step.writes:
+            digest.update(f"{table}:{table_digest(conn, table)}".encode("utf-8"))
+    finally:
+        conn.close()
+    return digest.hexdigest()
+
+
+def load_state(path: str) -> dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path: str, state: dict[str, str]) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def city_counts(db: str) -> dict[str, int]:
+    """Row count of each CITIES_<locale> table in `db`."""
+    conn = sqlite3.connect(db)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        return {
+            f"CITIES_{suffix}": conn.execute(f"SELECT COUNT(*) FROM CITIES_{suffix}").fetchone()[0]
+            for suffix in LOCALE_SUFFIXES
+            if f"CITIES_{suffix}" in tables
+        }
+    finally:
+        conn.close()
+
+
+def validate(db: str, cities_before: dict[str, int] | None = None) -> list[str]:
+    problems = []
+    for table, count in city_counts(db).items():
+        if cities_before and count < cities_before.get(table, 0):
+            problems.append(f"{table} shrank from {cities_before[table]} to {count} rows")
+    conn = sqlite3.connect(db)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        for table in REQUIRED_TABLES:
+            if table not in tables:
+                problems.append(f"missing table {table}")
+        for suffix in LOCALE_SUFFIXES:
+            table = f"MOON_DAY_INFO_{suffix}"
+            if table in tables:
+                days = {
+                    row[0]
+                    for row in conn.execute(f"SELECT DISTINCT CAST(MOON_DATE_NUMBER AS INTEGER) FROM {table}")
+                }
+                if days != set(range(1, 31)):
+                    problems.append(f"{table} does not cover moon days 1-30")
+            table = f"ZODIAC_INFO_{suffix}"
+            if table in tables and conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] != 12:
+                problems.append(f"{table} does not have 12 rows")
+            table = f"CITIES_{suffix}"
+            if table in tables:
+                bad = conn.execute(
+                    f"SELECT COUNT(*) FROM {table} WHERE NAME IS NULL OR NAME = '' "
+                    "OR CAST(LATITUDE AS REAL) NOT BETWEEN -90 AND 90 "
+                    "OR CAST(LONGITUDE AS REAL) NOT BETWEEN -180 AND 180"
+                ).fetchone()[0]
+                if bad:
+                    problems.append(f"{table} has {bad} rows without a name or with invalid coordinates")
+        if {"CITY_LIST", "CITY_SEARCH"} <= tables:
+            problems.extend(check_city_search(conn)[1][:5])
+        if "MOON_PHASES" in tables:
+            problems.extend(structure_problems(PhaseTable.load(conn))[:5])
+        if "MOON_SIGNS" in tables:
+            problems.extend(sign_structure_problems(SignTable.load(conn))[:5])
+        _, garden_problems = verify_garden(conn)
+        problems.extend(garden_problems[:5])
+        if conn.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+            problems.append("integrity_check failed")
+    finally:
+        conn.close()
+    return problems
+
+
+def compact(db: str, page_size: int) -> None:
+    """ANALYZE and VACUUM `db` at `page_size`."""
+    conn = sqlite3.connect(db)
+    try:
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute(f"PRAGMA page_size = {page_size}")
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def report(db: str, original_size: int | None) -> None:
+    conn = sqlite3.connect(db)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        try:
+            table_bytes = dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+        except sqlite3.OperationalError:
+            table_bytes = {}
+        print(f"\n{'table':<24}{'rows':>8}{'bytes':>12}")
+        names = conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name").fetchall()
+        for (name,) in names:
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+            print(f"{name:<24}{rows:>8}{table_bytes.get(name, 0):>12}")
+    finally:
+        conn.close()
+    size = os.path.getsize(db)
+    line = f"\n{db}: {size} bytes, page size {page_size}"
+    if original_size:
+        line += f" (was {original_size} bytes, {100 * (size - original_size) / original_size:+.1f}%)"
+    print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build, validate and compact the bundled SQLite asset.")
+    parser.add_argument("--db", default=DB_DEFAULT, help="Source DB to build from")
+    parser.add_argument("--out", default=None, help="Output DB path (default: replace --db)")
+    parser.add_argument("--state", default=STATE_DEFAULT, help="Where step fingerprints are recorded")
+    parser.add_argument("--online", action="store_true", help="Also run steps that call GeoNames/OpenAI")
+    parser.add_argument("--steps", nargs="*", default=None, help="Only consider these steps")
+    parser.add_argument("--force", action="store_true", help="Run steps even when their inputs are unchanged")
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        choices=PAGE_SIZES,
+        default=PAGE_SIZE_DEFAULT,
+        help="Page size to VACUUM at; check bench_queries.py before lowering it",
+    )
+    parser.add_argument("--no-optimize", action="store_true", help="Skip ANALYZE/VACUUM")
+    parser.add_argument("--shards", default=None, help="Also write per-locale shards and a manifest to this directory")
+    parser.add_argument("--list", action="store_true", help="List steps and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for step in STEPS:
+            print(f"{step.name}{' (online)' if step.online else ''}")
+        return 0
+
+    out = args.out or args.db
+    original_size = os.path.getsize(out) if os.path.exists(out) else None
+    work = f"{out}.building"
+    shutil.copyfile(args.db, work)
+
+    state = load_state(args.state)
+    state_key = os.path.normpath(out)
+    recorded = state.setdefault(state_key, {})
+    cities_before = city_counts(work)
+    try:
+        for step in STEPS:
+            if args.steps is not None and step.name not in args.steps:
+                continue
+            if step.online and not args.online:
+                print(f"[skip] {step.name}: needs --online")
+                continue
+            if not args.force and recorded.get(step.name) == fingerprint(step, work):
+                print(f"[skip] {step.name}: inputs unchanged")
+                continue
+            print(f"[run]  {step.name}")
+            step.run(args, work)
+            recorded[step.name] = fingerprint(step, work)
+
+        problems = validate(work, cities_before)
+        if problems:
+            for problem in problems:
+                print(f"[fail] {problem}", file=sys.stderr)
+            print(f"Validation failed; {out} left unchanged.", file=sys.stderr)
+            return 1
+
+        if not args.no_optimize:
+            compact(work, args.page_size)
+
+        os.replace(work, out)
+        # Compaction rewrites the file, not the rows, so recorded fingerprints stay valid.
+        save_state(args.state, state)
+    finally:
+        if os.path.exists(work):
+            os.remove(work)
+
+    report(out, original_size)
+    if args.shards:
+        run_script("shard_db.py", "--db", out, "--out-dir", args.shards)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Build the CITY_LIST and CITY_SEARCH tables behind the city picker.
+
+- CITY_LIST holds getAllCities' result for every locale, pre-sorted and
+  deduplicated by name: POSITION is the row's place in
+  ``group by NAME order by NAME``, so the picker reads one primary-key range.
+- CITY_SEARCH maps normalized search keys to CITY_LIST positions. A name's
+  key is NFKC-folded, lower-cased, stripped of Latin/Cyrillic diacritics and
+  has katakana mapped to hiragana; every suffix of it that starts on a
+  non-space character is stored, so "contains" (what the picker filtered on
+  in JS) becomes a prefix range over (LOCALE, KEY).
+- ``search_key`` must stay in step with citySearchKey in
+  src/data/citySearch.ts (tests/citySearch.test.ts pins both to the same
+  keys); ``check`` replays both the list and the searches.
+- Both tables are a snapshot of CITIES_*: scripts that write a CITIES table
+  call ``refresh_cities`` in the same transaction, so the picker sees the
+  new rows.
+
+Example:
+  python scripts/city_search.py write --db assets/database/moon_calendar_translated_2.db
+  python scripts/city_search.py search --locale ja --query ｱﾃﾈ
+  python scripts/city_search.py check
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sqlite3
+import sys
+import unicodedata
+
+DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+LOCALE_SUFFIXES = {"en": "ENG", "ru": "RU", "ja": "JA"}
+
+LIST_TABLE = "CITY_LIST"
+SEARCH_TABLE = "CITY_SEARCH"
+CREATE_SQL = [
+    f"CREATE TABLE IF NOT EXISTS {LIST_TABLE} (LOCALE TEXT NOT NULL, POSITION INTEGER NOT NULL, NAME TEXT NOT NULL, "
+    "LATITUDE REAL, LONGITUDE REAL, PRIMARY KEY (LOCALE, POSITION)) WITHOUT ROWID",
+    f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (LOCALE TEXT NOT NULL, KEY TEXT NOT NULL, POSITION INTEGER NOT NULL, "
+    "PRIMARY KEY (LOCALE, KEY, POSITION)) WITHOUT ROWID",
+]
+# The app's queries; content.ts must use the same statements.
+LIST_SQL = f"select NAME, LATITUDE, LONGITUDE from {LIST_TABLE} where LOCALE = ? order by POSITION"
+SEARCH_SQL = (
+    f"select NAME, LATITUDE, LONGITUDE from {LIST_TABLE} where LOCALE = ? and POSITION in "
+    f"(select POSITION from {SEARCH_TABLE} where LOCALE = ? and KEY >= ? and KEY < ?) order by POSITION"
+)
+# Sorts after every character, so key + KEY_END bounds the keys starting with key.
+KEY_END = "\U0010ffff"
+
+# Combining Diacritical Marks; the kana voicing marks (U+3099, U+309A) are kept.
+DIACRITICS = re.compile("[\u0300-\u036f]")
+
+
+def search_key(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = unicodedata.normalize("NFC", DIACRITICS.sub("", unicodedata.normalize("NFD", text)))
+    # Katakana to hiragana: the two blocks are 0x60 apart.
+    text = "".join(chr(ord(c) - 0x60) if "\u30a1" <= c <= "\u30f6" else c for c in text)
+    return " ".join(text.split())
+
+
+def key_suffixes(key: str) -> set[str]:
+    return {key[i:] for i in range(len(key)) if key[i] != " "}
+
+
+def legacy_list_sql(locale: str) -> str:
+    """getAllCities before CITY_LIST existed."""
+    return f"select NAME, LATITUDE, LONGITUDE from CITIES_{LOCALE_SUFFIXES[locale]} group by NAME order by NAME asc"
+
+
+def write_locale(conn: sqlite3.Connection, locale: str) -> tuple[int, int]:
+    """Replace `locale`'s rows in both tables from its CITIES table; returns (cities, keys)."""
+    for table in (LIST_TABLE, SEARCH_TABLE):
+        conn.execute(f"DELETE FROM {table} WHERE LOCALE = ?", (locale,))
+    cities = conn.execute(legacy_list_sql(locale)).fetchall()
+    conn.executemany(
+        f"INSERT INTO {LIST_TABLE} VALUES (?, ?, ?, ?, ?)",
+        [(locale, position, *city) for position, city in enumerate(cities)],
+    )
+    keys = [
+        (locale, suffix, position)
+        for position, (name, _, _) in enumerate(cities)
+        for suffix in key_suffixes(search_key(name))
+    ]
+    conn.executemany(f"INSERT INTO {SEARCH_TABLE} VALUES (?, ?, ?)", keys)
+    return len(cities), len(keys)
+
+
+def write_tables(conn: sqlite3.Connection) -> dict[str, tuple[int, int]]:
+    """(Re)create both tables from CITIES_*; returns (cities, keys) per locale."""
+    for table in (LIST_TABLE, SEARCH_TABLE):
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    for sql in CREATE_SQL:
+        conn.execute(sql)
+    return {locale: write_locale(conn, locale) for locale in LOCALE_SUFFIXES}
+
+
+def refresh_cities(conn: sqlite3.Connection, table: str) -> None:
+    """Rebuild the picker rows of the locale whose cities `table` holds; call after writing it.
+
+    CITIES tables of locales the picker does not list (e.g. CITIES_DE) have no snapshot.
+    """
+    locale = next((code for code, suffix in LOCALE_SUFFIXES.items() if table == f"CITIES_{suffix}"), None)
+    if locale is None:
+        return
+    for sql in CREATE_SQL:
+        conn.execute(sql)
+    write_locale(conn, locale)
+
+
+def search(conn: sqlite3.Connection, locale: str, query: str) -> list[tuple]:
+    key = search_key(query)
+    if not key:
+        return conn.execute(LIST_SQL, (locale,)).fetchall()
+    return conn.execute(SEARCH_SQL, (locale, locale, key, key + KEY_END)).fetchall()
+
+
+def check(conn: sqlite3.Connection) -> tuple[int, list[str]]:
+    """CITY_LIST vs the legacy getAllCities, and every search vs filtering the list in Python."""
+    problems = []
+    checked = 0
+    for sql in (LIST_SQL, SEARCH_SQL):
+        plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", ("en",) * sql.count("?")))
+        if "SCAN" in plan.replace("SCAN CONSTANT", ""):
+            problems.append(f"query scans a table: {plan}")
+    for locale in LOCALE_SUFFIXES:
+        expected = conn.execute(legacy_list_sql(locale)).fetchall()
+        cities = conn.execute(LIST_SQL, (locale,)).fetchall()
+        if cities != expected:
+            problems.append(f"{LIST_TABLE}[{locale}] differs from getAllCities")
+        keys = [search_key(name) for name, _, _ in cities]
+        queries = {""}
+        for name, key in zip((city[0] for city in cities), keys):
+            queries.update(key[i:j] for i in range(len(key)) for j in range(i + 1, min(len(key), i + 4) + 1))
+            queries.update([name, name.upper(), key])
+        for query in sorted(queries):
+            checked += 1
+            q = search_key(query)
+            expected = [city for city, key in zip(cities, keys) if q in key]
+            if search(conn, locale, query) != expected:
+                problems.append(f"search({locale}, {query!r}) differs from filtering {LIST_TABLE}")
+    return checked, problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build and check the city picker's list and search tables.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DB_DEFAULT, help="Path to sqlite DB")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("write", parents=[common], help=f"(Re)create {LIST_TABLE} and {SEARCH_TABLE} in --db")
+    search_parser = sub.add_parser("search", parents=[common], help="Run a picker search")
+    search_parser.add_argument("--locale", choices=list(LOCALE_SUFFIXES), default="en")
+    search_parser.add_argument("--query", required=True)
+    sub.add_parser("check", parents=[common], help="Compare the tables with the legacy queries")
+    args = parser.parse_args()
+
+    if args.command == "write":
+        conn = sqlite3.connect(args.db)
+        try:
+            with conn:
+                counts = write_tables(conn)
+        finally:
+            conn.close()
+        for locale, (cities, keys) in counts.items():
+            print(f"{locale}: {cities} cities, {keys} search keys")
+        return 0
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    try:
+        if args.command == "search":
+            for name, lat, lng in search(conn, args.locale, args.query):
+                print(f"{name} ({lat}, {lng})")
+            return 0
+        checked, problems = check(conn)
+    finally:
+        conn.close()
+    if problems:
+        for problem in problems[:20]:
+            print(problem, file=sys.stderr)
+        print(f"{len(problems)} problems in {LIST_TABLE}/{SEARCH_TABLE}.", file=sys.stderr)
+        return 1
+    print(f"{LIST_TABLE} matches getAllCities; {checked} searches match filtering the list")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
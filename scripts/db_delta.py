@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""Diff two built DB assets into a changeset and apply it in place.
+
+- ``diff`` compares the assets table by table and writes an ordered JSON
+  changeset: row deletes/updates/inserts keyed by primary key (rowid for
+  tables without one), index changes, and a full rebuild for any table whose
+  schema changed.
+- Each changeset carries the content checksum of the DB it applies to and of
+  the DB it must produce.
+- ``apply`` checks the starting checksum, applies everything in a single
+  transaction, and rolls back unless the result matches the expected checksum.
+- SQLite internal tables (sqlite_stat1, sqlite_sequence) are not diffed;
+  ANALYZE runs after a successful apply.
+
+Example:
+  python scripts/db_delta.py diff old.db assets/database/moon_calendar_translated_2.db --out delta.json
+  python scripts/db_delta.py apply old.db delta.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from typing import Any
+
+FORMAT_VERSION = 1
+
+
+def encode_value(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return {"$blob": value.hex()}
+    return value
+
+
+def decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$blob" in value:
+        return bytes.fromhex(value["$blob"])
+    return value
+
+
+def user_tables(conn: sqlite3.Connection) -> dict[str, str]:
+    cur = conn.execute("SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+    return dict(cur.fetchall())
+
+
+def table_indexes(conn: sqlite3.Connection, table: str) -> dict[str, str]:
+    cur = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL", (table,)
+    )
+    return dict(cur.fetchall())
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info('{table}')")]
+
+
+def key_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    """Primary key columns in key order, or ``rowid`` for tables without one."""
+    pk = sorted((row[5], row[1]) for row in conn.execute(f"PRAGMA table_info('{table}')") if row[5])
+    return [name for _, name in pk] or ["rowid"]
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def fetch_rows(conn: sqlite3.Connection, table: str, keys: list[str], columns: list[str]) -> dict[tuple, tuple]:
+    select = ", ".join(quote(c) if c != "rowid" else "rowid" for c in keys + columns)
+    order = ", ".join(quote(k) if k != "rowid" else "rowid" for k in keys)
+    cur = conn.execute(f"SELECT {select} FROM {quote(table)} ORDER BY {order}")
+    width = len(keys)
+    return {row[:width]: row[width:] for row in cur.fetchall()}
+
+
+def content_checksum(conn: sqlite3.Connection) -> str:
+    """Hash of every user table's schema, indexes and rows in key order."""
+    digest = hashlib.sha256()
+    for table, sql in sorted(user_tables(conn).items()):
+        digest.update(f"table {table}\n{sql}\n".encode("utf-8"))
+        for name, index_sql in sorted(table_indexes(conn, table).items()):
+            digest.update(f"index {name}\n{index_sql}\n".encode("utf-8"))
+        keys = key_columns(conn, table)
+        for key, values in fetch_rows(conn, table, keys, table_columns(conn, table)).items():
+            row = [encode_value(v) for v in key + values]
+            digest.update(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+            digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def row_dict(columns: list[str], values: tuple) -> dict[str, Any]:
+    return {col: encode_value(value) for col, value in zip(columns, values)}
+
+
+def diff_table(old: sqlite3.Connection, new: sqlite3.Connection, table: str) -> list[dict]:
+    keys = key_columns(new, table)
+    columns = table_columns(new, table)
+    before = fetch_rows(old, table, keys, columns)
+    after = fetch_rows(new, table, keys, columns)
+    ops: list[dict] = []
+    for key in before.keys() - after.keys():
+        ops.append({"op": "delete", "table": table, "key": [encode_value(k) for k in key]})
+    for key in before.keys() & after.keys():
+        changed = {
+            col: encode_value(value)
+            for col, value, previous in zip(columns, after[key], before[key])
+            if value != previous or type(value) is not type(previous)
+        }
+        if changed:
+            ops.append({"op": "update", "table": table, "key": [encode_value(k) for k in key], "set": changed})
+    for key in after.keys() - before.keys():
+        ops.append({"op": "insert", "table": table, "row": row_dict(columns, after[key])})
+    ops.sort(key=lambda op: ("delete", "update", "insert").index(op["op"]))
+    return ops
+
+
+def recreate_table_ops(conn: sqlite3.Connection, table: str, sql: str) -> list[dict]:
+    columns = table_columns(conn, table)
+    rows = fetch_rows(conn, table, key_columns(conn, table), columns)
+    ops: list[dict] = [{"op": "create_table", "table": table, "sql": sql}]
+    ops.extend({"op": "insert", "table": table, "row": row_dict(columns, values)} for values in rows.values())
+    ops.extend({"op": "create_index", "sql": index_sql} for index_sql in table_indexes(conn, table).values())
+    return ops
+
+
+def diff(old: sqlite3.Connection, new: sqlite3.Connection) -> dict:
+    old_tables = user_tables(old)
+    new_tables = user_tables(new)
+    ops: list[dict] = []
+    for table in sorted(old_tables.keys() - new_tables.keys()):
+        ops.append({"op": "drop_table", "table": table})
+    for table, sql in sorted(new_tables.items()):
+        if old_tables.get(table) != sql:
+            # New table or changed schema: ship it whole rather than emulating ALTER TABLE.
+            if table in old_tables:
+                ops.append({"op": "drop_table", "table": table})
+            ops.extend(recreate_table_ops(new, table, sql))
+            continue
+        old_indexes = table_indexes(old, table)
+        new_indexes = table_indexes(new, table)
+        for name, index_sql in sorted(old_indexes.items()):
+            if new_indexes.get(name) != index_sql:
+                ops.append({"op": "drop_index", "name": name})
+        ops.extend(diff_table(old, new, table))
+        for name, index_sql in sorted(new_indexes.items()):
+            if old_indexes.get(name) != index_sql:
+                ops.append({"op": "create_index", "sql": index_sql})
+    return {
+        "format": FORMAT_VERSION,
+        "from_checksum": content_checksum(old),
+        "to_checksum": content_checksum(new),
+        "ops": ops,
+    }
+
+
+def key_clause(keys: list[str]) -> str:
+    return " AND ".join(f"{quote(k) if k != 'rowid' else 'rowid'} = ?" for k in keys)
+
+
+def apply_op(conn: sqlite3.Connection, op: dict) -> None:
+    kind = op["op"]
+    if kind == "drop_table":
+        conn.execute(f"DROP TABLE {quote(op['table'])}")
+    elif kind == "create_table":
+        conn.execute(op["sql"])
+    elif kind == "drop_index":
+        conn.execute(f"DROP INDEX {quote(op['name'])}")
+    elif kind == "create_index":
+        conn.execute(op["sql"])
+    elif kind == "delete":
+        table = op["table"]
+        conn.execute(
+            f"DELETE FROM {quote(table)} WHERE {key_clause(key_columns(conn, table))}",
+            [decode_value(v) for v in op["key"]],
+        )
+    elif kind == "update":
+        table = op["table"]
+        assignments = ", ".join(f"{quote(col)} = ?" for col in op["set"])
+        params = [decode_value(v) for v in op["set"].values()] + [decode_value(v) for v in op["key"]]
+        conn.execute(
+            f"UPDATE {quote(table)} SET {assignments} WHERE {key_clause(key_columns(conn, table))}", params
+        )
+    elif kind == "insert":
+        row = op["row"]
+        columns = ", ".join(quote(col) for col in row)
+        placeholders = ", ".join("?" for _ in row)
+        conn.execute(
+            f"INSERT INTO {quote(op['table'])} ({columns}) VALUES ({placeholders})",
+            [decode_value(v) for v in row.values()],
+        )
+    else:
+        raise ValueError(f"Unknown changeset op: {kind}")
+
+
+def apply(conn: sqlite3.Connection, changeset: dict) -> None:
+    """Apply `changeset` atomically; raise if the DB is not the expected base or the result is wrong."""
+    if changeset.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported changeset format: {changeset.get('format')}")
+    if content_checksum(conn) != changeset["from_checksum"]:
+        raise ValueError("DB does not match the changeset's base version")
+    conn.isolation_level = None
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for op in changeset["ops"]:
+            apply_op(conn, op)
+        if content_checksum(conn) != changeset["to_checksum"]:
+            raise ValueError("Patched DB does not match the expected checksum")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("ANALYZE")
+
+
+def summarize(changeset: dict) -> str:
+    counts: dict[str, int] = {}
+    for op in changeset["ops"]:
+        counts[op["op"]] = counts.get(op["op"], 0) + 1
+    return ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items())) or "no changes"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Create or apply a changeset between two DB assets.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    diff_parser = sub.add_parser("diff", help="Write the changeset that turns OLD into NEW")
+    diff_parser.add_argument("old", help="Previous DB asset")
+    diff_parser.add_argument("new", help="New DB asset")
+    diff_parser.add_argument("--out", required=True, help="Changeset JSON path")
+    apply_parser = sub.add_parser("apply", help="Apply a changeset to a DB in place")
+    apply_parser.add_argument("db", help="DB to patch")
+    apply_parser.add_argument("changeset", help="Changeset JSON path")
+    args = parser.parse_args()
+
+    if args.command == "diff":
+        old = sqlite3.connect(f"file:{args.old}?mode=ro", uri=True)
+        new = sqlite3.connect(f"file:{args.new}?mode=ro", uri=True)
+        try:
+            changeset = diff(old, new)
+        finally:
+            old.close()
+            new.close()
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(changeset, f, ensure_ascii=False, separators=(",", ":"))
+        size = os.path.getsize(args.out)
+        print(f"{args.out}: {summarize(changeset)} ({size} bytes, full asset {os.path.getsize(args.new)} bytes)")
+        return 0
+
+    with open(args.changeset, "r", encoding="utf-8") as f:
+        changeset = json.load(f)
+    conn = sqlite3.connect(args.db)
+    try:
+        apply(conn, changeset)
+    except ValueError as exc:
+        print(f"Changeset not applied: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    print(f"Applied {summarize(changeset)} to {args.db}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
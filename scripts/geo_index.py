@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""Geohash index over the city tables: near-duplicate detection and nearest city.
+
+- Each CITIES_* row carries a GEOHASH of GEOHASH_PRECISION characters (about
+  150 m cells), written by migrate_schema and indexed. A geohash prefix is a
+  cell, and every row inside it is one index range: GEOHASH >= cell AND
+  GEOHASH < cell || '{'.
+- ``nearest_city`` reads the 3x3 block of cells around a fix, starting at
+  full precision and coarsening until the best candidate is closer than any
+  point outside the block can be. Only the world-sized last resort touches
+  every row.
+- ``GeoIndex`` is the same search over an in-memory sorted list, and
+  ``dedupe`` uses it to drop points within a tolerance of an earlier kept
+  point: one sort plus bisect lookups, O(n log n) for city data.
+- Scripts that insert cities call ``fill_geohashes`` afterwards, so new
+  rows are found without rerunning the migration (and
+  ``city_search.refresh_cities``, so the picker lists them).
+- ``dupes`` lists near-duplicate rows for review; ``check`` compares
+  ``nearest_city`` with a brute-force scan on sampled fixes.
+
+Example:
+  python scripts/geo_index.py dupes --tolerance-km 1
+  python scripts/geo_index.py nearest --locale ja --lat 35.68 --lng 139.76
+  python scripts/geo_index.py check
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import sqlite3
+import sys
+from bisect import bisect_left
+from typing import Iterator
+
+DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+CITY_TABLES = {"en": "CITIES_ENG", "ru": "CITIES_RU", "ja": "CITIES_JA"}
+GEOHASH_PRECISION = 7
+DEDUPE_KM_DEFAULT = 1.0
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Sorts after every geohash character, so cell + PREFIX_END bounds the cell's range.
+PREFIX_END = "{"
+
+
+def geohash_encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            bits <<= 1
+            if lng >= mid:
+                bits |= 1
+                lng_lo = mid
+            else:
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            bits <<= 1
+            if lat >= mid:
+                bits |= 1
+                lat_lo = mid
+            else:
+                lat_hi = mid
+        even = not even
+        count += 1
+        if count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            count = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """(height, width) in degrees of a geohash cell."""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+
+def neighbours(lat: float, lng: float, precision: int) -> list[str]:
+    """The cell containing (lat, lng) and the up to eight cells around it."""
+    if precision == 0:
+        return [""]
+    height, width = cell_size(precision)
+    center_lat = (math.floor((lat + 90) / height) + 0.5) * height - 90
+    center_lng = (math.floor((lng + 180) / width) + 0.5) * width - 180
+    cells = []
+    for dlat in (-height, 0.0, height):
+        cell_lat = center_lat + dlat
+        if not -90 < cell_lat < 90:
+            continue
+        for dlng in (-width, 0.0, width):
+            cell_lng = (center_lng + dlng + 180) % 360 - 180
+            cell = geohash_encode(cell_lat, cell_lng, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def safe_radius_km(lat: float, precision: int) -> float:
+    """Distance from a point to the outside of its 3x3 cell block, at least."""
+    if precision == 0:
+        return math.inf
+    height, width = cell_size(precision)
+    poleward = min(90.0, abs(lat) + 2 * height)
+    across = math.sin(math.radians(min(width, 90.0))) * math.cos(math.radians(poleward))
+    return min(height * KM_PER_DEGREE, EARTH_RADIUS_KM * math.asin(min(1.0, across)))
+
+
+def search_precision(lat: float, radius_km: float) -> int:
+    """Finest precision whose 3x3 block around `lat` covers `radius_km`; 0 means the whole world."""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        if safe_radius_km(lat, precision) >= radius_km:
+            return precision
+    return 0
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    h = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+class GeoIndex:
+    """Points sorted by geohash, searched by cell prefix ranges."""
+
+    def __init__(self, points: list[tuple[float, float]]) -> None:
+        self.points = points
+        order = sorted(range(len(points)), key=lambda i: geohash_encode(*points[i]))
+        self.order = order
+        self.hashes = [geohash_encode(*points[i]) for i in order]
+
+    def cell(self, prefix: str) -> Iterator[int]:
+        lo = bisect_left(self.hashes, prefix)
+        hi = bisect_left(self.hashes, prefix + PREFIX_END)
+        return (self.order[k] for k in range(lo, hi))
+
+    def within(self, lat: float, lng: float, radius_km: float) -> Iterator[int]:
+        for prefix in neighbours(lat, lng, search_precision(lat, radius_km)):
+            for i in self.cell(prefix):
+                if haversine_km(lat, lng, *self.points[i]) <= radius_km:
+                    yield i
+
+
+def dedupe(points: list[tuple[float, float]], tolerance_km: float = DEDUPE_KM_DEFAULT, keep: int = 0) -> list[int]:
+    """Indexes of `points` to keep, in order. A point is dropped when an earlier kept point lies
+    within `tolerance_km`; the first `keep` points (rows already stored) are always kept."""
+    index = GeoIndex(points)
+    kept = [False] * len(points)
+    result = []
+    for i, (lat, lng) in enumerate(points):
+        if i >= keep and any(j < i and kept[j] for j in index.within(lat, lng, tolerance_km)):
+            continue
+        kept[i] = True
+        result.append(i)
+    return result
+
+
+def nearest_city(conn: sqlite3.Connection, table: str, lat: float, lng: float) -> tuple[tuple, float, int] | None:
+    """(NAME, LATITUDE, LONGITUDE) of the closest row, its distance in km and the rows read."""
+    read = 0
+    for precision in range(GEOHASH_PRECISION, -1, -1):
+        best = None
+        for prefix in neighbours(lat, lng, precision):
+            cur = conn.execute(
+                f"SELECT NAME, LATITUDE, LONGITUDE FROM {table} WHERE GEOHASH >= ? AND GEOHASH < ?",
+                (prefix, prefix + PREFIX_END),
+            )
+            for row in cur:
+                read += 1
+                distance = haversine_km(lat, lng, row[1], row[2])
+                if best is None or distance < best[1]:
+                    best = (row, distance)
+        # A closer row outside the block is impossible once the best is within the safe radius.
+        if best is not None and best[1] <= safe_radius_km(lat, precision):
+            return best[0], best[1], read
+    return None
+
+
+def fill_geohashes(conn: sqlite3.Connection, table: str) -> int:
+    """Set GEOHASH on rows inserted without one; a no-op until migrate_schema has added the column."""
+    if "GEOHASH" not in {row[1] for row in conn.execute(f"PRAGMA table_info('{table}')")}:
+        return 0
+    rows = conn.execute(f'SELECT "INDEX", LATITUDE, LONGITUDE FROM {table} WHERE GEOHASH IS NULL').fetchall()
+    conn.executemany(
+        f'UPDATE {table} SET GEOHASH = ? WHERE "INDEX" = ?',
+        [(geohash_encode(float(lat), float(lng)), index) for index, lat, lng in rows],
+    )
+    return len(rows)
+
+
+def near_duplicates(conn: sqlite3.Connection, table: str, tolerance_km: float) -> list[tuple[tuple, tuple, float]]:
+    rows = conn.execute(f'SELECT "INDEX", NAME, LATITUDE, LONGITUDE FROM {table} ORDER BY "INDEX"').fetchall()
+    index = GeoIndex([(row[2], row[3]) for row in rows])
+    pairs = []
+    for i, row in enumerate(rows):
+        for j in index.within(row[2], row[3], tolerance_km):
+            if j > i:
+                pairs.append((row, rows[j], haversine_km(row[2], row[3], rows[j][2], rows[j][3])))
+    return pairs
+
+
+def check(conn: sqlite3.Connection, samples: int) -> tuple[list[str], dict[str, tuple[float, float]]]:
+    """nearest_city vs a full scan for random fixes and for fixes next to each city.
+
+    Returns the problems and, per locale, the average rows read for random and near-city fixes.
+    """
+    rng = random.Random(0)
+    problems = []
+    rows_read = {}
+    for locale, table in CITY_TABLES.items():
+        plan = " ".join(
+            row[3]
+            for row in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT NAME FROM {table} WHERE GEOHASH >= ? AND GEOHASH < ?", ("u", "u{")
+            )
+        )
+        if "USING INDEX" not in plan:
+            problems.append(f"{table}: cell lookup does not use an index ({plan})")
+        missing = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE GEOHASH IS NULL").fetchone()[0]
+        if missing:
+            problems.append(f"{table}: {missing} rows have no GEOHASH; run fill_geohashes or migrate_schema")
+        cities = conn.execute(f"SELECT NAME, LATITUDE, LONGITUDE FROM {table}").fetchall()
+        random_fixes = [(math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180)) for _ in range(samples)]
+        city_fixes = [(lat + rng.uniform(-0.05, 0.05), lng + rng.uniform(-0.05, 0.05)) for _, lat, lng in cities]
+        averages = []
+        for fixes in (random_fixes, city_fixes):
+            total = 0
+            for lat, lng in fixes:
+                found = nearest_city(conn, table, lat, lng)
+                expected = min(haversine_km(lat, lng, c[1], c[2]) for c in cities)
+                if found is None or abs(found[1] - expected) > 1e-9:
+                    problems.append(f"{table} ({lat:.4f}, {lng:.4f}): index gives {found}, full scan {expected:.3f} km")
+                    continue
+                total += found[2]
+            averages.append(total / max(1, len(fixes)))
+        rows_read[locale] = (averages[0], averages[1])
+    return problems, rows_read
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Geohash lookups over the CITIES_* tables.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DB_DEFAULT, help="Path to sqlite DB")
+    sub = parser.add_subparsers(dest="command", required=True)
+    dupes_parser = sub.add_parser("dupes", parents=[common], help="List cities within a tolerance of each other")
+    dupes_parser.add_argument("--tolerance-km", type=float, default=DEDUPE_KM_DEFAULT)
+    nearest_parser = sub.add_parser("nearest", parents=[common], help="Nearest city to a coordinate")
+    nearest_parser.add_argument("--locale", choices=list(CITY_TABLES), default="en")
+    nearest_parser.add_argument("--lat", type=float, required=True)
+    nearest_parser.add_argument("--lng", type=float, required=True)
+    check_parser = sub.add_parser("check", parents=[common], help="Compare nearest lookups with a full scan")
+    check_parser.add_argument("--samples", type=int, default=2000, help="Random fixes per table")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    try:
+        if args.command == "dupes":
+            for table in CITY_TABLES.values():
+                for a, b, distance in near_duplicates(conn, table, args.tolerance_km):
+                    print(f"{table}: {a[0]} {a[1]!r} ~ {b[0]} {b[1]!r} ({distance:.3f} km)")
+            return 0
+        if args.command == "nearest":
+            found = nearest_city(conn, CITY_TABLES[args.locale], args.lat, args.lng)
+            if found is None:
+                print("No cities.", file=sys.stderr)
+                return 1
+            (name, lat, lng), distance, read = found
+            print(f"{name} ({lat}, {lng}), {distance:.1f} km; {read} rows read")
+            return 0
+        problems, rows_read = check(conn, args.samples)
+    finally:
+        conn.close()
+
+    if problems:
+        for problem in problems[:20]:
+            print(problem, file=sys.stderr)
+        print(f"{len(problems)} nearest-city lookups differ from a full scan.", file=sys.stderr)
+        return 1
+    for locale, (anywhere, near_city) in rows_read.items():
+        print(
+            f"{CITY_TABLES[locale]}: nearest city matches a full scan; rows read per lookup "
+            f"{anywhere:.1f} for random fixes, {near_city:.1f} next to a city"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,199 @@
+"""Keep-alive HTTP client shared by the translation and seed scripts.
+
+- Connections are pooled per thread and per client, so consecutive requests
+  reuse one TCP/TLS session instead of handshaking for every batch.
+- The base URL is overridable (``--api-base``), which lets the whole pipeline
+  run against a local stub server.
+- 429/5xx responses, timeouts and dropped connections are retried with jittered
+  backoff; an optional shared RateLimiter paces requests to the real quota.
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import ssl
+import threading
+import time
+import urllib.parse
+from typing import Any
+
+from batching import estimate_tokens
+from rate_limiter import RateLimiter, backoff_delay, parse_duration
+
+OPENAI_API_BASE = "https://api.openai.com/v1"
+GEONAMES_API_BASE = "https://api.geonames.org"
+
+# Errors that mean the server closed an idle keep-alive connection under us.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+# Network errors worth retrying: timeouts and connections dropped mid-request.
+# Anything else (refused connections, TLS verification, DNS) fails fast, as it
+# usually means a wrong --api-base rather than a flaky network.
+TRANSIENT_ERRORS = (
+    TimeoutError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+    http.client.RemoteDisconnected,
+    http.client.IncompleteRead,
+)
+MAX_RETRIES_DEFAULT = 5
+
+
+class HttpError(RuntimeError):
+    def __init__(self, status: int, reason: str, body: bytes, headers: dict[str, str]):
+        super().__init__(f"HTTP {status} {reason}: {body[:200].decode('utf-8', 'replace')}")
+        self.status = status
+        self.reason = reason
+        self.body = body
+        self.headers = headers
+
+
+def is_transient(exc: Exception) -> bool:
+    if isinstance(exc, HttpError):
+        return exc.status == 429 or exc.status >= 500
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+
+class HttpClient:
+    def __init__(
+        self,
+        base_url: str,
+        headers: dict[str, str] | None = None,
+        timeout: float = 60,
+        insecure: bool = False,
+        limiter: RateLimiter | None = None,
+        max_retries: int = MAX_RETRIES_DEFAULT,
+    ):
+        parsed = urllib.parse.urlsplit(base_url.rstrip("/"))
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError(f"Unsupported base URL: {base_url}")
+        self.base_url = base_url.rstrip("/")
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.prefix = parsed.path
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.context = ssl._create_unverified_context() if insecure else None
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[http.client.HTTPConnection] = []
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.scheme == "https":
+                conn = http.client.HTTPSConnection(
+                    self.host, self.port, timeout=self.timeout, context=self.context
+                )
+            else:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _reset_connection(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: bytes | None = None,
+        params: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+        tokens: int = 0,
+    ) -> tuple[int, dict[str, str], bytes]:
+        url = self.prefix + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        merged = {**self.headers, **(headers or {})}
+
+        for attempt in range(1, self.max_retries + 2):
+            if self.limiter:
+                self.limiter.acquire(tokens)
+            try:
+                status, resp_headers, data = self._send(method, url, body, merged)
+            except Exception as exc:
+                if not is_transient(exc) or attempt > self.max_retries:
+                    raise
+                retry_after = None
+                if isinstance(exc, HttpError):
+                    retry_after = parse_duration(exc.headers.get("retry-after"))
+                    if self.limiter:
+                        self.limiter.on_throttle(exc.headers, retry_after)
+                time.sleep(backoff_delay(attempt, retry_after))
+                continue
+            if self.limiter:
+                self.limiter.on_success(resp_headers)
+            return status, resp_headers, data
+
+        raise RuntimeError("unreachable")
+
+    def _send(
+        self, method: str, url: str, body: bytes | None, headers: dict[str, str]
+    ) -> tuple[int, dict[str, str], bytes]:
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except STALE_CONNECTION_ERRORS:
+                self._reset_connection()
+                if attempt == 2:
+                    raise
+                continue
+            except Exception:
+                self._reset_connection()
+                raise
+
+            resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+            if resp.will_close:
+                self._reset_connection()
+            if resp.status >= 400:
+                raise HttpError(resp.status, resp.reason, data, resp_headers)
+            return resp.status, resp_headers, data
+
+        raise RuntimeError("unreachable")
+
+    def post_json(self, path: str, payload: Any) -> Any:
+        text = json.dumps(payload, ensure_ascii=False)
+        _, _, data = self.request(
+            "POST",
+            path,
+            body=text.encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            tokens=estimate_tokens(text),
+        )
+        return json.loads(data)
+
+    def get_json(self, path: str, params: dict[str, str] | None = None) -> Any:
+        _, _, data = self.request("GET", path, params=params)
+        return json.loads(data)
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+def openai_client(
+    api_key: str,
+    base_url: str = OPENAI_API_BASE,
+    timeout: float = 60,
+    limiter: RateLimiter | None = None,
+) -> HttpClient:
+    return HttpClient(base_url, headers={"Authorization": f"Bearer {api_key}"}, timeout=timeout, limiter=limiter)
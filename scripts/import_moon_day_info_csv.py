@@ -1,8 +1,20 @@
 #!/usr/bin/env python3
+"""Import a translated CSV into a locale table such as MOON_DAY_INFO_JA.
+
+Rows are loaded into a shadow table first. The shadow is validated (row count
+and coverage of every expected MOON_DATE_NUMBER) and only then swapped in for
+the target inside one transaction, so the app never sees a dropped, empty or
+half-filled table.
+"""
 import argparse
 import csv
+import itertools
 import sqlite3
-from typing import List
+import time
+from typing import Any, Dict, Iterable, Iterator, List
+
+CHUNK_SIZE_DEFAULT = 500
+SHADOW_SUFFIX = "__IMPORT"
 
 
 def get_columns(conn: sqlite3.Connection, table: str) -> List[str]:
@@ -26,50 +38,187 @@ def create_table_like(conn: sqlite3.Connection, source_table: str, target_table:
     conn.commit()
 
 
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    cur = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    return cur.fetchone() is not None
+
+
+def parse_keys(spec: str) -> List[int]:
+    """Parse an expected key list such as "1-30" or "1,2,5-7"; an empty spec expects nothing."""
+    keys: List[int] = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            keys.extend(range(int(lo), int(hi) + 1))
+        else:
+            keys.append(int(part))
+    return keys
+
+
+def validate_shadow(conn: sqlite3.Connection, table: str, key_column: str, expected_keys: List[int]) -> List[str]:
+    problems = []
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    if total == 0:
+        problems.append("no rows imported")
+    if expected_keys:
+        if total != len(expected_keys):
+            problems.append(f"expected {len(expected_keys)} rows, got {total}")
+        cur = conn.execute(f"SELECT CAST({key_column} AS INTEGER), COUNT(*) FROM {table} GROUP BY 1")
+        counts = {key: count for key, count in cur.fetchall()}
+        missing = sorted(set(expected_keys) - set(counts))
+        extra = sorted(set(counts) - set(expected_keys), key=str)
+        duplicates = sorted(key for key, count in counts.items() if key is not None and count > 1)
+        if missing:
+            problems.append(f"missing {key_column} {missing}")
+        if extra:
+            problems.append(f"unexpected {key_column} {extra}")
+        if duplicates:
+            problems.append(f"duplicate {key_column} {duplicates}")
+    return problems
+
+
+def swap_in(conn: sqlite3.Connection, shadow: str, target: str) -> None:
+    """Replace `target` with `shadow` atomically, keeping the target's indexes."""
+    cur = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL",
+        (target,),
+    )
+    index_sql = [row[0] for row in cur.fetchall()]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {target}")
+        conn.execute(f"ALTER TABLE {shadow} RENAME TO {target}")
+        for sql in index_sql:
+            conn.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def iter_values(rows: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[List[Any]]:
+    for row in rows:
+        yield [row.get(col) for col in columns]
+
+
+def chunked(values: Iterable[List[Any]], size: int) -> Iterator[List[List[Any]]]:
+    it = iter(values)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def apply_bulk_pragmas(conn: sqlite3.Connection, journal_mode: str | None, synchronous: str | None) -> None:
+    if journal_mode:
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    if synchronous:
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+
+
+def import_values(
+    conn: sqlite3.Connection,
+    sql: str,
+    values: Iterable[List[Any]],
+    chunk_size: int,
+) -> int:
+    """Insert `values` as they stream in, committing every `chunk_size` rows."""
+    started = time.perf_counter()
+    total = 0
+    cur = conn.cursor()
+    for chunk in chunked(values, max(1, chunk_size)):
+        cur.executemany(sql, chunk)
+        conn.commit()
+        total += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"Imported {total} rows ({total / elapsed if elapsed else 0:.0f} rows/sec)")
+    return total
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Import translated CSV into a new sqlite table.")
     parser.add_argument("--db", required=True, help="Path to sqlite DB")
     parser.add_argument("--csv", required=True, help="CSV file path")
     parser.add_argument("--source-table", default="MOON_DAY_INFO_ENG", help="Source table to mirror schema")
     parser.add_argument("--target-table", default="MOON_DAY_INFO_JA", help="Target table name")
-    parser.add_argument("--truncate", action="store_true", help="Drop and recreate target table")
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="Replace the target table instead of appending to its rows",
+    )
+    parser.add_argument("--key-column", default="MOON_DATE_NUMBER", help="Key column checked before the swap")
+    parser.add_argument(
+        "--expect-keys",
+        default="1-30",
+        help='Key values the finished table must cover exactly, e.g. "1-30"; empty to skip',
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE_DEFAULT,
+        help="Rows inserted per transaction",
+    )
+    parser.add_argument(
+        "--journal-mode",
+        choices=["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"],
+        help="PRAGMA journal_mode for the bulk load",
+    )
+    parser.add_argument(
+        "--synchronous",
+        choices=["OFF", "NORMAL", "FULL"],
+        help="PRAGMA synchronous for the bulk load",
+    )
 
     args = parser.parse_args()
 
     conn = sqlite3.connect(args.db)
-    if args.truncate:
-        create_table_like(conn, args.source_table, args.target_table)
+    apply_bulk_pragmas(conn, args.journal_mode, args.synchronous)
+
+    shadow = f"{args.target_table}{SHADOW_SUFFIX}"
+    if args.truncate or not table_exists(conn, args.target_table):
+        create_table_like(conn, args.source_table, shadow)
+    else:
+        create_table_like(conn, args.target_table, shadow)
+        conn.execute(f"INSERT INTO {shadow} SELECT * FROM {args.target_table}")
+        conn.commit()
 
-    columns = get_columns(conn, args.target_table)
+    columns = get_columns(conn, shadow)
     if not columns:
         raise RuntimeError(f"Target table {args.target_table} not found or has no columns")
 
+    placeholders = ",".join(["?"] * len(columns))
+    col_sql = ",".join(columns)
+    sql = f"INSERT INTO {shadow} ({col_sql}) VALUES ({placeholders})"
+
+    started = time.perf_counter()
     with open(args.csv, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
-        rows = [row for row in reader]
-
-    if not rows:
+        try:
+            total = import_values(conn, sql, iter_values(reader, columns), args.chunk_size)
+        except sqlite3.IntegrityError as exc:
+            # Typed tables key on MOON_DATE_NUMBER, so duplicate or non-numeric keys fail on insert.
+            conn.rollback()
+            conn.execute(f"DROP TABLE {shadow}")
+            print(f"Import rejected, {args.target_table} left unchanged: {exc}")
+            return 1
+
+    if not total:
+        conn.execute(f"DROP TABLE {shadow}")
         print("No rows found in CSV.")
         return 1
 
-    for row in rows:
-        for col in columns:
-            if col not in row:
-                row[col] = None
-
-    placeholders = ",".join(["?"] * len(columns))
-    col_sql = ",".join(columns)
-    sql = f"INSERT INTO {args.target_table} ({col_sql}) VALUES ({placeholders})"
-
-    values = []
-    for row in rows:
-        values.append([row.get(col) for col in columns])
+    problems = validate_shadow(conn, shadow, args.key_column, parse_keys(args.expect_keys))
+    if problems:
+        conn.execute(f"DROP TABLE {shadow}")
+        print(f"Import rejected, {args.target_table} left unchanged: {'; '.join(problems)}")
+        return 1
 
-    cur = conn.cursor()
-    cur.executemany(sql, values)
-    conn.commit()
+    swap_in(conn, shadow, args.target_table)
 
-    print(f"Imported {len(values)} rows into {args.target_table}.")
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed else 0
+    print(f"Imported {total} rows into {args.target_table} in {elapsed:.2f}s ({rate:.0f} rows/sec).")
     return 0
 
 
@@ -0,0 +1,348 @@
+"""Python port of the lunar-day calculation in src/domain/moon/lunar.ts.
+
+- ``moon_rise`` follows suncalc's getMoonTimes and ``phase_hunt`` follows
+  lune, so boundaries land on the same millisecond the app computes.
+- ``lunar_days`` reproduces ``lunarDays()`` step for step, including the
+  getMissingDays day-1/day-2 fix-ups.
+- The app mixes two time zones: moment.tz(date, timezone) for the requested
+  day, and the JS process zone wherever a plain Date or moment() is used.
+  On a device both are the device zone; ``host_tz`` keeps them apart for
+  replaying fixtures generated on another machine.
+- Times are integer epoch milliseconds, as JS Date values are.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+DAY_MS = 86_400_000
+RAD = math.pi / 180
+
+# suncalc constants
+J1970 = 2440588
+J2000 = 2451545
+OBLIQUITY = RAD * 23.4397
+MOON_HORIZON = 0.133 * RAD
+
+# lune / moontool constants
+SYNODIC_MONTH = 29.53058868
+UNIX_EPOCH_JD = 2440587.5
+
+
+class LunarDay(NamedTuple):
+    number: int
+    start: int
+    end: int
+
+
+def js_date(ms: float) -> int:
+    """``new Date(ms).valueOf()``: JS truncates fractional milliseconds toward zero."""
+    return int(ms)
+
+
+# --- time zone helpers (moment semantics) ---------------------------------
+
+
+def local_date(ms: int, tz: ZoneInfo) -> date:
+    return datetime.fromtimestamp(ms / 1000, tz).date()
+
+
+def day_start(day: date, tz: ZoneInfo) -> int:
+    return int(datetime.combine(day, time(), tz).timestamp() * 1000)
+
+
+def start_of_day(ms: int, tz: ZoneInfo) -> int:
+    return day_start(local_date(ms, tz), tz)
+
+
+def end_of_day(ms: int, tz: ZoneInfo) -> int:
+    return day_start(local_date(ms, tz) + timedelta(days=1), tz) - 1
+
+
+def utc_offset_minutes(ms: int, tz: ZoneInfo) -> float:
+    return datetime.fromtimestamp(ms / 1000, tz).utcoffset().total_seconds() / 60
+
+
+def diff_days(this_ms: int, that_ms: int, tz: ZoneInfo) -> int:
+    """``moment(this).diff(that, 'days')`` with both moments in `tz`."""
+    zone_delta = (utc_offset_minutes(that_ms, tz) - utc_offset_minutes(this_ms, tz)) * 60_000
+    return math.trunc((this_ms - that_ms - zone_delta) / DAY_MS)
+
+
+# --- suncalc ---------------------------------------------------------------
+
+
+def _to_days(ms: float) -> float:
+    return ms / DAY_MS - 0.5 + J1970 - J2000
+
+
+def _moon_coords(d: float) -> tuple[float, float]:
+    L = RAD * (218.316 + 13.176396 * d)
+    M = RAD * (134.963 + 13.064993 * d)
+    F = RAD * (93.272 + 13.229350 * d)
+    lon = L + RAD * 6.289 * math.sin(M)
+    lat = RAD * 5.128 * math.sin(F)
+    ra = math.atan2(math.sin(lon) * math.cos(OBLIQUITY) - math.tan(lat) * math.sin(OBLIQUITY), math.cos(lon))
+    dec = math.asin(math.sin(lat) * math.cos(OBLIQUITY) + math.cos(lat) * math.sin(OBLIQUITY) * math.sin(lon))
+    return ra, dec
+
+
+def moon_altitude(ms: float, lat: float, lng: float) -> float:
+    """suncalc getMoonPosition(...).altitude, refraction included."""
+    lw = RAD * -lng
+    phi = RAD * lat
+    d = _to_days(ms)
+    ra, dec = _moon_coords(d)
+    H = RAD * (280.16 + 360.9856235 * d) - lw - ra
+    h = math.asin(math.sin(phi) * math.sin(dec) + math.cos(phi) * math.cos(dec) * math.cos(H))
+    refraction_h = max(h, 0.0)
+    return h + 0.0002967 / math.tan(refraction_h + 0.00312536 / (refraction_h + 0.08901179))
+
+
+def moon_rise(day_ms: int, lat: float, lng: float, host_tz: ZoneInfo) -> int | None:
+    """suncalc getMoonTimes(...).rise for the local day containing `day_ms`."""
+    t = start_of_day(day_ms, host_tz)
+    h0 = moon_altitude(t, lat, lng) - MOON_HORIZON
+    rise = set_ = None
+    for i in range(1, 25, 2):
+        h1 = moon_altitude(t + i * DAY_MS / 24, lat, lng) - MOON_HORIZON
+        h2 = moon_altitude(t + (i + 1) * DAY_MS / 24, lat, lng) - MOON_HORIZON
+        a = (h0 + h2) / 2 - h1
+        b = (h2 - h0) / 2
+        xe = -b / (2 * a)
+        ye = (a * xe + b) * xe + h1
+        d = b * b - 4 * a * h1
+        roots = 0
+        x1 = x2 = 0.0
+        if d >= 0:
+            dx = math.sqrt(d) / (abs(a) * 2)
+            x1 = xe - dx
+            x2 = xe + dx
+            if abs(x1) <= 1:
+                roots += 1
+            if abs(x2) <= 1:
+                roots += 1
+            if x1 < -1:
+                x1 = x2
+        if roots == 1:
+            if h0 < 0:
+                rise = i + x1
+            else:
+                set_ = i + x1
+        elif roots == 2:
+            rise = i + (x2 if ye < 0 else x1)
+            set_ = i + (x1 if ye < 0 else x2)
+        if rise and set_:
+            break
+        h0 = h2
+    if not rise:
+        return None
+    return js_date(t + rise * DAY_MS / 24)
+
+
+# --- lune ------------------------------------------------------------------
+
+
+def _dsin(deg: float) -> float:
+    return math.sin(deg * RAD)
+
+
+def _meanphase(jd: float, k: float) -> float:
+    t = (jd - 2415020.0) / 36525
+    t2 = t * t
+    t3 = t2 * t
+    return (
+        2415020.75933
+        + SYNODIC_MONTH * k
+        + 0.0001178 * t2
+        - 0.000000155 * t3
+        + 0.00033 * _dsin(166.56 + 132.87 * t - 0.009173 * t2)
+    )
+
+
+def _dcos(deg: float) -> float:
+    return math.cos(deg * RAD)
+
+
+def _truephase(k: float, phase: float) -> float:
+    """moontool's truephase: JD of the given phase (0, 0.25, 0.5, 0.75) of lunation `k`."""
+    k += phase
+    t = k / 1236.85
+    t2 = t * t
+    t3 = t2 * t
+    pt = (
+        2415020.75933
+        + SYNODIC_MONTH * k
+        + 0.0001178 * t2
+        - 0.000000155 * t3
+        + 0.00033 * _dsin(166.56 + 132.87 * t - 0.009173 * t2)
+    )
+    m = 359.2242 + 29.10535608 * k - 0.0000333 * t2 - 0.00000347 * t3
+    mprime = 306.0253 + 385.81691806 * k + 0.0107306 * t2 + 0.00001236 * t3
+    f = 21.2964 + 390.67050646 * k - 0.0016528 * t2 - 0.00000239 * t3
+    if phase < 0.01 or abs(phase - 0.5) < 0.01:
+        pt += (
+            (0.1734 - 0.000393 * t) * _dsin(m)
+            + 0.0021 * _dsin(2 * m)
+            - 0.4068 * _dsin(mprime)
+            + 0.0161 * _dsin(2 * mprime)
+            - 0.0004 * _dsin(3 * mprime)
+            + 0.0104 * _dsin(2 * f)
+            - 0.0051 * _dsin(m + mprime)
+            - 0.0074 * _dsin(m - mprime)
+            + 0.0004 * _dsin(2 * f + m)
+            - 0.0004 * _dsin(2 * f - m)
+            - 0.0006 * _dsin(2 * f + mprime)
+            + 0.0010 * _dsin(2 * f - mprime)
+            + 0.0005 * _dsin(m + 2 * mprime)
+        )
+    elif abs(phase - 0.25) < 0.01 or abs(phase - 0.75) < 0.01:
+        pt += (
+            (0.1721 - 0.0004 * t) * _dsin(m)
+            + 0.0021 * _dsin(2 * m)
+            - 0.6280 * _dsin(mprime)
+            + 0.0089 * _dsin(2 * mprime)
+            - 0.0004 * _dsin(3 * mprime)
+            + 0.0079 * _dsin(2 * f)
+            - 0.0119 * _dsin(m + mprime)
+            - 0.0047 * _dsin(m - mprime)
+            + 0.0003 * _dsin(2 * f + m)
+            - 0.0004 * _dsin(2 * f - m)
+            - 0.0006 * _dsin(2 * f + mprime)
+            + 0.0021 * _dsin(2 * f - mprime)
+            + 0.0003 * _dsin(m + 2 * mprime)
+            + 0.0004 * _dsin(m - 2 * mprime)
+            - 0.0003 * _dsin(2 * m + mprime)
+        )
+        if phase < 0.5:
+            pt += 0.0028 - 0.0004 * _dcos(m) + 0.0003 * _dcos(mprime)
+        else:
+            pt += -0.0028 + 0.0004 * _dcos(m) - 0.0003 * _dcos(mprime)
+    else:
+        raise ValueError(f"truephase called with invalid phase selector {phase}")
+    return pt
+
+
+def new_moon_lunation(ms: int, host_tz: ZoneInfo) -> int:
+    """Lunation number k whose mean new moon precedes `ms`, found the way lune's phase_hunt does."""
+    adate = datetime.fromtimestamp((ms - 45 * DAY_MS) / 1000, host_tz)
+    k1 = math.floor(12.3685 * (adate.year + (1.0 / 12.0) * (adate.month - 1) - 1900))
+    jd = ms / DAY_MS + UNIX_EPOCH_JD
+    nt1 = _meanphase(adate.timestamp() / 86400 + UNIX_EPOCH_JD, k1)
+    approx = nt1 + SYNODIC_MONTH
+    nt2 = _meanphase(approx, k1 + 1)
+    while nt1 > jd or jd >= nt2:
+        approx += SYNODIC_MONTH
+        k1 += 1
+        nt1 = nt2
+        nt2 = _meanphase(approx, k1 + 1)
+    return k1
+
+
+def phase_ms(k: int, phase: float) -> int:
+    return js_date((_truephase(k, phase) - UNIX_EPOCH_JD) * DAY_MS)
+
+
+def new_moon_ms(k: int) -> int:
+    return phase_ms(k, 0.0)
+
+
+def mean_new_moon_ms(k: int) -> int:
+    """Start of lunation `k` as phase_hunt brackets it: the mean new moon, not the true one."""
+    approx = 2415020.75933 + SYNODIC_MONTH * k
+    return js_date((_meanphase(approx, k) - UNIX_EPOCH_JD) * DAY_MS)
+
+
+def phase_hunt_new(ms: int, host_tz: ZoneInfo) -> int:
+    """``lune.phase_hunt(new Date(ms)).new_date`` as epoch ms."""
+    return new_moon_ms(new_moon_lunation(ms, host_tz))
+
+
+# --- lunar.ts ----------------------------------------------------------------
+
+
+def recent_new_moon(ms: int, tz: ZoneInfo, host_tz: ZoneInfo) -> int:
+    end = end_of_day(ms, tz)
+    new_moon = phase_hunt_new(end, host_tz)
+    if new_moon > end:
+        new_moon = phase_hunt_new(start_of_day(ms, tz), host_tz)
+    return new_moon
+
+
+def is_day_between(start: int, end: int, ms: int, tz: ZoneInfo) -> bool:
+    sod = start_of_day(ms, tz)
+    eod = end_of_day(ms, tz)
+    return start < sod < end or start < eod < end
+
+
+def lunar_days_internal(ms: int, lat: float, lng: float, tz: ZoneInfo, host_tz: ZoneInfo) -> list[LunarDay]:
+    """getLunarDaysInternal; `tz` is the zone of the date argument (moment.tz or a host-local Date)."""
+    new_moon = recent_new_moon(ms, tz, host_tz)
+    init = local_date(new_moon, host_tz)
+    this = end_of_day(ms, tz)
+    that = start_of_day(new_moon, host_tz)
+    diff = diff_days(this, that, tz)
+
+    rises = []
+    for i in range(diff + 5):
+        rise = moon_rise(day_start(init + timedelta(days=i), host_tz), lat, lng, host_tz)
+        if rise is not None:
+            rises.append(rise)
+    if rises and rises[0] <= new_moon:
+        rises = rises[1:]
+
+    days = [LunarDay(1, new_moon, rises[0])]
+    for i in range(len(rises) - 1):
+        days.append(LunarDay(i + 2, rises[i], rises[i + 1]))
+    return [day for day in days if is_day_between(day.start, day.end, ms, tz)]
+
+
+def missing_days(res: list[LunarDay], prev: list[LunarDay], day_ms: int) -> list[LunarDay]:
+    """getMissingDays: patch a day 1 (or the tail of the old cycle) the per-day filter dropped."""
+    current = res[0]
+    out: list[LunarDay] = []
+    today = day_ms
+    if current.number == 1:
+        last = prev[-1]
+        if today < last.end and last.number != current.number:
+            out.append(last)
+        if current.start - last.end > 0 and last.number != current.number:
+            out.append(LunarDay(last.number + 1, last.end, current.start))
+    elif current.number == 2:
+        last = prev[-1]
+        if last.number != 1:
+            if current.start - last.end > 0:
+                missing = LunarDay(1, last.end, current.start)
+                if today < last.end and last.number != current.number:
+                    out.append(last)
+                if today < missing.end:
+                    out.append(missing)
+            else:
+                updated = current.start - 2 * 3_600_000
+                missing = LunarDay(1, updated, current.start)
+                if today < last.end and last.number != current.number:
+                    out.append(LunarDay(last.number, last.start, updated))
+                if today < missing.end:
+                    out.append(missing)
+    return out + res
+
+
+def lunar_days(
+    day: date,
+    lat: float,
+    lng: float,
+    timezone: str,
+    host_timezone: str | None = None,
+) -> list[LunarDay]:
+    """lunarDays(): the lunar days overlapping `day` in `timezone`."""
+    tz = ZoneInfo(timezone)
+    host_tz = ZoneInfo(host_timezone) if host_timezone else tz
+    ms = day_start(day, tz)
+    res = lunar_days_internal(ms, lat, lng, tz, host_tz)
+    # getPrevlunarDaysInternal passes a plain Date, so the previous day is read in the host zone.
+    prev_ms = day_start(day - timedelta(days=1), tz)
+    prev = lunar_days_internal(prev_ms, lat, lng, host_tz, host_tz)
+    return missing_days(res, prev, ms)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""Rewrite the content tables with typed keys and lookup indexes.
+
+- MOON_DAY_INFO_* and GARDEN_INFO_RU are keyed by an INTEGER PRIMARY KEY, so a
+  moon-day lookup is a rowid seek instead of a scan with a per-row CAST.
+- ZODIAC_INFO_* and ZODIAC_GARDEN_* become WITHOUT ROWID tables keyed by
+  ZODIAC COLLATE NOCASE, matching the ``collate nocase`` lookups in the app.
+- CITIES_* store REAL coordinates and get a NOCASE index on NAME, plus an
+  indexed GEOHASH column for nearest-city lookups (see geo_index.py).
+- Table names and column order are kept, so the app's table check and every
+  existing query keep working; no views are needed.
+- Every query in src/data/content.ts is replayed against the old and the new
+  tables, including the single-statement moon-day + zodiac garden lookup.
+  Any difference rolls the migration back.
+
+Example:
+  python scripts/migrate_schema.py --db assets/database/moon_calendar_translated_2.db
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sqlite3
+import sys
+from typing import Any, NamedTuple
+
+from geo_index import GEOHASH_PRECISION, geohash_encode
+
+DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+MIGRATE_SUFFIX = "__MIGRATE"
+LOCALE_SUFFIXES = {"en": "ENG", "ru": "RU", "ja": "JA"}
+
+
+class TableSpec(NamedTuple):
+    base: str
+    locales: list[str]
+    # Column -> declared type; columns not listed keep their declaration.
+    columns: dict[str, str]
+    without_rowid: bool = False
+    # Index name suffix -> indexed expression.
+    indexes: dict[str, str] = {}
+    # Derived column -> (declared type, SQL expression over the row), recomputed on every rebuild.
+    computed: dict[str, tuple[str, str]] = {}
+
+
+TABLE_SPECS = [
+    TableSpec("MOON_DAY_INFO", ["ENG", "RU", "JA"], {"MOON_DATE_NUMBER": "INTEGER PRIMARY KEY"}),
+    TableSpec("GARDEN_INFO", ["RU"], {"NUMBER": "INTEGER PRIMARY KEY"}),
+    TableSpec(
+        "ZODIAC_INFO",
+        ["ENG", "RU", "JA"],
+        {"ZODIAC": "TEXT COLLATE NOCASE PRIMARY KEY"},
+        without_rowid=True,
+    ),
+    TableSpec(
+        "ZODIAC_GARDEN",
+        ["RU", "JA"],
+        {"ZODIAC": "TEXT COLLATE NOCASE PRIMARY KEY"},
+        without_rowid=True,
+    ),
+    TableSpec(
+        "CITIES",
+        ["ENG", "RU", "JA"],
+        {"INDEX": "INTEGER PRIMARY KEY", "LONGITUDE": "REAL", "LATITUDE": "REAL"},
+        indexes={"NAME": '"NAME" COLLATE NOCASE', "GEOHASH": '"GEOHASH"'},
+        computed={
+            "GEOHASH": (
+                "TEXT",
+                f'geohash(CAST(TRIM("LATITUDE") AS REAL), CAST(TRIM("LONGITUDE") AS REAL), {GEOHASH_PRECISION})',
+            )
+        },
+    ),
+]
+
+# Columns the app converts with Number() before use.
+NUMERIC_COLUMNS = {"MOON_DATE_NUMBER", "LATITUDE", "LONGITUDE"}
+
+MOON_DAY_COLUMNS = (
+    "MOON_DATE_NUMBER, DAY_CHARACTERISTICS, INFLUENCE_ON_PERSONALITY, BUSINESS, HEALTH, HAIRCUT, RELATIONS, "
+    "MARRIAGE, BIRTHDAY, RECOMMENDATIONS, WARNINGS, DREAMS, MANICURE, DIET, SHOPPING"
+)
+GARDEN_TABLES = {"ru": "ZODIAC_GARDEN_RU", "ja": "ZODIAC_GARDEN_JA"}
+# Same result as `${garden ?? ''}\n\n${zodiacInfo}`.trim() when zodiacInfo is non-empty.
+GARDEN_WITH_ZODIAC = (
+    "case when g.INFO <> '' then trim(coalesce(m.GARDEN, '') || char(10, 10) || g.INFO, char(9, 10, 13, 32)) "
+    "else m.GARDEN end as GARDEN"
+)
+# Characters String.prototype.trim() removes.
+JS_WHITESPACE = "\t\n\v\f\r \u00a0\u1680\u2028\u2029\u202f\u205f\u3000\ufeff" + "".join(map(chr, range(0x2000, 0x200B)))
+
+
+def moon_day_sql(table: str, garden_table: str | None = None) -> str:
+    """The getMoonDayInfo statement in content.ts; with a garden table it also takes the zodiac."""
+    if garden_table:
+        return (
+            f"select {MOON_DAY_COLUMNS}, {GARDEN_WITH_ZODIAC} from {table} m "
+            f"left join {garden_table} g on g.ZODIAC = ? collate nocase where MOON_DATE_NUMBER = ? limit 1"
+        )
+    return f"select {MOON_DAY_COLUMNS}, GARDEN from {table} where MOON_DATE_NUMBER = ? limit 1"
+
+
+def migrated_tables() -> list[str]:
+    return [f"{spec.base}_{suffix}" for spec in TABLE_SPECS for suffix in spec.locales]
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    cur = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    return cur.fetchone() is not None
+
+
+def cast_expr(column: str, decl: str) -> str:
+    affinity = decl.split()[0].upper()
+    if affinity in ("INTEGER", "REAL"):
+        return f'CAST(TRIM("{column}") AS {affinity})'
+    return f'"{column}"'
+
+
+def rebuild_table(conn: sqlite3.Connection, table: str, spec: TableSpec) -> None:
+    """Recreate `table` with the spec's column types; the caller owns the transaction."""
+    columns = [
+        (row[1], row[2] or "TEXT")
+        for row in conn.execute(f"PRAGMA table_info('{table}')")
+        if row[1] not in spec.computed
+    ]
+    decls = [(name, spec.columns.get(name, decl)) for name, decl in columns]
+    decls += [(name, decl) for name, (decl, _) in spec.computed.items()]
+    tmp = f"{table}{MIGRATE_SUFFIX}"
+    body = ", ".join(f'"{name}" {decl}' for name, decl in decls)
+    conn.execute(f"DROP TABLE IF EXISTS {tmp}")
+    conn.execute(f"CREATE TABLE {tmp} ({body}){' WITHOUT ROWID' if spec.without_rowid else ''}")
+    names = ", ".join(f'"{name}"' for name, _ in decls)
+    exprs = ", ".join(
+        spec.computed[name][1] if name in spec.computed else cast_expr(name, decl) for name, decl in decls
+    )
+    conn.execute(f"INSERT INTO {tmp} ({names}) SELECT {exprs} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {tmp} RENAME TO {table}")
+    for suffix, expr in spec.indexes.items():
+        conn.execute(f"CREATE INDEX {table}_{suffix} ON {table} ({expr})")
+
+
+def js_number(value: Any) -> float:
+    """Mirror JavaScript's Number() for the values stored in these columns."""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    if not text:
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan
+
+
+def normalize(cur: sqlite3.Cursor) -> list[tuple]:
+    names = [d[0] for d in cur.description]
+    rows = []
+    for row in cur.fetchall():
+        rows.append(
+            tuple(
+                js_number(value) if name in NUMERIC_COLUMNS else value
+                for name, value in zip(names, row)
+            )
+        )
+    return rows
+
+
+def app_queries(conn: sqlite3.Connection) -> list[tuple[str, str, str, tuple]]:
+    """(label, legacy sql, current sql, params) for every query shape in content.ts."""
+    queries = []
+    for locale, suffix in LOCALE_SUFFIXES.items():
+        table = f"MOON_DAY_INFO_{suffix}"
+        for day in range(0, 32):
+            queries.append(
+                (
+                    f"getMoonDayInfo({day}, {locale})",
+                    f"select {MOON_DAY_COLUMNS}, GARDEN from {table} where CAST(MOON_DATE_NUMBER AS INTEGER) = ? limit 1",
+                    moon_day_sql(table),
+                    (day,),
+                )
+            )
+
+        zodiac_tables = [f"ZODIAC_INFO_{suffix}"] + ([f"ZODIAC_GARDEN_{suffix}"] if locale != "en" else [])
+        signs = [row[0] for row in conn.execute(f"SELECT ZODIAC FROM ZODIAC_INFO_{suffix}")]
+        for table in zodiac_tables:
+            columns = "ZODIAC, NAME, INFO" if table.startswith("ZODIAC_INFO") else "INFO"
+            sql = f"select {columns} from {table} where ZODIAC = ? collate nocase limit 1"
+            for sign in signs + [s.lower() for s in signs] + [s.upper() for s in signs] + ["Unknown"]:
+                queries.append((f"{table}({sign})", sql, sql, (sign,)))
+
+        table = f"CITIES_{suffix}"
+        sql = f"select NAME, LATITUDE, LONGITUDE from {table} where NAME = ? collate nocase limit 1"
+        names = [row[0] for row in conn.execute(f"SELECT NAME FROM {table}")]
+        for name in names + [n.lower() for n in names] + ["Atlantis"]:
+            queries.append((f"getCityByName({name}, {locale})", sql, sql, (name,)))
+        sql = f"select NAME, LATITUDE, LONGITUDE from {table} group by NAME order by NAME asc"
+        queries.append((f"getAllCities({locale})", sql, sql, ()))
+    return queries
+
+
+def verify_garden(conn: sqlite3.Connection) -> tuple[int, list[str]]:
+    """Check the single-statement garden lookup against the old two-query version.
+
+    The app used to read the moon day, then the zodiac garden note, and join
+    them in JS; both halves are replayed here for every day and sign.
+    """
+    count = 0
+    problems = []
+    for locale, garden_table in GARDEN_TABLES.items():
+        table = f"MOON_DAY_INFO_{LOCALE_SUFFIXES[locale]}"
+        if not (table_exists(conn, table) and table_exists(conn, garden_table)):
+            continue
+        signs = [row[0] for row in conn.execute(f"SELECT ZODIAC FROM {garden_table}")]
+        legacy_sql = f"select {MOON_DAY_COLUMNS}, GARDEN from {table} where CAST(MOON_DATE_NUMBER AS INTEGER) = ? limit 1"
+        note_sql = f"select INFO from {garden_table} where ZODIAC = ? collate nocase limit 1"
+        for day in range(0, 32):
+            for sign in signs + [s.lower() for s in signs] + ["Unknown"]:
+                count += 1
+                expected = normalize(conn.execute(legacy_sql, (day,)))
+                note = conn.execute(note_sql, (sign,)).fetchone()
+                if expected and note and note[0]:
+                    garden = expected[0][-1]
+                    combined = f"{'' if garden is None else garden}\n\n{note[0]}".strip(JS_WHITESPACE)
+                    expected[0] = expected[0][:-1] + (combined,)
+                actual = normalize(conn.execute(moon_day_sql(table, garden_table), (sign, day)))
+                if actual != expected:
+                    problems.append(f"getMoonDayInfo({day}, {locale}, {sign}) garden differs")
+    return count, problems
+
+
+def verify(legacy: sqlite3.Connection, migrated: sqlite3.Connection) -> tuple[int, list[str]]:
+    """Check that the new DB answers the app's queries exactly like the old one.
+
+    The current query shapes must also work on the old DB, since devices keep
+    their existing copy until the asset is re-copied.
+    """
+    queries = app_queries(legacy)
+    problems = []
+    for label, legacy_sql, current_sql, params in queries:
+        expected = normalize(legacy.execute(legacy_sql, params))
+        checks = [
+            ("new DB", migrated, current_sql),
+            ("new DB, legacy query", migrated, legacy_sql),
+            ("old DB, current query", legacy, current_sql),
+        ]
+        for where, conn, sql in checks:
+            actual = normalize(conn.execute(sql, params))
+            if actual != expected:
+                problems.append(f"{label} differs on {where}: {expected[:1]!r} != {actual[:1]!r}")
+    garden_count, garden_problems = verify_garden(migrated)
+    return len(queries) + garden_count, problems + garden_problems
+
+
+def migrate(conn: sqlite3.Connection) -> tuple[int, list[str]]:
+    """Migrate every table in TABLE_SPECS and verify; roll back if any query result changed."""
+    legacy = sqlite3.connect(":memory:")
+    conn.backup(legacy)
+    conn.create_function("geohash", 3, geohash_encode, deterministic=True)
+    conn.isolation_level = None
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for spec in TABLE_SPECS:
+            for suffix in spec.locales:
+                table = f"{spec.base}_{suffix}"
+                if table_exists(conn, table):
+                    rebuild_table(conn, table, spec)
+        count, problems = verify(legacy, conn)
+        if problems:
+            conn.execute("ROLLBACK")
+        else:
+            conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        legacy.close()
+    return count, problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Migrate content tables to typed, indexed schemas.")
+    parser.add_argument("--db", default=DB_DEFAULT, help="Path to sqlite DB")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        count, problems = migrate(conn)
+    finally:
+        conn.close()
+
+    if problems:
+        for problem in problems[:20]:
+            print(problem, file=sys.stderr)
+        print(f"Migration rolled back: {len(problems)} of {count} app queries changed.", file=sys.stderr)
+        return 1
+    print(f"Migrated {len(migrated_tables())} tables; {count} app queries return identical results.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Generate the MOON_PHASES table and check it against lune.
+
+- One row per lunation K: the instant phase_hunt starts counting it from
+  (MEAN_NEW) and its true new moon, first quarter, full moon and last
+  quarter, all as integer epoch ms.
+- The instants come from the same Meeus series lune's truephase uses, not
+  a newer one: lunar-day boundaries are defined by lune, and a different
+  series would move them by minutes.
+- ``PhaseTable`` answers lune.phase_hunt(date).new_date with a binary search
+  over MEAN_NEW, and "latest true new moon" with one over NEW.
+- MEAN_NEW is the rowid, so the app's RANGE_SQL (getMoonPhases in
+  src/data/content.ts) reads the lunations around a date range with two
+  seeks; lunar.ts binary-searches them instead of calling phase_hunt.
+- ``check`` replays phase_hunt through lunar_engine's port at every
+  lunation boundary and every 6 hours of the range. ``export`` writes the
+  rows as JSON for scripts/verify-moon-phases.ts, which checks them against
+  the lune package itself.
+
+Example:
+  python scripts/moon_phases.py write --db assets/database/moon_calendar_translated_2.db
+  python scripts/moon_phases.py check --db assets/database/moon_calendar_translated_2.db
+  python scripts/moon_phases.py export --db assets/database/moon_calendar_translated_2.db --json build/moon_phases.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from bisect import bisect_right
+from datetime import date
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+from lunar_engine import DAY_MS, day_start, mean_new_moon_ms, new_moon_lunation, phase_hunt_new, phase_ms
+
+DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+FROM_YEAR_DEFAULT = 1900
+TO_YEAR_DEFAULT = 2100
+CHECK_STEP_MS = 6 * 3_600_000
+UTC = ZoneInfo("UTC")
+
+TABLE = "MOON_PHASES"
+CREATE_SQL = (
+    f"CREATE TABLE {TABLE} (K INTEGER NOT NULL, MEAN_NEW INTEGER PRIMARY KEY, NEW INTEGER NOT NULL, "
+    "FIRST_QUARTER INTEGER NOT NULL, FULL INTEGER NOT NULL, LAST_QUARTER INTEGER NOT NULL)"
+)
+# getMoonPhases in content.ts: the lunations from the one in effect at `from`
+# through the first one starting after `to`. Params: (from, from, to, to).
+RANGE_SQL = (
+    f"select MEAN_NEW, NEW from {TABLE} where "
+    f"MEAN_NEW >= coalesce((select max(MEAN_NEW) from {TABLE} where MEAN_NEW <= ?), ?) and "
+    f"MEAN_NEW <= coalesce((select min(MEAN_NEW) from {TABLE} where MEAN_NEW > ?), ?) order by MEAN_NEW"
+)
+
+
+class Lunation(NamedTuple):
+    k: int
+    mean_new: int
+    new: int
+    first_quarter: int
+    full: int
+    last_quarter: int
+
+
+def lunations(from_year: int, to_year: int) -> list[Lunation]:
+    """Every lunation phase_hunt can return for a date in the range, plus the next one."""
+    first = new_moon_lunation(day_start(date(from_year, 1, 1), UTC), UTC)
+    last = new_moon_lunation(day_start(date(to_year + 1, 1, 1), UTC) - 1, UTC) + 1
+    return [
+        Lunation(k, mean_new_moon_ms(k), phase_ms(k, 0.0), phase_ms(k, 0.25), phase_ms(k, 0.5), phase_ms(k, 0.75))
+        for k in range(first, last + 1)
+    ]
+
+
+class PhaseTable:
+    def __init__(self, rows: list[Lunation]) -> None:
+        self.rows = rows
+        self.mean_new = [row.mean_new for row in rows]
+        self.new = [row.new for row in rows]
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> PhaseTable:
+        return cls([Lunation(*row) for row in conn.execute(f"SELECT * FROM {TABLE} ORDER BY K")])
+
+    def lunation(self, ms: int) -> Lunation:
+        """The lunation phase_hunt picks for `ms`: the last one whose mean new moon is not after it."""
+        index = bisect_right(self.mean_new, ms) - 1
+        if index < 0 or index >= len(self.rows) - 1:
+            raise ValueError(f"{ms} is outside the {TABLE} range")
+        return self.rows[index]
+
+    def phase_hunt_new(self, ms: int) -> int:
+        return self.lunation(ms).new
+
+    def latest_new_moon(self, ms: int) -> int:
+        index = bisect_right(self.new, ms) - 1
+        if index < 0:
+            raise ValueError(f"{ms} is before the first new moon in {TABLE}")
+        return self.new[index]
+
+
+def write_table(conn: sqlite3.Connection, rows: list[Lunation]) -> None:
+    conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    conn.execute(CREATE_SQL)
+    conn.executemany(
+        f"INSERT INTO {TABLE} (K, MEAN_NEW, NEW, FIRST_QUARTER, FULL, LAST_QUARTER) VALUES (?, ?, ?, ?, ?, ?)", rows
+    )
+
+
+def structure_problems(table: PhaseTable) -> list[str]:
+    problems = []
+    for prev, row in zip(table.rows, table.rows[1:]):
+        if row.k != prev.k + 1:
+            problems.append(f"K {prev.k} is followed by {row.k}")
+        if not prev.new < prev.first_quarter < prev.full < prev.last_quarter < row.new:
+            problems.append(f"K {prev.k}: phases are out of order")
+        if not prev.mean_new < row.mean_new:
+            problems.append(f"K {row.k}: MEAN_NEW does not increase")
+    return problems
+
+
+def range_problems(conn: sqlite3.Connection, table: PhaseTable) -> list[str]:
+    """RANGE_SQL must seek, and the slice it returns for a month must answer that month's lookups."""
+    problems = []
+    plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {RANGE_SQL}", (0, 0, 0, 0)))
+    if "SCAN" in plan:
+        problems.append(f"RANGE_SQL scans {TABLE}: {plan}")
+    for start in range(table.mean_new[1], table.mean_new[-2] - 31 * DAY_MS, 30 * DAY_MS):
+        end = start + 31 * DAY_MS
+        rows = conn.execute(RANGE_SQL, (start, start, end, end)).fetchall()
+        window = PhaseTable([Lunation(0, mean_new, new, 0, 0, 0) for mean_new, new in rows])
+        for ms in range(start, end + 1, DAY_MS // 2):
+            if window.phase_hunt_new(ms) != table.phase_hunt_new(ms):
+                problems.append(f"RANGE_SQL({start}, {end}) gives a different new moon at {ms}")
+    return problems
+
+
+def check(table: PhaseTable) -> tuple[int, list[str]]:
+    """Compare table lookups with phase_hunt at lunation boundaries and every CHECK_STEP_MS."""
+    problems = structure_problems(table)
+    for row in table.rows:
+        expected = Lunation(
+            row.k,
+            mean_new_moon_ms(row.k),
+            phase_ms(row.k, 0.0),
+            phase_ms(row.k, 0.25),
+            phase_ms(row.k, 0.5),
+            phase_ms(row.k, 0.75),
+        )
+        if row != expected:
+            problems.append(f"K {row.k}: stored {row}, computed {expected}")
+
+    samples = []
+    for row in table.rows[1:-1]:
+        samples.extend([row.mean_new - 1000, row.mean_new + 1000, row.new])
+    ms = table.mean_new[0] + DAY_MS
+    while ms < table.mean_new[-1]:
+        samples.append(ms)
+        ms += CHECK_STEP_MS
+    for ms in samples:
+        got = table.phase_hunt_new(ms)
+        expected = phase_hunt_new(ms, UTC)
+        if got != expected:
+            problems.append(f"phase_hunt({ms}): table gives {got}, lune gives {expected}")
+    return len(samples), problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build and check the MOON_PHASES lookup table.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DB_DEFAULT, help="Path to sqlite DB")
+    sub = parser.add_subparsers(dest="command", required=True)
+    write_parser = sub.add_parser("write", parents=[common], help=f"(Re)create {TABLE} in --db")
+    write_parser.add_argument("--from-year", type=int, default=FROM_YEAR_DEFAULT, help="First year to cover")
+    write_parser.add_argument("--to-year", type=int, default=TO_YEAR_DEFAULT, help="Last year to cover")
+    sub.add_parser("check", parents=[common], help=f"Check {TABLE} against phase_hunt")
+    export_parser = sub.add_parser("export", parents=[common], help=f"Write {TABLE} as JSON for verify-moon-phases.ts")
+    export_parser.add_argument("--json", required=True, help="Output JSON path")
+    args = parser.parse_args()
+
+    if args.command == "write":
+        rows = lunations(args.from_year, args.to_year)
+        conn = sqlite3.connect(args.db)
+        try:
+            with conn:
+                write_table(conn, rows)
+        finally:
+            conn.close()
+        print(f"Wrote {len(rows)} lunations ({args.from_year}-{args.to_year}) to {TABLE} in {args.db}")
+        return 0
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    try:
+        table = PhaseTable.load(conn)
+        window_problems = range_problems(conn, table) if args.command == "check" else []
+    finally:
+        conn.close()
+
+    if args.command == "export":
+        if os.path.dirname(args.json):
+            os.makedirs(os.path.dirname(args.json), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"columns": list(Lunation._fields), "rows": table.rows}, f, separators=(",", ":"))
+        print(f"Exported {len(table.rows)} lunations to {args.json}")
+        return 0
+
+    checked, problems = check(table)
+    problems.extend(window_problems)
+    if problems:
+        for problem in problems[:20]:
+            print(problem, file=sys.stderr)
+        print(f"{len(problems)} problems in {TABLE}.", file=sys.stderr)
+        return 1
+    print(f"{TABLE}: {len(table.rows)} lunations, {checked} phase_hunt lookups match")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Generate the MOON_SIGNS ingress table and check it against calcMoonZodiac.
+
+- ``moon_longitude`` is a line-for-line port of the longitude series in
+  src/domain/zodiac/zodiac.ts, so a sign read from the table is the sign the
+  app would compute for the same instant.
+- Ingresses are bracketed by hourly samples and refined by bisection to the
+  millisecond: each row's START is the first ms at which the series puts the
+  Moon in SIGN (0 = aries ... 11 = pisces, the order of zodiacOrder).
+- ``SignTable.sign_at`` is a binary search over START. The app does the
+  same in calcMoonZodiac over the rows RANGE_SQL (getMoonSigns in
+  src/data/content.ts) returns for the instants it needs.
+- ``check`` confirms every row is an exact ingress, compares the table with
+  the series every hour of the range, and recomputes the fixture zodiacs from
+  lunar_engine's lunar days.
+
+Example:
+  python scripts/moon_signs.py write --db assets/database/moon_calendar_translated_2.db
+  python scripts/moon_signs.py check --db assets/database/moon_calendar_translated_2.db
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sqlite3
+import sys
+from bisect import bisect_right
+from datetime import date
+from zoneinfo import ZoneInfo
+
+from lunar_engine import day_start, lunar_days
+
+DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+FIXTURES_DEFAULT = "scripts/fixtures.json"
+FROM_YEAR_DEFAULT = 2000
+TO_YEAR_DEFAULT = 2060
+HOUR_MS = 3_600_000
+UTC = ZoneInfo("UTC")
+
+# zodiacOrder in zodiac.ts
+ZODIAC_ORDER = [
+    "aries",
+    "taurus",
+    "gemini",
+    "cancer",
+    "leo",
+    "virgo",
+    "libra",
+    "scorpio",
+    "sagittarius",
+    "capricorn",
+    "aquarius",
+    "pisces",
+]
+
+TABLE = "MOON_SIGNS"
+CREATE_SQL = f"CREATE TABLE {TABLE} (START INTEGER PRIMARY KEY, SIGN INTEGER NOT NULL)"
+# getMoonSigns in content.ts: the ingresses from the one in effect at `from`
+# through the first one after `to`. Params: (from, from, to, to).
+RANGE_SQL = (
+    f"select START, SIGN from {TABLE} where "
+    f"START >= coalesce((select max(START) from {TABLE} where START <= ?), ?) and "
+    f"START <= coalesce((select min(START) from {TABLE} where START > ?), ?) order by START"
+)
+
+DEG2RAD = math.pi / 180
+RAD2DEG = 180 / math.pi
+# new Date(Date.UTC(-4713, 10, 24, 12, 0, 0)).getTime()
+JULIAN_EPOCH_MS = -210866760000000
+
+
+def _mod2pi(x: float) -> float:
+    b = 2 * math.pi
+    return x - math.floor(x / b) * b
+
+
+def moon_longitude(ms: int) -> float:
+    """Ecliptic longitude of the Moon in radians, as calcMoonZodiac computes it."""
+    julian_date = (ms - JULIAN_EPOCH_MS) / (1000 * 60 * 60 * 24)
+    d = julian_date - 2447891.5
+
+    anomaly_mean = (((360 * DEG2RAD) / 365.242191) * d + 4.87650757829735) - 4.935239984568769
+    nu = anomaly_mean + (((360 * DEG2RAD) / math.pi) * 0.016713) * math.sin(anomaly_mean)
+    sun_lon = _mod2pi(nu + 4.935239984568769)
+
+    l0 = 318.351648 * DEG2RAD
+    p0 = 36.34041 * DEG2RAD
+    n0 = 318.510107 * DEG2RAD
+    i = 5.145396 * DEG2RAD
+    l = (13.1763966 * DEG2RAD) * d + l0
+    m_moon = l - (0.1114041 * DEG2RAD) * d - p0
+    n = n0 - (0.0529539 * DEG2RAD) * d
+    c = l - sun_lon
+    ev = (1.2739 * DEG2RAD) * math.sin(2 * c - m_moon)
+    ae = (0.1858 * DEG2RAD) * math.sin(anomaly_mean)
+    a3 = (0.37 * DEG2RAD) * math.sin(anomaly_mean)
+    m_moon2 = m_moon + ev - ae - a3
+    ec = (6.2886 * DEG2RAD) * math.sin(m_moon2)
+    a4 = (0.214 * DEG2RAD) * math.sin(2 * m_moon2)
+    l2 = l + ev + ec - ae + a4
+    v = (0.6583 * DEG2RAD) * math.sin(2 * (l2 - sun_lon))
+    l3 = l2 + v
+    n2 = n - (0.16 * DEG2RAD) * math.sin(anomaly_mean)
+    return _mod2pi(n2 + math.atan2(math.sin(l3 - n2) * math.cos(i), math.cos(l3 - n2)))
+
+
+def sign_index(ms: int) -> int:
+    return math.floor((moon_longitude(ms) * RAD2DEG) / 30) % len(ZODIAC_ORDER)
+
+
+def ingress(lo: int, hi: int) -> int:
+    """First ms in (lo, hi] whose sign differs from sign_index(lo); hi must be in the next sign."""
+    before = sign_index(lo)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if sign_index(mid) == before:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+def ingresses(from_year: int, to_year: int) -> list[tuple[int, int]]:
+    """(START, SIGN) rows; the first row is the sign already in effect at the start of `from_year`."""
+    start = day_start(date(from_year, 1, 1), UTC)
+    end = day_start(date(to_year + 1, 1, 1), UTC)
+    # Back up to the ingress before the range so sign_at covers its first instant.
+    t = start
+    current = sign_index(t)
+    while sign_index(t - HOUR_MS) == current:
+        t -= HOUR_MS
+    rows = [(ingress(t - HOUR_MS, t), current)]
+    t = start
+    while t < end:
+        nxt = t + HOUR_MS
+        sign = sign_index(nxt)
+        if sign != current:
+            rows.append((ingress(t, nxt), sign))
+            current = sign
+        t = nxt
+    return rows
+
+
+class SignTable:
+    def __init__(self, rows: list[tuple[int, int]]) -> None:
+        self.rows = rows
+        self.starts = [row[0] for row in rows]
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> SignTable:
+        return cls(conn.execute(f"SELECT START, SIGN FROM {TABLE} ORDER BY START").fetchall())
+
+    def sign_at(self, ms: int) -> int:
+        index = bisect_right(self.starts, ms) - 1
+        # The Moon stays under three days in a sign, so the last row cannot be trusted past that.
+        if index < 0 or ms >= self.starts[-1] + 3 * 24 * HOUR_MS:
+            raise ValueError(f"{ms} is outside the {TABLE} range")
+        return self.rows[index][1]
+
+    def zodiac_at(self, ms: int) -> str:
+        return ZODIAC_ORDER[self.sign_at(ms)]
+
+
+def write_table(conn: sqlite3.Connection, rows: list[tuple[int, int]]) -> None:
+    conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    conn.execute(CREATE_SQL)
+    conn.executemany(f"INSERT INTO {TABLE} (START, SIGN) VALUES (?, ?)", rows)
+
+
+def structure_problems(table: SignTable) -> list[str]:
+    problems = []
+    for (prev_start, prev_sign), (start, sign) in zip(table.rows, table.rows[1:]):
+        if start <= prev_start:
+            problems.append(f"START {start} does not follow {prev_start}")
+        if sign != (prev_sign + 1) % len(ZODIAC_ORDER):
+            problems.append(f"{ZODIAC_ORDER[prev_sign]} is followed by {ZODIAC_ORDER[sign]} at {start}")
+    return problems
+
+
+def fixture_problems(table: SignTable, path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+    problems = []
+    for case in cases:
+        days = sorted(
+            lunar_days(date.fromisoformat(case["date"]), case["latitude"], case["longitude"], case["timezone"]),
+            key=lambda day: day.number,
+        )
+        # calcMoonZodiac without an index reads the first lunar day's end.
+        zodiac = table.zodiac_at(days[0].end)
+        if zodiac != case["expected"]["zodiac"]:
+            problems.append(f"[{case['id']}] table gives {zodiac}, expected {case['expected']['zodiac']}")
+    return problems
+
+
+def range_problems(conn: sqlite3.Connection, table: SignTable) -> list[str]:
+    """RANGE_SQL must seek, and the slice it returns for a month must answer that month's lookups."""
+    problems = []
+    plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {RANGE_SQL}", (0, 0, 0, 0)))
+    if "SCAN" in plan:
+        problems.append(f"RANGE_SQL scans {TABLE}: {plan}")
+    for start in range(table.starts[1], table.starts[-2] - 31 * 24 * HOUR_MS, 30 * 24 * HOUR_MS):
+        end = start + 31 * 24 * HOUR_MS
+        window = SignTable(conn.execute(RANGE_SQL, (start, start, end, end)).fetchall())
+        for ms in range(start, end + 1, 6 * HOUR_MS):
+            # The app only trusts a row when the next one is loaded too.
+            if bisect_right(window.starts, ms) >= len(window.rows) or window.sign_at(ms) != table.sign_at(ms):
+                problems.append(f"RANGE_SQL({start}, {end}) gives a different sign at {ms}")
+    return problems
+
+
+def check(table: SignTable, fixtures: str) -> tuple[int, list[str]]:
+    problems = structure_problems(table)
+    for start, sign in table.rows:
+        if sign_index(start) != sign or sign_index(start - 1) == sign:
+            problems.append(f"START {start} is not the exact ingress into {ZODIAC_ORDER[sign]}")
+    checked = 0
+    t = table.starts[0]
+    while t < table.starts[-1]:
+        checked += 1
+        if table.sign_at(t) != sign_index(t):
+            problems.append(f"{t}: table gives {ZODIAC_ORDER[table.sign_at(t)]}, series {ZODIAC_ORDER[sign_index(t)]}")
+        t += HOUR_MS
+    problems.extend(fixture_problems(table, fixtures))
+    return checked, problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build and check the MOON_SIGNS ingress table.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DB_DEFAULT, help="Path to sqlite DB")
+    sub = parser.add_subparsers(dest="command", required=True)
+    write_parser = sub.add_parser("write", parents=[common], help=f"(Re)create {TABLE} in --db")
+    write_parser.add_argument("--from-year", type=int, default=FROM_YEAR_DEFAULT, help="First year to cover")
+    write_parser.add_argument("--to-year", type=int, default=TO_YEAR_DEFAULT, help="Last year to cover")
+    check_parser = sub.add_parser("check", parents=[common], help=f"Check {TABLE} against the longitude series")
+    check_parser.add_argument("--fixtures", default=FIXTURES_DEFAULT, help="fixtures.json with expected zodiacs")
+    args = parser.parse_args()
+
+    if args.command == "write":
+        rows = ingresses(args.from_year, args.to_year)
+        conn = sqlite3.connect(args.db)
+        try:
+            with conn:
+                write_table(conn, rows)
+        finally:
+            conn.close()
+        print(f"Wrote {len(rows)} ingresses ({args.from_year}-{args.to_year}) to {TABLE} in {args.db}")
+        return 0
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    try:
+        table = SignTable.load(conn)
+        window_problems = range_problems(conn, table)
+    finally:
+        conn.close()
+    checked, problems = check(table, args.fixtures)
+    problems.extend(window_problems)
+    if problems:
+        for problem in problems[:20]:
+            print(problem, file=sys.stderr)
+        print(f"{len(problems)} problems in {TABLE}.", file=sys.stderr)
+        return 1
+    print(f"{TABLE}: {len(table.rows)} ingresses exact, {checked} hourly samples and all fixture zodiacs match")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
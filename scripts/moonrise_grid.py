@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Solve suncalc moonrises for many locations and days in one pass.
+
+- ``moon_rise`` in lunar_engine redoes the moon's ephemeris for every
+  location, day and hourly sample. Right ascension, declination and sidereal
+  time depend only on the instant, so ``grid_rises`` evaluates them once per
+  hour of the grid and shares them across every location.
+- With the hour angle split as cos(A - lw) = cos A cos lw + sin A sin lw, the
+  per-location work per sample is a few multiplies, one asin and the
+  refraction term; the per-day root search is suncalc's quadratic fit.
+- Days in a grid are consecutive 24 h windows from `start_ms`, which is what
+  ``moon_rise`` searches in UTC or any zone without a DST switch in range.
+- The CLI checks the grid against ``moon_rise`` on the fixture locations,
+  then times both over every city coordinate and reports rise-times/sec.
+
+Example:
+  python scripts/moonrise_grid.py --days 365
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from zoneinfo import ZoneInfo
+
+from lunar_engine import DAY_MS, MOON_HORIZON, RAD, _moon_coords, _to_days, day_start, js_date, moon_rise
+
+CITIES_DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+FIXTURES_DEFAULT = "scripts/fixtures.json"
+CITY_TABLES = ["CITIES_ENG", "CITIES_RU", "CITIES_JA"]
+HOUR_MS = DAY_MS / 24
+UTC = ZoneInfo("UTC")
+# Grid and scalar rises may differ by float rounding only.
+MAX_DIFF_MS = 1
+
+
+class Ephemeris:
+    """Per-instant terms of suncalc's moon altitude for hourly samples from `start_ms`."""
+
+    def __init__(self, start_ms: int, days: int) -> None:
+        self.start_ms = start_ms
+        self.days = days
+        self.sin_dec: list[float] = []
+        self.cos_dec_cos_a: list[float] = []
+        self.cos_dec_sin_a: list[float] = []
+        for j in range(24 * days + 1):
+            d = _to_days(start_ms + j * HOUR_MS)
+            ra, dec = _moon_coords(d)
+            a = RAD * (280.16 + 360.9856235 * d) - ra
+            cos_dec = math.cos(dec)
+            self.sin_dec.append(math.sin(dec))
+            self.cos_dec_cos_a.append(cos_dec * math.cos(a))
+            self.cos_dec_sin_a.append(cos_dec * math.sin(a))
+
+
+def altitudes(eph: Ephemeris, lat: float, lng: float) -> list[float]:
+    """Moon altitude minus the rise horizon at every sample of `eph` for one location."""
+    lw = RAD * -lng
+    phi = RAD * lat
+    sin_phi, cos_phi = math.sin(phi), math.cos(phi)
+    cos_lw, sin_lw = math.cos(lw), math.sin(lw)
+    out = []
+    for p, q, r in zip(eph.sin_dec, eph.cos_dec_cos_a, eph.cos_dec_sin_a):
+        # cos(H) with H = A - lw
+        h = math.asin(sin_phi * p + cos_phi * (q * cos_lw + r * sin_lw))
+        refraction_h = h if h > 0 else 0.0
+        out.append(h + 0.0002967 / math.tan(refraction_h + 0.00312536 / (refraction_h + 0.08901179)) - MOON_HORIZON)
+    return out
+
+
+def day_rise(hs: list[float], base: int) -> float | None:
+    """suncalc's getMoonTimes root search over hs[base:base + 25]; the rise as hours into the day."""
+    h0 = hs[base]
+    rise = set_ = None
+    for i in range(1, 25, 2):
+        h1 = hs[base + i]
+        h2 = hs[base + i + 1]
+        a = (h0 + h2) / 2 - h1
+        b = (h2 - h0) / 2
+        xe = -b / (2 * a)
+        ye = (a * xe + b) * xe + h1
+        d = b * b - 4 * a * h1
+        roots = 0
+        x1 = x2 = 0.0
+        if d >= 0:
+            dx = math.sqrt(d) / (abs(a) * 2)
+            x1 = xe - dx
+            x2 = xe + dx
+            if abs(x1) <= 1:
+                roots += 1
+            if abs(x2) <= 1:
+                roots += 1
+            if x1 < -1:
+                x1 = x2
+        if roots == 1:
+            if h0 < 0:
+                rise = i + x1
+            else:
+                set_ = i + x1
+        elif roots == 2:
+            rise = i + (x2 if ye < 0 else x1)
+            set_ = i + (x1 if ye < 0 else x2)
+        if rise and set_:
+            break
+        h0 = h2
+    return rise or None
+
+
+def grid_rises(locations: list[tuple[float, float]], start_ms: int, days: int) -> list[list[int | None]]:
+    """Moonrise (epoch ms, or None) for each location and each 24 h window from `start_ms`."""
+    eph = Ephemeris(start_ms, days)
+    result = []
+    for lat, lng in locations:
+        hs = altitudes(eph, lat, lng)
+        row = []
+        for k in range(days):
+            rise = day_rise(hs, 24 * k)
+            t = start_ms + k * DAY_MS
+            row.append(js_date(t + rise * DAY_MS / 24) if rise is not None else None)
+        result.append(row)
+    return result
+
+
+def scalar_rises(locations: list[tuple[float, float]], start_ms: int, days: int) -> list[list[int | None]]:
+    return [
+        [moon_rise(start_ms + k * DAY_MS, lat, lng, UTC) for k in range(days)] for lat, lng in locations
+    ]
+
+
+def compare(grid: list[list[int | None]], scalar: list[list[int | None]]) -> tuple[int, int]:
+    """(max |grid - scalar| in ms, number of days where only one side found a rise)."""
+    worst = 0
+    missing = 0
+    for grid_row, scalar_row in zip(grid, scalar):
+        for g, s in zip(grid_row, scalar_row):
+            if (g is None) != (s is None):
+                missing += 1
+            elif g is not None:
+                worst = max(worst, abs(g - s))
+    return worst, missing
+
+
+def city_locations(path: str) -> list[tuple[float, float]]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        selects = " UNION ".join(
+            f"SELECT CAST(LATITUDE AS REAL), CAST(LONGITUDE AS REAL) FROM {table}" for table in CITY_TABLES
+        )
+        return [tuple(row) for row in conn.execute(f"{selects} ORDER BY 1, 2")]
+    finally:
+        conn.close()
+
+
+def check_fixtures(path: str) -> list[str]:
+    """Grid vs scalar rises over the lunation before each fixture case, in UTC windows."""
+    with open(path, "r", encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+    problems = []
+    for case in cases:
+        start = day_start(date.fromisoformat(case["date"]) - timedelta(days=35), UTC)
+        location = [(case["latitude"], case["longitude"])]
+        worst, missing = compare(grid_rises(location, start, 40), scalar_rises(location, start, 40))
+        if worst > MAX_DIFF_MS or missing:
+            problems.append(f"[{case['id']}] grid differs from moon_rise by {worst}ms, {missing} missing rises")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Batch moonrise solver for cities x days, with a benchmark.")
+    parser.add_argument("--cities-db", default=CITIES_DB_DEFAULT, help="DB with the CITIES_* tables")
+    parser.add_argument("--fixtures", default=FIXTURES_DEFAULT, help="fixtures.json whose locations are checked")
+    parser.add_argument("--from-date", default=f"{date.today().year}-01-01", help="First UTC day (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=365, help="Number of days to solve")
+    args = parser.parse_args()
+
+    problems = check_fixtures(args.fixtures)
+    if problems:
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        return 1
+    print("grid matches moon_rise on the fixture locations")
+
+    locations = city_locations(args.cities_db)
+    start = day_start(date.fromisoformat(args.from_date), UTC)
+    started = time.perf_counter()
+    grid = grid_rises(locations, start, args.days)
+    grid_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    scalar = scalar_rises(locations, start, args.days)
+    scalar_seconds = time.perf_counter() - started
+
+    solved = len(locations) * args.days
+    worst, missing = compare(grid, scalar)
+    print(f"{len(locations)} locations x {args.days} days = {solved} rise searches")
+    print(f"grid:   {grid_seconds:.2f}s, {solved / grid_seconds:,.0f} rise-times/sec")
+    print(f"scalar: {scalar_seconds:.2f}s, {solved / scalar_seconds:,.0f} rise-times/sec")
+    print(f"speedup {scalar_seconds / grid_seconds:.1f}x, max difference {worst}ms, {missing} missing rises")
+    if worst > MAX_DIFF_MS or missing:
+        print("grid and scalar rises disagree.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
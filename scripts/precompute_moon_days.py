@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""Precompute lunar-day boundaries for every city coordinate.
+
+- Checks lunar_engine against scripts/fixtures.json first (same 60 s
+  tolerance as verify-fixtures.ts) and refuses to write anything on drift.
+- For each distinct CITIES_* coordinate and each lunation in the year range,
+  stores the lunar days exactly as lunar.ts numbers them: day 1 runs from the
+  new moon to the first moonrise after it, day n from one moonrise to the
+  next. A lunation's rows run a day past the next new moon, because lune can
+  keep dating a day in the old cycle for a few hours after it.
+- Lookups keep the cheap parts in code (lune's new moon, the per-day filter
+  and getMissingDays) and read the moonrise boundaries from MOON_DAYS.
+  Sampled lookups are replayed against the engine before the new file
+  replaces --db.
+- Moonrises are solved with moonrise_grid in UTC day windows, so one table
+  serves every device time zone. suncalc searches each local day from midnight, so around DST
+  switches a device zone can see a rise twice or miss one; sampled lookups
+  that differ only because of that are counted as zone-window artefacts, and
+  any other difference fails the run.
+- Work is split into shards by year and --chunk-size locations and fanned
+  out over --workers processes. Each shard's rows land in --work-dir under a
+  name keyed by its inputs and the solver sources, so an interrupted run
+  resumes where it stopped. Shards merge in a fixed order, and location ids
+  follow the sorted coordinates, so output does not depend on scheduling.
+- Writes to build/moon_days.db by default: one year for all 578 city
+  coordinates is about 7.8 MB, several times the bundled asset. Pass
+  --db assets/database/moon_calendar_translated_2.db to add it to the asset.
+
+Example:
+  python scripts/precompute_moon_days.py --from-year 2026 --to-year 2027
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import Callable, Iterator, NamedTuple
+from zoneinfo import ZoneInfo
+
+from lunar_engine import (
+    DAY_MS,
+    LunarDay,
+    day_start,
+    diff_days,
+    end_of_day,
+    is_day_between,
+    local_date,
+    lunar_days,
+    missing_days,
+    moon_rise,
+    new_moon_lunation,
+    new_moon_ms,
+    recent_new_moon,
+    start_of_day,
+)
+from moonrise_grid import grid_rises
+
+CITIES_DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+OUT_DEFAULT = "build/moon_days.db"
+WORK_DIR_DEFAULT = "build/moon_days_work"
+CHUNK_SIZE_DEFAULT = 32
+ENGINE_SOURCES = ["lunar_engine.py", "moonrise_grid.py"]
+FIXTURES_DEFAULT = "scripts/fixtures.json"
+TOLERANCE_MS = 60 * 1000
+CITY_TABLES = ["CITIES_ENG", "CITIES_RU", "CITIES_JA"]
+UTC = ZoneInfo("UTC")
+# Device zones the sampled lookups are checked in.
+VERIFY_ZONES = ["Europe/Moscow", "America/New_York", "Asia/Tokyo", "Australia/Sydney", "UTC"]
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS MOON_DAY_LOCATIONS ("
+    "LOCATION_ID INTEGER PRIMARY KEY, LATITUDE REAL NOT NULL, LONGITUDE REAL NOT NULL, "
+    "UNIQUE (LATITUDE, LONGITUDE))",
+    "CREATE TABLE IF NOT EXISTS MOON_DAYS ("
+    "LOCATION_ID INTEGER NOT NULL, NEW_MOON INTEGER NOT NULL, NUMBER INTEGER NOT NULL, "
+    '"START" INTEGER NOT NULL, "END" INTEGER NOT NULL, '
+    "PRIMARY KEY (LOCATION_ID, NEW_MOON, NUMBER)) WITHOUT ROWID",
+]
+
+
+def verify_fixtures(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+    problems = []
+    for case in cases:
+        day = date.fromisoformat(case["date"])
+        got = sorted(
+            lunar_days(day, case["latitude"], case["longitude"], case["timezone"]), key=lambda d: d.number
+        )
+        expected = case["expected"]["moonDays"]
+        if [d.number for d in got] != [e["number"] for e in expected]:
+            problems.append(f"[{case['id']}] days {[d.number for d in got]}, expected {[e['number'] for e in expected]}")
+            continue
+        for item, exp in zip(got, expected):
+            drift = max(abs(item.start - exp["start"]), abs(item.end - exp["end"]))
+            if drift > TOLERANCE_MS:
+                problems.append(f"[{case['id']}] day {item.number} drifts {drift}ms")
+    return problems
+
+
+def city_locations(conn: sqlite3.Connection) -> list[tuple[float, float]]:
+    selects = " UNION ".join(
+        f"SELECT CAST(LATITUDE AS REAL), CAST(LONGITUDE AS REAL) FROM {table}" for table in CITY_TABLES
+    )
+    return [tuple(row) for row in conn.execute(f"{selects} ORDER BY 1, 2")]
+
+
+def lunation_range(from_year: int, to_year: int) -> range:
+    first = new_moon_lunation(day_start(date(from_year, 1, 1), UTC), UTC)
+    last = new_moon_lunation(day_start(date(to_year, 12, 31), UTC), UTC)
+    return range(first, last + 1)
+
+
+def solve_rises(coords: list[tuple[float, float]], lunations: range) -> tuple[dict[int, int], list[list[int]]]:
+    """New moon per lunation and the sorted UTC-window moonrises of every location covering them."""
+    new_moons = {k: new_moon_ms(k) for k in range(lunations.start, lunations.stop + 1)}
+    first_day = local_date(new_moons[lunations.start], UTC)
+    last_day = local_date(new_moons[lunations.stop], UTC) + timedelta(days=3)
+    grid = grid_rises(coords, day_start(first_day, UTC), (last_day - first_day).days + 1)
+    return new_moons, [[rise for rise in row if rise is not None] for row in grid]
+
+
+def location_days(rises: list[int], new_moons: dict[int, int], lunations: range) -> list[tuple[int, int, int, int]]:
+    """(NEW_MOON, NUMBER, START, END) rows for every lunation in `lunations`."""
+    rows = []
+    for k in lunations:
+        new_moon = new_moons[k]
+        cutoff = new_moons[k + 1] + DAY_MS
+        after = [rise for rise in rises if rise > new_moon]
+        rows.append((new_moon, 1, new_moon, after[0]))
+        for i in range(len(after) - 1):
+            if after[i] >= cutoff:
+                break
+            rows.append((new_moon, i + 2, after[i], after[i + 1]))
+    return rows
+
+
+def lookup_internal(conn: sqlite3.Connection, location_id: int, ms: int, tz: ZoneInfo) -> list[LunarDay]:
+    new_moon = recent_new_moon(ms, tz, tz)
+    # getLunarDaysInternal only solves diff + 5 days of moonrises, so a day whose
+    # closing rise is further out (long polar gaps) does not exist in the app.
+    diff = diff_days(end_of_day(ms, tz), start_of_day(new_moon, tz), tz)
+    horizon = day_start(local_date(new_moon, tz) + timedelta(days=diff + 5), tz)
+    cur = conn.execute(
+        'SELECT NUMBER, "START", "END" FROM MOON_DAYS WHERE LOCATION_ID = ? AND NEW_MOON = ? '
+        'AND "START" < ? AND "END" > ? AND "END" < ? ORDER BY NUMBER',
+        (location_id, new_moon, end_of_day(ms, tz), start_of_day(ms, tz), horizon),
+    )
+    return [LunarDay(*row) for row in cur.fetchall() if is_day_between(row[1], row[2], ms, tz)]
+
+
+def lookup_lunar_days(conn: sqlite3.Connection, location_id: int, day: date, timezone: str) -> list[LunarDay]:
+    """What the app would compute for `day` by reading MOON_DAYS instead of solving moonrises."""
+    tz = ZoneInfo(timezone)
+    ms = day_start(day, tz)
+    res = lookup_internal(conn, location_id, ms, tz)
+    prev = lookup_internal(conn, location_id, day_start(day - timedelta(days=1), tz), tz)
+    return missing_days(res, prev, ms)
+
+
+def zone_window_artifact(lat: float, lng: float, day: date, timezone: str) -> bool:
+    """True when `timezone`'s day windows give a different moonrise list than UTC windows around `day`."""
+    tz = ZoneInfo(timezone)
+    lo = day_start(day - timedelta(days=35), UTC)
+    # Lookups can reach a rise up to five days past `day` (the app's diff + 5 search).
+    hi = day_start(day + timedelta(days=6), UTC)
+
+    def rises(zone: ZoneInfo) -> list[int]:
+        found = []
+        current = day - timedelta(days=37)
+        while current <= day + timedelta(days=8):
+            rise = moon_rise(day_start(current, zone), lat, lng, zone)
+            if rise is not None and lo <= rise < hi:
+                found.append(rise)
+            current += timedelta(days=1)
+        return sorted(found)
+
+    local, utc = rises(tz), rises(UTC)
+    return len(local) != len(utc) or any(abs(a - b) > TOLERANCE_MS for a, b in zip(local, utc))
+
+
+def verify_lookups(
+    conn: sqlite3.Connection,
+    locations: list[tuple[int, float, float]],
+    from_year: int,
+    to_year: int,
+    every_days: int,
+) -> tuple[Counter, list[str]]:
+    problems = []
+    counts: Counter = Counter()
+    # Skip the first and last days, whose previous/next lunation is outside the table.
+    first = date(from_year, 1, 1) + timedelta(days=2)
+    last = date(to_year, 12, 31) - timedelta(days=2)
+    for location_id, lat, lng in locations:
+        # Keyed by location id, so the sample does not depend on how locations are chunked.
+        timezone = VERIFY_ZONES[location_id % len(VERIFY_ZONES)]
+        day = first + timedelta(days=location_id % every_days)
+        while day <= last:
+            counts["checked"] += 1
+            try:
+                expected = lunar_days(day, lat, lng, timezone)
+            except IndexError:
+                # No moonrise falls on the day (polar cities); lunar.ts throws on res[0] here too.
+                counts["unsolved"] += 1
+                day += timedelta(days=every_days)
+                continue
+            try:
+                actual = lookup_lunar_days(conn, location_id, day, timezone)
+            except IndexError:
+                actual = []
+            same = [d.number for d in expected] == [d.number for d in actual] and all(
+                abs(a.start - e.start) <= TOLERANCE_MS and abs(a.end - e.end) <= TOLERANCE_MS
+                for a, e in zip(actual, expected)
+            )
+            if not same and zone_window_artifact(lat, lng, day, timezone):
+                counts["artifacts"] += 1
+            elif not same:
+                problems.append(f"({lat}, {lng}) {day} in {timezone}: {actual} != {expected}")
+            day += timedelta(days=every_days)
+    return counts, problems
+
+
+class Shard(NamedTuple):
+    year: int
+    index: int
+    first_id: int
+    coords: tuple[tuple[float, float], ...]
+    lunations: range
+
+
+def engine_digest() -> str:
+    """Hash of the solver sources, so shard outputs from an older engine are not reused."""
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in ENGINE_SOURCES:
+        with open(os.path.join(here, name), "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def plan_shards(coords: list[tuple[float, float]], from_year: int, to_year: int, chunk_size: int) -> list[Shard]:
+    """Split the work by year and by `chunk_size` locations; the lunation ranges partition the full span."""
+    shards = []
+    for year in range(from_year, to_year + 1):
+        first = lunation_range(year, year).start
+        stop = lunation_range(year + 1, year + 1).start if year < to_year else lunation_range(year, year).stop
+        for index, offset in enumerate(range(0, len(coords), chunk_size)):
+            chunk = tuple(coords[offset : offset + chunk_size])
+            shards.append(Shard(year, index, offset + 1, chunk, range(first, stop)))
+    return shards
+
+
+def shard_path(work_dir: str, shard: Shard, engine: str) -> str:
+    key = hashlib.sha256(
+        json.dumps([shard.first_id, shard.coords, shard.lunations.start, shard.lunations.stop, engine]).encode("utf-8")
+    ).hexdigest()
+    return os.path.join(work_dir, f"{shard.year}-{shard.index:04d}-{key[:16]}.json")
+
+
+def compute_shard(shard: Shard, path: str) -> str:
+    """Write the shard's MOON_DAYS rows to `path` unless a finished output is already there."""
+    if os.path.exists(path):
+        return path
+    new_moons, rises = solve_rises(list(shard.coords), shard.lunations)
+    rows = [
+        [shard.first_id + offset, *row]
+        for offset, location_rises in enumerate(rises)
+        for row in location_days(location_rises, new_moons, shard.lunations)
+    ]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return path
+
+
+def verify_chunk(
+    db: str, locations: list[tuple[int, float, float]], from_year: int, to_year: int, every_days: int
+) -> tuple[Counter, list[str]]:
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    try:
+        return verify_lookups(conn, locations, from_year, to_year, every_days)
+    finally:
+        conn.close()
+
+
+def fan_out(pool: ProcessPoolExecutor | None, fn: Callable, jobs: list[tuple]) -> Iterator:
+    """Results of fn(*job) in job order, from the pool or inline when running with one worker."""
+    if pool is None:
+        return (fn(*job) for job in jobs)
+    return pool.map(fn, *zip(*jobs)) if jobs else iter(())
+
+
+def main() -> int:
+    this_year = date.today().year
+    parser = argparse.ArgumentParser(description="Precompute lunar-day boundaries for every city.")
+    parser.add_argument("--cities-db", default=CITIES_DB_DEFAULT, help="DB with the CITIES_* tables")
+    parser.add_argument("--db", default=OUT_DEFAULT, help="DB to write MOON_DAYS into")
+    parser.add_argument("--from-year", type=int, default=this_year, help="First year to cover")
+    parser.add_argument("--to-year", type=int, default=this_year + 1, help="Last year to cover")
+    parser.add_argument("--fixtures", default=FIXTURES_DEFAULT, help="fixtures.json to verify the engine against")
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N locations (for testing)")
+    parser.add_argument(
+        "--verify-every",
+        type=int,
+        default=7,
+        help="Replay one lookup per location every N days against the engine; 0 to skip",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE_DEFAULT, help="Locations per shard (shards are also split by year)"
+    )
+    parser.add_argument("--work-dir", default=WORK_DIR_DEFAULT, help="Per-shard outputs, reused on the next run")
+    args = parser.parse_args()
+
+    problems = verify_fixtures(args.fixtures)
+    if problems:
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        print("lunar_engine does not match fixtures.json; nothing written.", file=sys.stderr)
+        return 1
+    print("lunar_engine matches fixtures.json")
+
+    src = sqlite3.connect(f"file:{args.cities_db}?mode=ro", uri=True)
+    try:
+        coords = city_locations(src)
+    finally:
+        src.close()
+    if args.limit:
+        coords = coords[: args.limit]
+    locations = [(index + 1, lat, lng) for index, (lat, lng) in enumerate(coords)]
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    engine = engine_digest()
+    shards = plan_shards(coords, args.from_year, args.to_year, max(1, args.chunk_size))
+    paths = [shard_path(args.work_dir, shard, engine) for shard in shards]
+    pending = [(shard, path) for shard, path in zip(shards, paths) if not os.path.exists(path)]
+    print(f"{len(shards)} shards, {len(shards) - len(pending)} already in {args.work_dir}")
+
+    if os.path.dirname(args.db):
+        os.makedirs(os.path.dirname(args.db), exist_ok=True)
+    work = f"{args.db}.building"
+    if os.path.exists(args.db):
+        shutil.copyfile(args.db, work)
+    elif os.path.exists(work):
+        os.remove(work)
+
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        started = time.perf_counter()
+        for done, _ in enumerate(fan_out(pool, compute_shard, pending), 1):
+            print(f"  {done}/{len(pending)} shards computed", end="\r" if done < len(pending) else "\n")
+        elapsed = time.perf_counter() - started
+
+        conn = sqlite3.connect(work)
+        try:
+            for sql in SCHEMA:
+                conn.execute(sql)
+            conn.execute("DELETE FROM MOON_DAYS")
+            conn.execute("DELETE FROM MOON_DAY_LOCATIONS")
+            conn.executemany(
+                "INSERT INTO MOON_DAY_LOCATIONS (LOCATION_ID, LATITUDE, LONGITUDE) VALUES (?, ?, ?)", locations
+            )
+            # Shards are merged in (year, chunk) order, so the same inputs give the same file.
+            for path in paths:
+                with open(path, "r", encoding="utf-8") as f:
+                    conn.executemany(
+                        'INSERT INTO MOON_DAYS (LOCATION_ID, NEW_MOON, NUMBER, "START", "END") VALUES (?, ?, ?, ?, ?)',
+                        json.load(f),
+                    )
+            conn.commit()
+            rows = conn.execute("SELECT COUNT(*) FROM MOON_DAYS").fetchone()[0]
+        finally:
+            conn.close()
+        print(f"Computed {rows} lunar days for {len(locations)} locations in {elapsed:.1f}s")
+
+        if args.verify_every:
+            size = max(1, args.chunk_size)
+            jobs = [
+                (work, locations[offset : offset + size], args.from_year, args.to_year, args.verify_every)
+                for offset in range(0, len(locations), size)
+            ]
+            counts: Counter = Counter()
+            problems = []
+            for chunk_counts, chunk_problems in fan_out(pool, verify_chunk, jobs):
+                counts.update(chunk_counts)
+                problems.extend(chunk_problems)
+            if problems:
+                for problem in problems[:20]:
+                    print(problem, file=sys.stderr)
+                print(
+                    f"{len(problems)} of {counts['checked']} sampled lookups differ from the engine; "
+                    f"{args.db} left unchanged.",
+                    file=sys.stderr,
+                )
+                return 1
+            print(
+                f"{counts['checked']} sampled lookups match the engine within {TOLERANCE_MS // 1000}s "
+                f"({counts['artifacts']} differ only by zone-window artefacts, "
+                f"{counts['unsolved']} have no moonrise for the app to use)"
+            )
+        os.replace(work, args.db)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if os.path.exists(work):
+            os.remove(work)
+
+    print(f"{args.db}: {os.path.getsize(args.db)} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
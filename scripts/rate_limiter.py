@@ -0,0 +1,134 @@
+"""Adaptive request/token rate limiter shared by the OpenAI scripts.
+
+- Two token buckets (requests/min and tokens/min) pace requests across all
+  worker threads of a script.
+- ``x-ratelimit-*`` response headers adopt the server's real quota and pause
+  until the reported reset once it is exhausted.
+- A 429/5xx halves the effective rate and honours ``Retry-After``; healthy
+  responses ramp the rate back up step by step.
+"""
+
+from __future__ import annotations
+
+import random
+import re
+import threading
+import time
+
+MIN_SCALE = 0.05
+RAMP_STEP = 0.05
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+# Buckets hold this many seconds of quota, which bounds the initial burst.
+BURST_SECONDS = 10.0
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parse ``Retry-After`` seconds or OpenAI reset values such as ``6m0s`` / ``120ms``."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, retry_after + random.uniform(0, 1))
+    return delay
+
+
+class _Bucket:
+    def __init__(self, per_minute: float | None):
+        self.per_minute = per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        if not self.per_minute:
+            return 0.0
+        return max(1.0, self.per_minute / 60.0 * BURST_SECONDS)
+
+    def refill(self, now: float, scale: float) -> None:
+        if self.per_minute:
+            rate = self.per_minute * scale / 60.0
+            self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, scale: float) -> float:
+        if not self.per_minute:
+            return 0.0
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / (self.per_minute * scale / 60.0)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: float | None = None, tokens_per_minute: float | None = None):
+        self._lock = threading.Lock()
+        self._requests = _Bucket(requests_per_minute)
+        self._tokens = _Bucket(tokens_per_minute)
+        self._scale = 1.0
+        self._paused_until = 0.0
+        self.throttled = 0
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until one request carrying roughly `tokens` tokens may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._requests.refill(now, self._scale)
+                self._tokens.refill(now, self._scale)
+                wait = max(
+                    self._paused_until - now,
+                    self._requests.wait_time(1, self._scale),
+                    self._tokens.wait_time(tokens, self._scale),
+                )
+                if wait <= 0:
+                    if self._requests.per_minute:
+                        self._requests.level -= 1
+                    if self._tokens.per_minute:
+                        self._tokens.level -= min(tokens, self._tokens.capacity)
+                    return
+            time.sleep(wait)
+
+    def on_success(self, headers: dict[str, str]) -> None:
+        with self._lock:
+            self._scale = min(1.0, self._scale + RAMP_STEP)
+            self._apply_headers(headers)
+
+    def on_throttle(self, headers: dict[str, str], retry_after: float | None) -> None:
+        with self._lock:
+            self.throttled += 1
+            self._scale = max(MIN_SCALE, self._scale / 2)
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._apply_headers(headers)
+
+    def _apply_headers(self, headers: dict[str, str]) -> None:
+        now = time.monotonic()
+        for kind, bucket in (("requests", self._requests), ("tokens", self._tokens)):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            if limit and limit.isdigit() and int(limit) > 0:
+                bucket.per_minute = float(limit)
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is not None and remaining.isdigit() and int(remaining) == 0:
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset:
+                    self._paused_until = max(self._paused_until, now + reset)
+
+    def stats(self) -> str:
+        return f"Rate limiter: {self.throttled} throttled responses, rate at {self._scale:.0%}"
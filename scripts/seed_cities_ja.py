@@ -2,25 +2,74 @@
 """Seed CITIES_JA from GeoNames top 100 populated places in Japan.
 
 Requires network access. Uses GeoNames searchJSON ordered by population.
+Places within --dedupe-km of a more populous one (wards and districts
+GeoNames lists at their city's coordinates) are dropped, so the request asks
+for a few more rows than --limit.
+
+With --dump, reads a local GeoNames export instead (cities500.txt,
+allCountries.txt, or the .zip they ship in) and needs no network or account:
+
+- The dump is streamed line by line and never loaded: each country keeps a
+  bounded min-heap of its most populous places, so memory depends on
+  --limit and the number of countries, not on the multi-GB file.
+- --countries takes several codes (or ALL); every country gets its own top
+  --limit in one pass, and all rows are bulk-inserted in one transaction.
+- Dump names are GeoNames' default (mostly romanized) names. With
+  --alternate-names (alternateNamesV2.txt or .zip), a second streamed pass
+  replaces them with the preferred --lang name of the kept places.
+- --append adds the rows after the current max INDEX, skipping places near
+  a city already in the table, instead of replacing the table.
+
+Example:
+  python scripts/seed_cities_ja.py --dump ~/geonames/cities500.zip --countries JP \\
+      --alternate-names ~/geonames/alternateNamesV2.zip
+  python scripts/seed_cities_ja.py --dump ~/geonames/allCountries.zip --countries JP KR TW \\
+      --limit 20 --append
 """
 
 from __future__ import annotations
 
 import argparse
-import json
+import contextlib
+import heapq
+import io
+import math
 import os
 import sqlite3
 import sys
-import ssl
-import urllib.parse
-import urllib.request
+import time
+import zipfile
+from typing import Iterable, Iterator, NamedTuple
+
+from city_search import refresh_cities
+from geo_index import DEDUPE_KM_DEFAULT, dedupe, fill_geohashes
+from http_client import GEONAMES_API_BASE, HttpClient
 
 DEFAULT_DB = "assets/database/moon_calendar_translated_2.db"
 DEFAULT_LIMIT = 100
+DEFAULT_TABLE = "CITIES_JA"
+CITY_TABLES = ["CITIES_ENG", "CITIES_RU", "CITIES_JA"]
+# Extra results fetched to make up for near-duplicates dropped by build_rows.
+FETCH_MARGIN = 1.2
+# Historical, abandoned and destroyed places are not somewhere a user lives.
+SKIP_CODES_DEFAULT = ["PPLH", "PPLQ", "PPLW", "PPLCH"]
+
+# Columns of the GeoNames "geoname" table dumps (readme.txt on the download server).
+GEONAME_ID, NAME, LATITUDE, LONGITUDE, FEATURE_CLASS, FEATURE_CODE, COUNTRY_CODE, POPULATION = 0, 1, 4, 5, 6, 7, 8, 14
+GEONAME_FIELDS = 19
+# Columns of alternateNamesV2.txt.
+ALT_GEONAME_ID, ALT_LANGUAGE, ALT_NAME, ALT_PREFERRED, ALT_COLLOQUIAL, ALT_HISTORIC = 1, 2, 3, 4, 6, 7
 
 
-def fetch_geonames(username: str, limit: int, lang: str, insecure: bool) -> list[dict]:
-    base_url = "https://api.geonames.org/searchJSON"
+class Place(NamedTuple):
+    geonameid: int
+    name: str
+    lng: str
+    lat: str
+    population: int
+
+
+def fetch_geonames(client: HttpClient, username: str, limit: int, lang: str) -> list[dict]:
     params = {
         "country": "JP",
         "featureClass": "P",
@@ -30,13 +79,7 @@ def fetch_geonames(username: str, limit: int, lang: str, insecure: bool) -> list
         "style": "FULL",
         "username": username,
     }
-    url = f"{base_url}?{urllib.parse.urlencode(params)}"
-    context = None
-    if insecure:
-        context = ssl._create_unverified_context()
-
-    with urllib.request.urlopen(url, timeout=30, context=context) as resp:
-        data = json.load(resp)
+    data = client.get_json("/searchJSON", params)
 
     if isinstance(data, dict) and "status" in data:
         status = data["status"]
@@ -49,23 +92,121 @@ def fetch_geonames(username: str, limit: int, lang: str, insecure: bool) -> list
     return geonames
 
 
-def ensure_table(conn: sqlite3.Connection) -> None:
+@contextlib.contextmanager
+def open_dump(path: str) -> Iterator[Iterable[str]]:
+    """Lines of a GeoNames text dump, read from the .txt or from inside its .zip."""
+    if not zipfile.is_zipfile(path):
+        with open(path, "r", encoding="utf-8", newline="\n") as f:
+            yield f
+        return
+    with zipfile.ZipFile(path) as archive:
+        # allCountries.zip holds allCountries.txt; alternateNamesV2.zip also carries iso-languagecodes.txt.
+        stem = os.path.splitext(os.path.basename(path))[0]
+        members = [name for name in archive.namelist() if name.endswith(".txt")]
+        member = f"{stem}.txt" if f"{stem}.txt" in members else members[0]
+        with archive.open(member) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8", newline="\n")
+
+
+def top_places(
+    lines: Iterable[str],
+    countries: set[str] | None,
+    feature_class: str,
+    skip_codes: set[str],
+    per_country: int,
+) -> tuple[dict[str, list[Place]], int]:
+    """The `per_country` most populous matching places of each country, by population, and the lines read."""
+    heaps: dict[str, list[tuple[int, int, Place]]] = {}
+    read = 0
+    for line in lines:
+        read += 1
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) < GEONAME_FIELDS or fields[FEATURE_CLASS] != feature_class:
+            continue
+        country = fields[COUNTRY_CODE]
+        if countries is not None and country not in countries:
+            continue
+        if fields[FEATURE_CODE] in skip_codes:
+            continue
+        name = fields[NAME].strip()
+        if not name or not fields[LATITUDE] or not fields[LONGITUDE]:
+            continue
+        population = int(fields[POPULATION] or 0)
+        heap = heaps.setdefault(country, [])
+        if len(heap) >= per_country and population < heap[0][0]:
+            continue
+        geonameid = int(fields[GEONAME_ID])
+        # Ties go to the lower geonameid, the same way on every run.
+        item = (population, -geonameid, Place(geonameid, name, fields[LONGITUDE], fields[LATITUDE], population))
+        if len(heap) < per_country:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+    return {country: [item[2] for item in sorted(heap, reverse=True)] for country, heap in heaps.items()}, read
+
+
+def preferred_names(lines: Iterable[str], geonameids: set[int], lang: str) -> dict[int, str]:
+    """The `lang` name of each place in `geonameids`: its preferred name if it has one, else the first listed."""
+    names: dict[int, tuple[bool, str]] = {}
+    for line in lines:
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) <= ALT_HISTORIC or fields[ALT_LANGUAGE] != lang:
+            continue
+        geonameid = int(fields[ALT_GEONAME_ID])
+        if geonameid not in geonameids or fields[ALT_COLLOQUIAL] == "1" or fields[ALT_HISTORIC] == "1":
+            continue
+        preferred = fields[ALT_PREFERRED] == "1"
+        if geonameid not in names or (preferred and not names[geonameid][0]):
+            names[geonameid] = (preferred, fields[ALT_NAME].strip())
+    return {geonameid: name for geonameid, (_, name) in names.items() if name}
+
+
+def ensure_table(conn: sqlite3.Connection, table: str = DEFAULT_TABLE) -> None:
     conn.execute(
-        'CREATE TABLE IF NOT EXISTS CITIES_JA ("INDEX" INTEGER, "NAME" TEXT, "LONGITUDE" TEXT, "LATITUDE" TEXT)'
+        f'CREATE TABLE IF NOT EXISTS {table} ("INDEX" INTEGER, "NAME" TEXT, "LONGITUDE" TEXT, "LATITUDE" TEXT)'
     )
 
 
-def seed_table(conn: sqlite3.Connection, rows: list[tuple[int, str, str, str]]) -> None:
-    conn.execute("DELETE FROM CITIES_JA")
-    conn.executemany(
-        'INSERT INTO CITIES_JA ("INDEX", "NAME", "LONGITUDE", "LATITUDE") VALUES (?, ?, ?, ?)', rows
-    )
+def seed_table(conn: sqlite3.Connection, rows: list[tuple[int, str, str, str]], table: str = DEFAULT_TABLE) -> None:
+    conn.execute(f"DELETE FROM {table}")
+    conn.executemany(f'INSERT INTO {table} ("INDEX", "NAME", "LONGITUDE", "LATITUDE") VALUES (?, ?, ?, ?)', rows)
+    fill_geohashes(conn, table)
+    refresh_cities(conn, table)
     conn.commit()
 
 
-def build_rows(geonames: list[dict], limit: int) -> list[tuple[int, str, str, str]]:
-    rows: list[tuple[int, str, str, str]] = []
-    for idx, item in enumerate(geonames[:limit], start=1):
+def append_rows(
+    conn: sqlite3.Connection, places: list[tuple[str, str, str]], table: str, dedupe_km: float
+) -> list[tuple[int, str, str, str]]:
+    """Insert `places` after the current max INDEX, skipping those near a city already in `table`."""
+    existing = [(float(lat), float(lng)) for lat, lng in conn.execute(f'SELECT "LATITUDE", "LONGITUDE" FROM {table}')]
+    points = existing + [(float(lat), float(lng)) for _, lng, lat in places]
+    kept = [i - len(existing) for i in dedupe(points, dedupe_km, keep=len(existing)) if i >= len(existing)]
+    if len(kept) < len(places):
+        print(f"Skipped {len(places) - len(kept)} places within {dedupe_km} km of a city in {table}.", file=sys.stderr)
+    start = conn.execute(f'SELECT COALESCE(MAX("INDEX"), 0) FROM {table}').fetchone()[0] + 1
+    rows = [(idx, *places[i]) for idx, i in enumerate(kept, start=start)]
+    conn.executemany(f'INSERT INTO {table} ("INDEX", "NAME", "LONGITUDE", "LATITUDE") VALUES (?, ?, ?, ?)', rows)
+    fill_geohashes(conn, table)
+    refresh_cities(conn, table)
+    conn.commit()
+    return rows
+
+
+def pick_places(places: list[tuple[str, str, str]], limit: int, dedupe_km: float) -> list[tuple[str, str, str]]:
+    """The first `limit` (name, lng, lat) places that are not within `dedupe_km` of an earlier one."""
+    # Places come ordered by population, so the place kept from a near-duplicate group is the largest.
+    kept = dedupe([(float(lat), float(lng)) for _, lng, lat in places], dedupe_km)
+    if len(kept) < len(places):
+        print(f"Dropped {len(places) - len(kept)} places within {dedupe_km} km of a larger one.", file=sys.stderr)
+    return [places[i] for i in kept[:limit]]
+
+
+def build_rows(
+    geonames: list[dict], limit: int, dedupe_km: float = DEDUPE_KM_DEFAULT
+) -> list[tuple[int, str, str, str]]:
+    places: list[tuple[str, str, str]] = []
+    for item in geonames:
         name = (item.get("name") or "").strip()
         if not name:
             name = (item.get("toponymName") or "").strip()
@@ -75,7 +216,9 @@ def build_rows(geonames: list[dict], limit: int) -> list[tuple[int, str, str, st
         lng = item.get("lng")
         if lat is None or lng is None:
             continue
-        rows.append((idx, name, str(lng), str(lat)))
+        places.append((name, str(lng), str(lat)))
+
+    rows = [(idx, *place) for idx, place in enumerate(pick_places(places, limit, dedupe_km), start=1)]
 
     if len(rows) < limit:
         raise RuntimeError(f"Only built {len(rows)} rows (expected {limit}).")
@@ -83,6 +226,35 @@ def build_rows(geonames: list[dict], limit: int) -> list[tuple[int, str, str, st
     return rows
 
 
+def dump_places(args: argparse.Namespace) -> list[tuple[str, str, str]]:
+    """(name, lng, lat) of the top places per country in the dump, countries in --countries order."""
+    countries = None if args.countries == ["ALL"] else {code.upper() for code in args.countries}
+    started = time.perf_counter()
+    with open_dump(args.dump) as lines:
+        by_country, read = top_places(
+            lines, countries, args.feature_class, set(args.skip_codes), math.ceil(args.limit * FETCH_MARGIN)
+        )
+    print(f"Read {read:,} lines from {args.dump} in {time.perf_counter() - started:.1f}s.")
+    if countries is not None and countries - set(by_country):
+        print(f"No places for {', '.join(sorted(countries - set(by_country)))}.", file=sys.stderr)
+
+    names: dict[int, str] = {}
+    if args.alternate_names:
+        wanted = {place.geonameid for places in by_country.values() for place in places}
+        with open_dump(args.alternate_names) as lines:
+            names = preferred_names(lines, wanted, args.lang)
+        print(f"Found {args.lang} names for {len(names)} of {len(wanted)} places.")
+
+    order = sorted(by_country) if countries is None else [c.upper() for c in args.countries if c.upper() in by_country]
+    places: list[tuple[str, str, str]] = []
+    for country in order:
+        candidates = [(names.get(p.geonameid, p.name), p.lng, p.lat) for p in by_country[country]]
+        picked = pick_places(candidates, args.limit, args.dedupe_km)
+        print(f"{country}: {len(picked)} places")
+        places.extend(picked)
+    return places
+
+
 def write_csv(path: str, rows: list[tuple[int, str, str, str]]) -> None:
     import csv
 
@@ -93,37 +265,69 @@ def write_csv(path: str, rows: list[tuple[int, str, str, str]]) -> None:
 
 
 def main() -> int:
-    parser = argparse.ArgumentParser(description="Seed CITIES_JA from GeoNames API.")
+    parser = argparse.ArgumentParser(description="Seed CITIES_JA from GeoNames API or a local GeoNames dump.")
     parser.add_argument("--db", default=DEFAULT_DB, help="SQLite database path")
+    parser.add_argument("--table", choices=CITY_TABLES, default=DEFAULT_TABLE, help="City table to fill")
     parser.add_argument(
         "--username",
         default=os.getenv("GEONAMES_USERNAME", "astrocbeeapps"),
         help="GeoNames username (env GEONAMES_USERNAME). Default: demo",
     )
-    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--api-base", default=GEONAMES_API_BASE, help="GeoNames API base URL")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="Places to keep (per country with --dump)")
     parser.add_argument("--lang", default="ja", help="Language for place names")
+    parser.add_argument(
+        "--dedupe-km",
+        type=float,
+        default=DEDUPE_KM_DEFAULT,
+        help="Drop places within this distance of a more populous one",
+    )
     parser.add_argument(
         "--insecure",
         action="store_true",
         help="Disable SSL verification (workaround for local SSL issues).",
     )
     parser.add_argument("--csv", help="Optional CSV output path")
+    parser.add_argument("--dump", help="Local GeoNames dump (.txt or .zip) to read instead of the API")
+    parser.add_argument("--countries", nargs="+", default=["JP"], help="Country codes to take from --dump, or ALL")
+    parser.add_argument("--feature-class", default="P", help="GeoNames feature class to keep from --dump")
+    parser.add_argument(
+        "--skip-codes",
+        nargs="*",
+        default=SKIP_CODES_DEFAULT,
+        help="Feature codes to leave out of --dump results",
+    )
+    parser.add_argument("--alternate-names", help="alternateNamesV2 dump supplying --lang names for --dump places")
+    parser.add_argument("--append", action="store_true", help="Add to the table instead of replacing its rows")
     args = parser.parse_args()
 
-    geonames = fetch_geonames(args.username, args.limit, args.lang, args.insecure)
-    rows = build_rows(geonames, args.limit)
+    if args.dump:
+        places = dump_places(args)
+        if not places:
+            raise RuntimeError(f"No places in {args.dump} for {' '.join(args.countries)}.")
+    else:
+        client = HttpClient(args.api_base, timeout=30, insecure=args.insecure)
+        try:
+            geonames = fetch_geonames(client, args.username, math.ceil(args.limit * FETCH_MARGIN), args.lang)
+        finally:
+            client.close()
+        places = [row[1:] for row in build_rows(geonames, args.limit, args.dedupe_km)]
 
     conn = sqlite3.connect(args.db)
     try:
-        ensure_table(conn)
-        seed_table(conn, rows)
+        ensure_table(conn, args.table)
+        if args.append:
+            rows = append_rows(conn, places, args.table, args.dedupe_km)
+        else:
+            rows = [(idx, *place) for idx, place in enumerate(places, start=1)]
+            seed_table(conn, rows, args.table)
     finally:
         conn.close()
 
     if args.csv:
         write_csv(args.csv, rows)
 
-    print(f"Seeded CITIES_JA with {len(rows)} rows.")
+    print(f"{'Appended' if args.append else 'Seeded'} {len(rows)} rows to {args.table}.")
     return 0
 
 
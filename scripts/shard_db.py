@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Split the bundled DB into one shard per locale.
+
+- Each shard holds the shared tables plus that locale's tables
+  (MOON_DAY_INFO_*, CITIES_*, ZODIAC_INFO_*, ZODIAC_GARDEN_*, ...), with the
+  original table names, indexes and page size, so content.ts queries run on a
+  shard unchanged.
+- Shared tables keyed by a LOCALE column (CITY_LIST, CITY_SEARCH) keep only
+  the shard locale's rows.
+- Every copied table is checked against the source before the shard is kept.
+- manifest.json lists each shard's file, size, sha256 and per-table row counts.
+- The output directory sits outside assets/ on purpose: app.json bundles
+  everything under assets/, and the app still opens the full DB.
+
+Example:
+  python scripts/shard_db.py --db assets/database/moon_calendar_translated_2.db --out-dir build/db_shards
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+
+from build_db import table_digest
+from migrate_schema import LOCALE_SUFFIXES
+
+DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+OUT_DIR_DEFAULT = "build/db_shards"
+MANIFEST_NAME = "manifest.json"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def table_locale(table: str) -> str | None:
+    for locale, suffix in LOCALE_SUFFIXES.items():
+        if table.endswith(f"_{suffix}"):
+            return locale
+    return None
+
+
+def shard_tables(conn: sqlite3.Connection, locale: str) -> list[str]:
+    """Tables belonging to `locale` plus every table without a locale suffix."""
+    cur = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )
+    return [name for (name,) in cur.fetchall() if table_locale(name) in (None, locale)]
+
+
+def has_locale_column(conn: sqlite3.Connection, table: str) -> bool:
+    return any(row[1] == "LOCALE" for row in conn.execute(f"PRAGMA table_info('{table}')"))
+
+
+def copy_filter(conn: sqlite3.Connection, table: str, locale: str) -> tuple[str, tuple]:
+    """WHERE clause and params selecting the rows of `table` that belong in the `locale` shard."""
+    if has_locale_column(conn, table):
+        return " WHERE LOCALE = ?", (locale,)
+    return "", ()
+
+
+def build_shard(source: str, path: str, locale: str) -> dict[str, int]:
+    """Write the shard for `locale` to `path` and return its row count per table."""
+    if os.path.exists(path):
+        os.remove(path)
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    dst = sqlite3.connect(path)
+    try:
+        page_size = src.execute("PRAGMA page_size").fetchone()[0]
+        dst.execute(f"PRAGMA page_size = {page_size}")
+        dst.execute("ATTACH DATABASE ? AS src", (f"file:{source}?mode=ro",))
+        tables = shard_tables(src, locale)
+        counts = {}
+        dst.execute("BEGIN")
+        for table in tables:
+            (create_sql,) = src.execute(
+                "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)
+            ).fetchone()
+            dst.execute(create_sql)
+            where, params = copy_filter(src, table, locale)
+            dst.execute(f'INSERT INTO main."{table}" SELECT * FROM src."{table}"{where}', params)
+            cur = src.execute(
+                "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL", (table,)
+            )
+            for (index_sql,) in cur.fetchall():
+                dst.execute(index_sql)
+            counts[table] = dst.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        dst.execute("COMMIT")
+        dst.execute("DETACH DATABASE src")
+
+        for table in tables:
+            if table_digest(dst, table) != table_digest(src, table, *copy_filter(src, table, locale)):
+                raise RuntimeError(f"{locale} shard: {table} does not match the source")
+
+        dst.execute("ANALYZE")
+        dst.commit()
+        dst.execute("VACUUM")
+    finally:
+        dst.close()
+        src.close()
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Split the DB asset into per-locale shards with a manifest.")
+    parser.add_argument("--db", default=DB_DEFAULT, help="Full multi-locale DB")
+    parser.add_argument("--out-dir", default=OUT_DIR_DEFAULT, help="Directory for shards and manifest.json")
+    parser.add_argument(
+        "--locales",
+        nargs="*",
+        choices=list(LOCALE_SUFFIXES),
+        default=list(LOCALE_SUFFIXES),
+        help="Locales to build shards for",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"{args.db} not found.", file=sys.stderr)
+        return 1
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    stem = os.path.splitext(os.path.basename(args.db))[0]
+    full_size = os.path.getsize(args.db)
+    manifest = {
+        "source": os.path.basename(args.db),
+        "source_bytes": full_size,
+        "source_sha256": file_sha256(args.db),
+        "shards": {},
+    }
+    for locale in args.locales:
+        name = f"{stem}_{locale}.db"
+        path = os.path.join(args.out_dir, name)
+        counts = build_shard(args.db, path, locale)
+        size = os.path.getsize(path)
+        manifest["shards"][locale] = {
+            "file": name,
+            "bytes": size,
+            "sha256": file_sha256(path),
+            "tables": counts,
+        }
+        print(f"{locale}: {path} {size} bytes ({100 * size / full_size:.0f}% of full), {len(counts)} tables")
+
+    manifest_path = os.path.join(args.out_dir, MANIFEST_NAME)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, manifest_path)
+    print(f"Manifest written to {manifest_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""Translate every content table into several locales in one run.
+
+- CONTENT_TABLES lists the translatable tables (MOON_DAY_INFO, ZODIAC_INFO,
+  ZODIAC_GARDEN, GARDEN_INFO, CITIES) with their key and text columns and a
+  default source table; --source BASE=TABLE picks another source.
+- For each (table, locale) pair the source cells not already in the
+  translation cache are packed into token-budgeted batches, one row per
+  batch where it fits. All (table, locale, batch) work items then share one
+  thread pool (--concurrency), one RateLimiter (--rpm/--tpm) and an optional
+  --max-tokens budget for the run; items beyond the budget are left for the
+  next run.
+- Work items are interleaved across pairs, so every locale advances together,
+  and progress is printed per locale as batches finish.
+- Only rows missing from the target are translated, so curated tables such
+  as MOON_DAY_INFO_RU are left alone; --overwrite retranslates and replaces
+  rows by key. CITIES rows are matched by location instead: source cities
+  within --dedupe-km of one already in the target are skipped (as
+  translate_cities_to_ja does) and the rest appended.
+- A pair's target table is written, in one transaction, as soon as its last
+  batch is back.
+- Each batch is cached as soon as it returns, so an interrupted run resumes
+  by rerunning the same command. --plan prints the work without calling the
+  API.
+
+Requires OPENAI_API_KEY (or --api-key) unless --plan is given.
+
+Example:
+  python scripts/translate_all.py --locales de fr es --plan
+  python scripts/translate_all.py --locales ja de fr=French --concurrency 4 --tpm 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, NamedTuple
+
+from batching import BatchResponseError, bisect_batch, item_tokens, pack_groups
+from city_search import refresh_cities
+from geo_index import DEDUPE_KM_DEFAULT, dedupe, fill_geohashes
+from http_client import OPENAI_API_BASE, HttpClient, openai_client
+from rate_limiter import RateLimiter
+from translate_moon_day_info import call_openai, extract_json, load_env_file
+from translation_cache import CACHE_DEFAULT, CacheScope, TranslationCache, open_cache
+
+DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
+MODEL_DEFAULT = "gpt-4.1-mini"
+ENV_DEFAULT = "scripts/.env"
+TOKEN_BUDGET_DEFAULT = 3000
+# Bump whenever the system prompt changes so cached translations are not reused.
+PROMPT_VERSION = "content-v1"
+
+LANGUAGES = {
+    "en": "English",
+    "ru": "Russian",
+    "ja": "Japanese",
+    "de": "German",
+    "fr": "French",
+    "es": "Spanish",
+    "it": "Italian",
+    "pt": "Portuguese",
+    "uk": "Ukrainian",
+    "pl": "Polish",
+    "tr": "Turkish",
+    "ko": "Korean",
+    "zh": "Simplified Chinese",
+}
+# Table suffixes the app already uses; other locales use their upper-cased code.
+LEGACY_SUFFIXES = {"en": "ENG", "ru": "RU", "ja": "JA"}
+
+
+class ContentTable(NamedTuple):
+    base: str
+    key: str
+    columns: list[str] | None
+    source: str
+    hint: str
+    append: bool = False
+
+
+# `columns` None means every column except the key.
+CONTENT_TABLES = [
+    ContentTable("MOON_DAY_INFO", "MOON_DATE_NUMBER", None, "MOON_DAY_INFO_ENG", "Lunar calendar day descriptions."),
+    ContentTable("ZODIAC_INFO", "ZODIAC", ["NAME", "INFO"], "ZODIAC_INFO_ENG", "Zodiac sign names and descriptions."),
+    ContentTable(
+        "ZODIAC_GARDEN", "ZODIAC", ["NAME", "INFO"], "ZODIAC_GARDEN_RU", "Gardening advice for the Moon's zodiac sign."
+    ),
+    ContentTable("GARDEN_INFO", "NUMBER", ["INFO"], "GARDEN_INFO_RU", "Gardening advice per lunar day."),
+    ContentTable(
+        "CITIES", "INDEX", ["NAME"], "CITIES_ENG", "City names: use the most common exonym.", append=True
+    ),
+]
+
+Cell = tuple[tuple[str, str], str]
+
+
+class Locale(NamedTuple):
+    code: str
+    language: str
+    suffix: str
+
+
+class Job(NamedTuple):
+    """One (table, locale) pair: the source rows, the cells still to translate, and its batches."""
+
+    table: ContentTable
+    locale: Locale
+    source: str
+    target: str
+    scope: CacheScope
+    rows: list[dict[str, Any]]
+    columns: list[str]
+    done: dict[tuple[str, str], str]
+    batches: list[list[Cell]]
+
+
+def parse_locale(spec: str) -> Locale:
+    code, _, language = spec.partition("=")
+    code = code.strip().lower()
+    language = language.strip() or LANGUAGES.get(code, "")
+    if not language:
+        raise SystemExit(f"Unknown locale {code!r}: pass it as {code}=<Language name>")
+    return Locale(code, language, LEGACY_SUFFIXES.get(code, code.upper()))
+
+
+def source_locale(table: str) -> Locale:
+    suffix = table.rsplit("_", 1)[-1]
+    code = next((code for code, legacy in LEGACY_SUFFIXES.items() if legacy == suffix), suffix.lower())
+    return parse_locale(code)
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info('{table}')")]
+
+
+def create_like(conn: sqlite3.Connection, source: str, target: str) -> None:
+    """Create `target` with `source`'s definition and indexes, renamed to `target`.
+
+    Missing indexes are added even when `target` already exists.
+    """
+    if not table_columns(conn, target):
+        (sql,) = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (source,)).fetchone()
+        sql = re.sub(rf'^CREATE TABLE (IF NOT EXISTS )?("?){source}\2', f'CREATE TABLE "{target}"', sql, count=1)
+        conn.execute(sql)
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (source,)
+    ).fetchall()
+    for name, sql in indexes:
+        # CITIES_ENG_NAME -> CITIES_DE_NAME
+        index = target + name[len(source) :] if name.startswith(source) else f"{target}_{name}"
+        sql, renamed = re.subn(
+            rf'^CREATE (UNIQUE )?INDEX (IF NOT EXISTS )?("?){re.escape(name)}\3 ON ("?){source}\4',
+            lambda m: f'CREATE {m.group(1) or ""}INDEX IF NOT EXISTS "{index}" ON "{target}"',
+            sql,
+            count=1,
+        )
+        if renamed:
+            conn.execute(sql)
+
+
+def fetch_rows(conn: sqlite3.Connection, table: str) -> list[dict[str, Any]]:
+    cur = conn.execute(f'SELECT * FROM "{table}"')
+    names = [d[0] for d in cur.description]
+    return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def new_cities(
+    conn: sqlite3.Connection, rows: list[dict[str, Any]], target: str, dedupe_km: float
+) -> list[dict[str, Any]]:
+    """Source cities not within `dedupe_km` of a city already in `target` or of an earlier source city."""
+    existing = []
+    if table_columns(conn, target):
+        existing = [
+            (float(lat), float(lng)) for lat, lng in conn.execute(f'SELECT "LATITUDE", "LONGITUDE" FROM {target}')
+        ]
+    points = existing + [(float(row["LATITUDE"]), float(row["LONGITUDE"])) for row in rows]
+    return [rows[i - len(existing)] for i in dedupe(points, dedupe_km, keep=len(existing)) if i >= len(existing)]
+
+
+def plan_job(
+    conn: sqlite3.Connection,
+    table: ContentTable,
+    source: str,
+    locale: Locale,
+    cache: TranslationCache,
+    model: str,
+    token_budget: int,
+    dedupe_km: float,
+    overwrite: bool,
+) -> Job:
+    target = f"{table.base}_{locale.suffix}"
+    scope = cache.scope(model, source_locale(source).language, locale.language, f"{PROMPT_VERSION}:{table.base}")
+    rows = fetch_rows(conn, source)
+    if table.append:
+        rows = new_cities(conn, rows, target, dedupe_km)
+    elif not overwrite and table_columns(conn, target):
+        present = {str(key) for (key,) in conn.execute(f'SELECT "{table.key}" FROM {target}')}
+        rows = [row for row in rows if str(row[table.key]) not in present]
+    columns = table.columns or [col for col in table_columns(conn, source) if col != table.key]
+    done: dict[tuple[str, str], str] = {}
+    groups: list[list[Cell]] = []
+    for row in rows:
+        missing: list[Cell] = []
+        for col in columns:
+            text = row.get(col) or ""
+            cached = scope.get(text) if text else ""
+            if cached is None:
+                missing.append(((str(row[table.key]), col), text))
+            else:
+                done[(str(row[table.key]), col)] = cached
+        groups.append(missing)
+    return Job(table, locale, source, target, scope, rows, columns, done, pack_groups(groups, token_budget))
+
+
+def batch_tokens(batch: list[Cell]) -> int:
+    return sum(item_tokens(text) for _, text in batch)
+
+
+def interleave(jobs: list[Job]) -> list[tuple[Job, list[Cell]]]:
+    """Work items round-robin across jobs, so no locale waits for another to finish."""
+    items = []
+    for i in range(max((len(job.batches) for job in jobs), default=0)):
+        items.extend((job, job.batches[i]) for job in jobs if i < len(job.batches))
+    return items
+
+
+def translate_batch(client: HttpClient, model: str, job: Job, batch: list[Cell]) -> dict[tuple[str, str], str]:
+    source_language = source_locale(job.source).language
+    system = (
+        f"You are a professional translator. Translate from {source_language} to {job.locale.language}. "
+        f"{job.table.hint} The input is a JSON object keyed by row id; each value maps field names to text. "
+        "Preserve meaning, tone, bullet points and line breaks. "
+        "Return ONLY valid JSON with the exact same keys and nesting."
+    )
+
+    def attempt(cells: list[Cell]) -> list[str]:
+        payload: dict[str, dict[str, str]] = {}
+        for (key, col), text in cells:
+            payload.setdefault(key, {})[col] = text
+        result = extract_json(call_openai(client, model, system, json.dumps(payload, ensure_ascii=False)))
+        values = []
+        for (key, col), _ in cells:
+            fields = result.get(key) if isinstance(result, dict) else None
+            value = fields.get(col) if isinstance(fields, dict) else None
+            if not isinstance(value, str) or not value.strip():
+                raise BatchResponseError(f"No translation for {key}/{col}")
+            values.append(value)
+        return values
+
+    def flag(cell: Cell, exc: Exception) -> None:
+        print(f"Could not translate {job.target} {cell[0][0]}/{cell[0][1]}: {exc}", file=sys.stderr)
+        return None
+
+    translated = {}
+    for (cell_key, text), value in zip(batch, bisect_batch(batch, attempt, flag)):
+        if value is not None:
+            job.scope.put(text, value)
+            translated[cell_key] = value
+    return translated
+
+
+def write_job(conn: sqlite3.Connection, job: Job) -> tuple[int, int]:
+    """Write the job's fully translated rows to its target table; returns (rows written, cells missing)."""
+    key = job.table.key
+    missing = 0
+    rows = []
+    for row in job.rows:
+        values = {col: job.done.get((str(row[key]), col)) for col in job.columns}
+        untranslated = sum(value is None for value in values.values())
+        # A partly translated row is left out rather than written in the source language, so a rerun retries it.
+        if untranslated:
+            missing += untranslated
+            continue
+        rows.append({**row, **values})
+
+    with conn:
+        create_like(conn, job.source, job.target)
+        columns = [col for col in table_columns(conn, job.target) if col in table_columns(conn, job.source)]
+        if job.table.append:
+            start = conn.execute(f'SELECT COALESCE(MAX("{key}"), 0) FROM {job.target}').fetchone()[0] + 1
+            for idx, row in enumerate(rows, start=start):
+                row[key] = idx
+        else:
+            conn.executemany(f'DELETE FROM {job.target} WHERE "{key}" = ?', [(row[key],) for row in rows])
+        names = ", ".join(f'"{col}"' for col in columns)
+        conn.executemany(
+            f"INSERT INTO {job.target} ({names}) VALUES ({', '.join('?' for _ in columns)})",
+            [tuple(row.get(col) for col in columns) for row in rows],
+        )
+        if job.table.base == "CITIES":
+            fill_geohashes(conn, job.target)
+            refresh_cities(conn, job.target)
+    return len(rows), missing
+
+
+def print_plan(jobs: list[Job], deferred: list[tuple[Job, list[Cell]]]) -> None:
+    print(f"{'table':<22}{'source':<20}{'rows':>6}{'cached':>8}{'cells':>7}{'batches':>9}{'~tokens':>9}")
+    for job in jobs:
+        cells = sum(len(batch) for batch in job.batches)
+        tokens = sum(batch_tokens(batch) for batch in job.batches)
+        print(
+            f"{job.target:<22}{job.source:<20}{len(job.rows):>6}{len(job.done):>8}{cells:>7}"
+            f"{len(job.batches):>9}{tokens:>9}"
+        )
+    if deferred:
+        print(f"{len(deferred)} batches are over --max-tokens and left for the next run.")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Translate all content tables into several locales.")
+    parser.add_argument("--db", default=DB_DEFAULT, help="Path to sqlite DB")
+    parser.add_argument("--locales", nargs="+", required=True, help="Target locales, e.g. ja de fr=French")
+    parser.add_argument(
+        "--tables",
+        nargs="*",
+        choices=[table.base for table in CONTENT_TABLES],
+        default=[table.base for table in CONTENT_TABLES],
+        help="Content tables to translate",
+    )
+    parser.add_argument("--source", nargs="*", default=[], help="Override a source table: BASE=TABLE")
+    parser.add_argument("--env", default=ENV_DEFAULT, help="Path to .env file")
+    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY"))
+    parser.add_argument("--api-base", default=OPENAI_API_BASE, help="OpenAI-compatible API base URL")
+    parser.add_argument("--model", default=MODEL_DEFAULT)
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight across all locales")
+    parser.add_argument("--rpm", type=float, default=None, help="Requests per minute (default: from API headers)")
+    parser.add_argument("--tpm", type=float, default=None, help="Tokens per minute (default: from API headers)")
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=TOKEN_BUDGET_DEFAULT,
+        help="Estimated source tokens packed into one request",
+    )
+    parser.add_argument("--max-tokens", type=int, default=None, help="Estimated source tokens to send in this run")
+    parser.add_argument(
+        "--dedupe-km",
+        type=float,
+        default=DEDUPE_KM_DEFAULT,
+        help="Skip source cities within this distance of one in the target",
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Retranslate rows already in the target tables (cities are always matched by location)",
+    )
+    parser.add_argument("--cache", default=CACHE_DEFAULT, help="Translation cache file")
+    parser.add_argument("--cache-max-mb", type=float, default=None, help="Evict cache entries beyond this size")
+    parser.add_argument("--plan", action="store_true", help="Print the work items and exit")
+    args = parser.parse_args()
+
+    locales = [parse_locale(spec) for spec in args.locales]
+    sources = {table.base: table.source for table in CONTENT_TABLES}
+    for spec in args.source:
+        base, _, source = spec.partition("=")
+        if base not in sources or not source:
+            parser.error(f"--source expects BASE=TABLE with BASE one of {', '.join(sources)}")
+        sources[base] = source
+
+    load_env_file(args.env)
+    if not args.api_key:
+        args.api_key = os.getenv("OPENAI_API_KEY")
+    if not args.plan and not args.api_key:
+        raise SystemExit("Missing OPENAI_API_KEY or --api-key")
+
+    cache = open_cache(args.cache, args.cache_max_mb)
+    conn = sqlite3.connect(args.db)
+    try:
+        jobs = []
+        for table in CONTENT_TABLES:
+            if table.base not in args.tables:
+                continue
+            source = sources[table.base]
+            if not table_columns(conn, source):
+                print(f"[skip] {table.base}: no source table {source}", file=sys.stderr)
+                continue
+            for locale in locales:
+                if f"{table.base}_{locale.suffix}" == source:
+                    continue
+                jobs.append(
+                    plan_job(
+                        conn,
+                        table,
+                        source,
+                        locale,
+                        cache,
+                        args.model,
+                        args.token_budget,
+                        args.dedupe_km,
+                        args.overwrite,
+                    )
+                )
+
+        items = interleave(jobs)
+        deferred: list[tuple[Job, list[Cell]]] = []
+        if args.max_tokens is not None:
+            spent = 0
+            scheduled = []
+            for job, batch in items:
+                if spent + batch_tokens(batch) > args.max_tokens:
+                    deferred.append((job, batch))
+                    continue
+                spent += batch_tokens(batch)
+                scheduled.append((job, batch))
+            items = scheduled
+        print_plan(jobs, deferred)
+        if args.plan:
+            return 0
+
+        limiter = RateLimiter(args.rpm, args.tpm)
+        client = openai_client(args.api_key, args.api_base, timeout=120, limiter=limiter)
+        total = Counter(job.locale.code for job, batch in items for _ in batch)
+        finished: Counter[str] = Counter()
+        remaining = Counter(id(job) for job, _ in items)
+        blocked = {id(job) for job, _ in deferred}
+        written = tables = missing = 0
+        try:
+            # Jobs served entirely from the cache are written before the first request.
+            ready = [job for job in jobs if job.rows and remaining[id(job)] == 0 and id(job) not in blocked]
+            with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+                futures: dict[Future, tuple[Job, list[Cell]]] = {
+                    pool.submit(translate_batch, client, args.model, job, batch): (job, batch) for job, batch in items
+                }
+                try:
+                    while ready or futures:
+                        for job in ready:
+                            rows, untranslated = write_job(conn, job)
+                            written += rows
+                            tables += bool(rows)
+                            missing += untranslated
+                            print(f"Wrote {rows} rows to {job.target}")
+                        ready = []
+                        if not futures:
+                            break
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            job, batch = futures.pop(future)
+                            try:
+                                job.done.update(future.result())
+                            except Exception as exc:
+                                # Not a bad batch (bisect_batch handles those) but an API or network failure that
+                                # outlasted the client's retries: stop instead of spending quota on the queue.
+                                print(
+                                    f"{job.target}: a batch failed ({exc}). Stopping; finished batches are cached, "
+                                    "so rerunning the same command resumes.",
+                                    file=sys.stderr,
+                                )
+                                raise
+                            finished[job.locale.code] += len(batch)
+                            code = job.locale.code
+                            print(f"[{code}] {finished[code]}/{total[code]} cells ({finished[code] / total[code]:.0%})")
+                            remaining[id(job)] -= 1
+                            if remaining[id(job)] == 0 and id(job) not in blocked:
+                                ready.append(job)
+                finally:
+                    # Only requests already in flight are waited for when the pool exits.
+                    for future in futures:
+                        future.cancel()
+        finally:
+            client.close()
+        print(cache.stats())
+        print(limiter.stats())
+    finally:
+        conn.close()
+        cache.close()
+
+    print(f"Done: {written} rows written to {tables} tables.")
+    if missing:
+        print(f"{missing} cells could not be translated and their rows were not written; rerun to retry them.")
+    if deferred:
+        print("Rerun the same command to translate the batches left over --max-tokens.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
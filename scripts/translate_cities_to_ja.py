@@ -2,7 +2,9 @@
 """Translate CITIES_ENG names to Japanese and append to CITIES_JA.
 
 - Skips Tokyo (already in top 100).
-- Skips duplicates by longitude/latitude already in CITIES_JA.
+- Skips cities within --dedupe-km of a city already in CITIES_JA or of an
+  earlier candidate (geo_index.dedupe), so re-runs and near-identical
+  coordinates do not add duplicates.
 - Appends after the current max INDEX in CITIES_JA.
 - Writes CSV for review.
 
@@ -15,12 +17,19 @@ import argparse
 import json
 import os
 import sqlite3
-import time
-import urllib.request
+import sys
+
+from batching import bisect_batch, item_tokens, pack_by_budget
+from city_search import refresh_cities
+from geo_index import DEDUPE_KM_DEFAULT, dedupe, fill_geohashes
+from http_client import OPENAI_API_BASE, HttpClient, openai_client
+from rate_limiter import RateLimiter
+from translation_cache import CACHE_DEFAULT, CacheScope, open_cache
 
 DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
 MODEL_DEFAULT = "gpt-4.1-mini"
 ENV_DEFAULT = "scripts/.env"
+PROMPT_VERSION = "cities-v2"
 
 
 def load_env_file(path: str) -> None:
@@ -38,13 +47,13 @@ def load_env_file(path: str) -> None:
                 os.environ[key] = value
 
 
-def openai_post(api_key: str, model: str, names: list[str]) -> list[str]:
+def openai_post(client: HttpClient, model: str, names: list[str]) -> list[str]:
     system = (
         "You are a precise translator. Translate English city names to Japanese. "
         "Return ONLY a JSON array of strings in the same order. "
         "Use the most common Japanese exonyms. No extra text."
     )
-    user = {"type": "input_text", "text": "Cities: " + ", ".join(names)}
+    user = {"type": "input_text", "text": "Cities: " + json.dumps(names, ensure_ascii=False)}
     payload = {
         "model": model,
         "input": [
@@ -54,18 +63,7 @@ def openai_post(api_key: str, model: str, names: list[str]) -> list[str]:
         "temperature": 0.2,
     }
 
-    req = urllib.request.Request(
-        "https://api.openai.com/v1/responses",
-        data=json.dumps(payload).encode("utf-8"),
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-        method="POST",
-    )
-
-    with urllib.request.urlopen(req, timeout=60) as resp:
-        data = json.load(resp)
+    data = client.post_json("/responses", payload)
 
     # Extract text from responses API
     text_chunks = []
@@ -83,14 +81,40 @@ def openai_post(api_key: str, model: str, names: list[str]) -> list[str]:
     return json.loads(text[start : end + 1])
 
 
+def translate_names(client: HttpClient, model: str, names: list[str], cache: CacheScope) -> list[str | None]:
+    """Translate `names`; a name that cannot be translated even on its own comes back as None."""
+    results = [cache.get(name) for name in names]
+    missing = [name for name, result in zip(names, results) if result is None]
+    if not missing:
+        return [str(result) for result in results]
+
+    def flag(name: str, exc: Exception) -> None:
+        print(f"Skipping {name!r}: {exc}", file=sys.stderr)
+        return None
+
+    translated = bisect_batch(missing, lambda chunk: openai_post(client, model, chunk), flag)
+
+    fresh: dict[str, str | None] = {}
+    for name, name_ja in zip(missing, translated):
+        if name_ja is None:
+            fresh[name] = None
+            continue
+        name_ja = str(name_ja).strip()
+        if name_ja:
+            cache.put(name, name_ja)
+        fresh[name] = name_ja
+
+    return [result if result is not None else fresh[name] for name, result in zip(names, results)]
+
+
 def fetch_eng_cities(conn: sqlite3.Connection) -> list[tuple[str, str, str]]:
     cur = conn.execute('SELECT "NAME", "LONGITUDE", "LATITUDE" FROM CITIES_ENG')
     return [(row[0], row[1], row[2]) for row in cur.fetchall()]
 
 
-def fetch_existing_coords(conn: sqlite3.Connection) -> set[tuple[str, str]]:
-    cur = conn.execute('SELECT "LONGITUDE", "LATITUDE" FROM CITIES_JA')
-    return {(row[0], row[1]) for row in cur.fetchall()}
+def fetch_existing_coords(conn: sqlite3.Connection) -> list[tuple[float, float]]:
+    cur = conn.execute('SELECT "LATITUDE", "LONGITUDE" FROM CITIES_JA')
+    return [(float(row[0]), float(row[1])) for row in cur.fetchall()]
 
 
 def next_index(conn: sqlite3.Connection) -> int:
@@ -103,9 +127,22 @@ def main() -> int:
     parser.add_argument("--db", default=DB_DEFAULT)
     parser.add_argument("--env", default=ENV_DEFAULT, help="Path to .env file")
     parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY"))
+    parser.add_argument("--api-base", default=OPENAI_API_BASE, help="OpenAI-compatible API base URL")
     parser.add_argument("--model", default=MODEL_DEFAULT)
-    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--rpm", type=float, default=None, help="Requests per minute (default: from API headers)")
+    parser.add_argument("--tpm", type=float, default=None, help="Tokens per minute (default: from API headers)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Maximum names per request")
+    parser.add_argument("--token-budget", type=int, default=600, help="Estimated source tokens per request")
     parser.add_argument("--csv", default="scripts/cities_ja_translated.csv")
+    parser.add_argument(
+        "--dedupe-km",
+        type=float,
+        default=DEDUPE_KM_DEFAULT,
+        help="Skip cities within this distance of one already kept",
+    )
+    parser.add_argument("--cache", default=CACHE_DEFAULT, help="Translation cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse translations from earlier runs")
+    parser.add_argument("--cache-max-mb", type=float, default=None, help="Evict cache entries beyond this size")
     parser.add_argument(
         "--resume",
         action="store_true",
@@ -120,6 +157,10 @@ def main() -> int:
     if not args.api_key:
         raise SystemExit("Missing OPENAI_API_KEY or --api-key")
 
+    limiter = RateLimiter(args.rpm, args.tpm)
+    client = openai_client(args.api_key, args.api_base, limiter=limiter)
+    cache = open_cache(None if args.no_cache else args.cache, args.cache_max_mb)
+    scope = cache.scope(args.model, "English", "Japanese", PROMPT_VERSION)
     conn = sqlite3.connect(args.db)
     try:
         eng_rows = fetch_eng_cities(conn)
@@ -137,17 +178,21 @@ def main() -> int:
                     if name_en:
                         already_done.add(name_en.lower())
 
-        to_translate: list[tuple[str, str, str]] = []
+        candidates: list[tuple[str, str, str]] = []
         for name, lng, lat in eng_rows:
             if not name:
                 continue
             if name.strip().lower() == "tokyo":
                 continue
-            if (lng, lat) in existing_coords:
-                continue
             if name.strip().lower() in already_done:
                 continue
-            to_translate.append((name.strip(), lng, lat))
+            candidates.append((name.strip(), lng, lat))
+
+        points = existing_coords + [(float(lat), float(lng)) for _, lng, lat in candidates]
+        kept = dedupe(points, args.dedupe_km, keep=len(existing_coords))
+        to_translate = [candidates[i - len(existing_coords)] for i in kept if i >= len(existing_coords)]
+        if len(to_translate) < len(candidates):
+            print(f"Skipping {len(candidates) - len(to_translate)} cities within {args.dedupe_km} km of another.")
 
         if not to_translate:
             print("No cities to translate.")
@@ -161,21 +206,23 @@ def main() -> int:
             if f.tell() == 0:
                 writer.writerow(["INDEX", "NAME_JA", "LONGITUDE", "LATITUDE", "NAME_EN"])
 
-            batch_size = max(1, args.batch_size)
+            batches = pack_by_budget(
+                to_translate, lambda city: item_tokens(city[0]), args.token_budget, max(1, args.batch_size)
+            )
             idx = start_idx
-            for i in range(0, len(to_translate), batch_size):
-                batch = to_translate[i : i + batch_size]
+            skipped = 0
+            for batch in batches:
                 names = [b[0] for b in batch]
 
-                translated = openai_post(args.api_key, args.model, names)
-                if len(translated) != len(names):
-                    raise RuntimeError(
-                        f"Translation count mismatch. Expected {len(names)} got {len(translated)}"
-                    )
+                translated = translate_names(client, args.model, names, scope)
 
                 rows_to_insert = []
                 for (name_en, lng, lat), name_ja in zip(batch, translated):
-                    name_ja = str(name_ja).strip()
+                    if name_ja is None:
+                        # Left out of the CSV so a --resume run retries it.
+                        skipped += 1
+                        continue
+                    name_ja = name_ja.strip()
                     if not name_ja:
                         name_ja = name_en  # fallback
                     rows_to_insert.append((idx, name_ja, lng, lat))
@@ -186,15 +233,21 @@ def main() -> int:
                     'INSERT INTO CITIES_JA ("INDEX", "NAME", "LONGITUDE", "LATITUDE") VALUES (?, ?, ?, ?)',
                     rows_to_insert,
                 )
+                fill_geohashes(conn, "CITIES_JA")
+                refresh_cities(conn, "CITIES_JA")
                 conn.commit()
 
-                time.sleep(0.2)
-
         print(f"Inserted {idx - start_idx} cities into CITIES_JA.")
+        if skipped:
+            print(f"Skipped {skipped} cities that could not be translated; rerun with --resume to retry.")
         print(f"CSV: {args.csv}")
+        print(cache.stats())
+        print(limiter.stats())
         return 0
     finally:
         conn.close()
+        client.close()
+        cache.close()
 
 
 if __name__ == "__main__":
@@ -1,19 +1,28 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import itertools
 import json
 import os
 import re
 import sqlite3
 import sys
 import time
-import urllib.request
-from typing import Dict, Any, List, Set
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Any, Iterator, List, Set, Tuple, TypeVar
+
+from batching import pack_groups
+from http_client import OPENAI_API_BASE, HttpClient, openai_client
+from rate_limiter import RateLimiter
+from translation_cache import CACHE_DEFAULT, CacheScope, open_cache, text_hash
 
-API_URL = "https://api.openai.com/v1/chat/completions"
 ENV_DEFAULT = "scripts/.env"
 
 TRANSLATABLE_EXCLUDE = {"MOON_DATE_NUMBER"}
+# Bump whenever the system prompt changes so cached translations are not reused.
+PROMPT_VERSION = "moon-day-v2"
+TOKEN_BUDGET_DEFAULT = 4000
 
 
 def load_env_file(path: str) -> None:
@@ -52,7 +61,7 @@ def fetch_rows(conn: sqlite3.Connection, table: str, columns: List[str], limit:
     return result
 
 
-def call_openai(api_key: str, model: str, system: str, user: str, temperature: float = 0.2, max_retries: int = 3) -> str:
+def call_openai(client: HttpClient, model: str, system: str, user: str, temperature: float = 0.2) -> str:
     payload = {
         "model": model,
         "temperature": temperature,
@@ -62,27 +71,9 @@ def call_openai(api_key: str, model: str, system: str, user: str, temperature: f
         ],
     }
 
-    data = json.dumps(payload).encode("utf-8")
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}",
-    }
-
-    for attempt in range(1, max_retries + 1):
-        req = urllib.request.Request(API_URL, data=data, headers=headers, method="POST")
-        try:
-            with urllib.request.urlopen(req, timeout=120) as resp:
-                body = resp.read().decode("utf-8")
-                parsed = json.loads(body)
-                content = parsed["choices"][0]["message"]["content"]
-                return content
-        except Exception:
-            if attempt == max_retries:
-                raise
-            sleep_time = 2 * attempt
-            time.sleep(sleep_time)
-
-    raise RuntimeError("OpenAI request failed")
+    # Transient failures (429/5xx, dropped connections) are retried by the client.
+    parsed = client.post_json("/chat/completions", payload)
+    return parsed["choices"][0]["message"]["content"]
 
 
 def clean_json(text: str) -> str:
@@ -111,38 +102,157 @@ def extract_json(text: str) -> Dict[str, Any]:
         raise
 
 
-def translate_row(
-    api_key: str,
-    model: str,
-    row: Dict[str, Any],
-    columns: List[str],
-    source_lang: str,
-    target_lang: str,
-) -> Dict[str, Any]:
-    payload = {}
+Cell = Tuple[Tuple[str, str], str]
+
+
+class Manifest:
+    """Source-cell hashes and their translations, so --incremental only resends edited cells."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.cells: Dict[str, Dict[str, Dict[str, str]]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.cells = json.load(f).get("cells", {})
+
+    def __bool__(self) -> bool:
+        return bool(self.cells)
+
+    def lookup(self, day: str, col: str, text: str) -> str | None:
+        entry = self.cells.get(day, {}).get(col)
+        if entry and entry["source"] == text_hash(text):
+            return entry["translation"]
+        return None
+
+    def record(self, day: str, col: str, text: str, translation: str) -> None:
+        self.cells.setdefault(day, {})[col] = {"source": text_hash(text), "translation": translation}
+
+    def seed_from_csv(self, csv_path: str, rows: List[Dict[str, Any]], columns: List[str]) -> int:
+        """Adopt an existing CSV as the translation of the current source rows."""
+        sources = {str(row.get("MOON_DATE_NUMBER")): row for row in rows}
+        seeded = 0
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for translated in csv.DictReader(f):
+                day = str(translated.get("MOON_DATE_NUMBER"))
+                if day not in sources:
+                    continue
+                for col in columns:
+                    if col not in TRANSLATABLE_EXCLUDE and col in translated:
+                        self.record(day, col, sources[day].get(col) or "", translated[col])
+                seeded += 1
+        return seeded
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "cells": self.cells}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def split_cached(
+    row: Dict[str, Any], columns: List[str], cache: CacheScope, manifest: Manifest | None = None
+) -> Tuple[Dict[str, Any], List[Cell]]:
+    """Fill a translated row from the manifest or cache; return it with the ((day, column), text) cells still missing."""
+    day = str(row.get("MOON_DATE_NUMBER"))
+    translated: Dict[str, Any] = {"MOON_DATE_NUMBER": row.get("MOON_DATE_NUMBER")}
+    missing: List[Cell] = []
     for col in columns:
         if col in TRANSLATABLE_EXCLUDE:
-            payload[col] = row.get(col)
+            continue
+        text = row.get(col) or ""
+        cached = manifest.lookup(day, col, text) if manifest is not None else None
+        if cached is None:
+            cached = cache.get(text) if text else ""
+        if cached is None:
+            missing.append(((day, col), text))
         else:
-            payload[col] = row.get(col) or ""
+            translated[col] = cached
+    return translated, missing
+
+
+def translate_cells(
+    client: HttpClient,
+    model: str,
+    cells: List[Cell],
+    source_lang: str,
+    target_lang: str,
+    cache: CacheScope,
+) -> Dict[Tuple[str, str], Any]:
+    payload: Dict[str, Dict[str, str]] = {}
+    for (day, col), text in cells:
+        payload.setdefault(day, {})[col] = text
 
     system = (
         f"You are a professional translator. Translate from {source_lang} to {target_lang}. "
+        "The input is a JSON object keyed by moon day number; each value maps field names to text. "
         "Preserve meaning, tone, and line breaks. Do not add new fields. "
-        "Return ONLY valid JSON with the exact same keys."
+        "Return ONLY valid JSON with the exact same keys and nesting."
     )
     user = json.dumps(payload, ensure_ascii=False)
 
-    response = call_openai(api_key, model, system, user)
-    translated = extract_json(response)
+    response = call_openai(client, model, system, user)
+    result = extract_json(response)
+
+    translated: Dict[Tuple[str, str], Any] = {}
+    for (day, col), text in cells:
+        fields = result.get(day)
+        value = fields.get(col) if isinstance(fields, dict) else None
+        if value is None:
+            translated[(day, col)] = text
+            continue
+        translated[(day, col)] = value
+        if isinstance(value, str):
+            cache.put(text, value)
+    return translated
 
-    for col in columns:
-        if col not in translated:
-            translated[col] = payload[col]
 
-    translated["MOON_DATE_NUMBER"] = payload.get("MOON_DATE_NUMBER")
+T = TypeVar("T")
+R = TypeVar("R")
 
-    return translated
+
+def translate_in_order(
+    items: List[T],
+    translate: Callable[[T], R],
+    concurrency: int,
+    rate: float,
+) -> Iterator[R]:
+    """Yield translations in input order while up to `concurrency` requests run at once."""
+    if concurrency <= 1:
+        for item in items:
+            yield translate(item)
+            if rate > 0:
+                time.sleep(rate)
+        return
+
+    # Keep a window of in-flight requests larger than the pool so a slow head
+    # request does not leave workers idle while its successors wait to be written.
+    window = concurrency * 2
+    pending: Deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            for item in items:
+                pending.append(pool.submit(translate, item))
+                if rate > 0:
+                    time.sleep(rate)
+                while len(pending) >= window or (pending and pending[0].done()):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def record_row(manifest: Manifest, source: Dict[str, Any], translated: Dict[str, Any], columns: List[str]) -> None:
+    day = str(source.get("MOON_DATE_NUMBER"))
+    for col in columns:
+        if col in TRANSLATABLE_EXCLUDE:
+            continue
+        text = source.get(col) or ""
+        value = translated.get(col)
+        # A cell echoed back untranslated stays out so the next incremental run retries it.
+        if isinstance(value, str) and (value != text or not text):
+            manifest.record(day, col, text, value)
 
 
 def load_completed(csv_path: str) -> Set[str]:
@@ -160,12 +270,33 @@ def main() -> int:
     parser.add_argument("--out", required=True, help="Output CSV path")
     parser.add_argument("--model", default="gpt-4o-mini", help="OpenAI model")
     parser.add_argument("--env", default=ENV_DEFAULT, help="Path to .env file")
+    parser.add_argument("--api-base", default=OPENAI_API_BASE, help="OpenAI-compatible API base URL")
     parser.add_argument("--limit", type=int, default=None, help="Limit rows (for testing)")
-    parser.add_argument("--rate", type=float, default=0.2, help="Delay between requests (seconds)")
+    parser.add_argument("--rate", type=float, default=0, help="Extra delay between requests (seconds)")
+    parser.add_argument("--rpm", type=float, default=None, help="Requests per minute (default: from API headers)")
+    parser.add_argument("--tpm", type=float, default=None, help="Tokens per minute (default: from API headers)")
     parser.add_argument("--dry-run", action="store_true", help="Do not call API, only output headers")
     parser.add_argument("--resume", action="store_true", help="Resume from existing CSV")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-translate only cells whose source changed since the manifest was written, then rewrite the CSV",
+    )
+    parser.add_argument("--manifest", default=None, help="Source-hash manifest (default: next to --out)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of requests sent in parallel")
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=TOKEN_BUDGET_DEFAULT,
+        help="Estimated source tokens packed into one request",
+    )
+    parser.add_argument("--cache", default=CACHE_DEFAULT, help="Translation cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse translations from earlier runs")
+    parser.add_argument("--cache-max-mb", type=float, default=None, help="Evict cache entries beyond this size")
 
     args = parser.parse_args()
+    if args.resume and args.incremental:
+        parser.error("--resume and --incremental are mutually exclusive")
 
     load_env_file(args.env)
     api_key = os.environ.get("OPENAI_API_KEY")
@@ -187,23 +318,63 @@ def main() -> int:
         print(f"Dry run: wrote headers to {args.out}")
         return 0
 
+    limiter = RateLimiter(args.rpm, args.tpm)
+    client = openai_client(api_key, args.api_base, timeout=120, limiter=limiter)
+    cache = open_cache(None if args.no_cache else args.cache, args.cache_max_mb)
+    scope = cache.scope(args.model, "English", "Japanese", PROMPT_VERSION)
+    manifest = Manifest(args.manifest or f"{os.path.splitext(args.out)[0]}.manifest.json")
+    if args.incremental and not manifest and os.path.exists(args.out):
+        seeded = manifest.seed_from_csv(args.out, rows, columns)
+        print(f"No manifest yet: adopted {seeded} rows of {args.out} as translations of the current source")
     completed = load_completed(args.out) if args.resume else set()
     write_header = not os.path.exists(args.out) or not args.resume
+    # Incremental runs rewrite the whole CSV, so write aside and swap it in at the end.
+    out_path = f"{args.out}.tmp" if args.incremental else args.out
 
-    with open(args.out, "a" if args.resume else "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=columns)
-        if write_header:
-            writer.writeheader()
-        for idx, row in enumerate(rows, 1):
-            if args.resume and row.get("MOON_DATE_NUMBER") in completed:
-                continue
-            translated = translate_row(api_key, args.model, row, columns, "English", "Japanese")
-            writer.writerow(translated)
-            if args.rate > 0:
-                time.sleep(args.rate)
-            if idx % 5 == 0:
-                print(f"Translated {idx}/{len(rows)}")
-
+    try:
+        with open(out_path, "a" if args.resume else "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            if write_header:
+                writer.writeheader()
+            pending = [row for row in rows if not (args.resume and str(row.get("MOON_DATE_NUMBER")) in completed)]
+            skipped = len(rows) - len(pending)
+
+            partial: List[Dict[str, Any]] = []
+            groups: List[List[Cell]] = []
+            for row in pending:
+                translated, missing = split_cached(row, columns, scope, manifest if args.incremental else None)
+                partial.append(translated)
+                groups.append(missing)
+            batches = pack_groups(groups, args.token_budget)
+            print(f"{sum(len(g) for g in groups)} cells to translate in {len(batches)} requests")
+
+            def translate(batch: List[Cell]) -> Dict[Tuple[str, str], Any]:
+                return translate_cells(client, args.model, batch, "English", "Japanese", scope)
+
+            # Batches are packed in row order, so rows complete front to back and
+            # can be written as soon as every one of their cells is back; rows served
+            # entirely from the cache are flushed before the first request.
+            position = {str(row.get("MOON_DATE_NUMBER")): idx for idx, row in enumerate(pending)}
+            written = 0
+            translated_batches = translate_in_order(batches, translate, max(1, args.concurrency), args.rate)
+            for result in itertools.chain([{}], translated_batches):
+                for (day, col), value in result.items():
+                    partial[position[day]][col] = value
+                while written < len(partial) and all(col in partial[written] for col in columns):
+                    done = {col: partial[written].get(col) for col in columns}
+                    writer.writerow(done)
+                    f.flush()
+                    record_row(manifest, pending[written], done, columns)
+                    written += 1
+                    if (skipped + written) % 5 == 0:
+                        print(f"Translated {skipped + written}/{len(rows)}")
+        if args.incremental:
+            os.replace(out_path, args.out)
+    finally:
+        manifest.save()
+
+    print(cache.stats())
+    print(limiter.stats())
     print(f"Done. CSV saved to {args.out}")
     return 0
 
@@ -6,20 +6,33 @@
 
 Creates target tables if missing and overwrites existing rows.
 Outputs CSVs for review.
+
+Both tables are translated concurrently. Every finished batch is appended to
+a journal, so an interrupted run continues with --resume; the target tables
+are only replaced, in one transaction, once both are complete.
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
 import sqlite3
-import time
-import urllib.request
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from batching import BatchResponseError, bisect_batch, item_tokens, pack_by_budget
+from http_client import OPENAI_API_BASE, HttpClient, openai_client
+from rate_limiter import RateLimiter
+from translation_cache import CACHE_DEFAULT, CacheScope, TranslationCache, open_cache
 
 DB_DEFAULT = "assets/database/moon_calendar_translated_2.db"
 MODEL_DEFAULT = "gpt-4.1-mini"
 ENV_DEFAULT = "scripts/.env"
+JOURNAL_DEFAULT = "scripts/.zodiac_journal.jsonl"
+PROMPT_VERSION = "zodiac-v1"
 
 
 def load_env_file(path: str) -> None:
@@ -37,7 +50,7 @@ def load_env_file(path: str) -> None:
                 os.environ[key] = value
 
 
-def openai_post(api_key: str, model: str, source_lang: str, rows: list[dict]) -> list[dict]:
+def openai_post(client: HttpClient, model: str, source_lang: str, rows: list[dict]) -> list[dict]:
     system = (
         "You are a precise translator. Translate to Japanese. "
         "Return ONLY a JSON array of objects with keys: name, info. "
@@ -62,18 +75,7 @@ def openai_post(api_key: str, model: str, source_lang: str, rows: list[dict]) ->
         "temperature": 0.2,
     }
 
-    req = urllib.request.Request(
-        "https://api.openai.com/v1/responses",
-        data=json.dumps(payload).encode("utf-8"),
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-        method="POST",
-    )
-
-    with urllib.request.urlopen(req, timeout=60) as resp:
-        data = json.load(resp)
+    data = client.post_json("/responses", payload)
 
     text_chunks = []
     for item in data.get("output", []):
@@ -90,6 +92,43 @@ def openai_post(api_key: str, model: str, source_lang: str, rows: list[dict]) ->
     return json.loads(text[start : end + 1])
 
 
+def translate_batch(
+    client: HttpClient,
+    model: str,
+    source_table: str,
+    source_lang: str,
+    batch: list[dict],
+    cache: CacheScope,
+) -> list[dict]:
+    keys = [json.dumps({"name": r["name"], "info": r["info"]}, ensure_ascii=False, sort_keys=True) for r in batch]
+    cached = [cache.get(key) for key in keys]
+    missing = [(key, r) for key, r, hit in zip(keys, batch, cached) if hit is None]
+    if not missing:
+        return [json.loads(hit) for hit in cached]
+
+    def attempt(chunk: list[tuple[str, dict]]) -> list[dict]:
+        items = openai_post(client, model, source_lang, [r for _, r in chunk])
+        if not all(isinstance(item, dict) for item in items):
+            raise BatchResponseError(f"Expected objects with name/info for {source_table}")
+        return items
+
+    def flag(entry: tuple[str, dict], exc: Exception) -> dict:
+        # Falls back to the source text below and stays uncached, so a rerun retries it.
+        print(f"Could not translate {source_table} {entry[1]['zodiac']}: {exc}", file=sys.stderr)
+        return {}
+
+    translated = bisect_batch(missing, attempt, flag)
+
+    fresh = {}
+    for (key, _), tr in zip(missing, translated):
+        item = {"name": str(tr.get("name", "")).strip(), "info": str(tr.get("info", "")).strip()}
+        if item["name"] and item["info"]:
+            cache.put(key, json.dumps(item, ensure_ascii=False))
+        fresh[key] = item
+
+    return [json.loads(hit) if hit is not None else fresh[key] for key, hit in zip(keys, cached)]
+
+
 def ensure_table(conn: sqlite3.Connection, table: str) -> None:
     conn.execute(
         f'CREATE TABLE IF NOT EXISTS {table} ("ZODIAC" TEXT, "NAME" TEXT, "INFO" TEXT)'
@@ -110,7 +149,18 @@ def replace_table(conn: sqlite3.Connection, table: str, rows: list[dict]) -> Non
         f'INSERT INTO {table} ("ZODIAC", "NAME", "INFO") VALUES (?, ?, ?)',
         [(r["zodiac"], r["name"], r["info"]) for r in rows],
     )
-    conn.commit()
+
+
+def commit_tables(conn: sqlite3.Connection, tables: list[tuple[str, list[dict]]]) -> None:
+    conn.execute("BEGIN")
+    try:
+        for table, rows in tables:
+            ensure_table(conn, table)
+            replace_table(conn, table, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
 
 def write_csv(path: str, rows: list[dict], source_lang: str) -> None:
@@ -123,47 +173,102 @@ def write_csv(path: str, rows: list[dict], source_lang: str) -> None:
             writer.writerow([r["zodiac"], r["name_ja"], r["info_ja"], r["name_src"], r["info_src"]])
 
 
+def source_hash(row: dict) -> str:
+    raw = json.dumps([row["zodiac"], row["name"], row["info"]], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class Journal:
+    """Append-only log of translated batches, replayed by --resume after an interrupt."""
+
+    def __init__(self, path: str, resume: bool):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done: dict[tuple[str, str], dict] = {}
+        if resume and os.path.exists(path):
+            self._replay()
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _replay(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write; its batch is redone.
+                    continue
+                for row in entry["rows"]:
+                    self._done[(entry["table"], row["source"])] = row
+
+    def lookup(self, table: str, row: dict) -> dict | None:
+        return self._done.get((table, source_hash(row)))
+
+    def append(self, table: str, rows: list[dict]) -> None:
+        line = json.dumps({"table": table, "rows": rows}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            for row in rows:
+                self._done[(table, row["source"])] = row
+
+    def close(self, remove: bool = False) -> None:
+        self._file.close()
+        if remove:
+            os.remove(self.path)
+
+
 def translate_table(
-    conn: sqlite3.Connection,
-    api_key: str,
+    client: HttpClient,
     model: str,
     source_table: str,
     target_table: str,
     source_lang: str,
-    csv_path: str,
-    batch_size: int,
-) -> None:
-    ensure_table(conn, target_table)
-    source_rows = fetch_rows(conn, source_table)
-
-    translated_rows = []
-    for i in range(0, len(source_rows), batch_size):
-        batch = source_rows[i : i + batch_size]
-        translated = openai_post(api_key, model, source_lang, batch)
-        if len(translated) != len(batch):
-            raise RuntimeError(
-                f"Translation count mismatch for {source_table}. Expected {len(batch)} got {len(translated)}"
-            )
-
-        for src, tr in zip(batch, translated):
+    source_rows: list[dict],
+    token_budget: int,
+    batch_size: int | None,
+    cache: TranslationCache,
+    journal: Journal,
+) -> list[dict]:
+    scope = cache.scope(model, source_lang, "Japanese", PROMPT_VERSION)
+    results: dict[int, dict] = {}
+    todo = []
+    for idx, src in enumerate(source_rows):
+        done = journal.lookup(target_table, src)
+        if done is None:
+            todo.append((idx, src))
+        else:
+            results[idx] = done
+    if results:
+        print(f"{target_table}: {len(results)} rows replayed from journal")
+
+    batches = pack_by_budget(
+        todo, lambda item: item_tokens(item[1]["name"]) + item_tokens(item[1]["info"]), token_budget, batch_size
+    )
+    for batch in batches:
+        translated = translate_batch(client, model, source_table, source_lang, [src for _, src in batch], scope)
+
+        finished = []
+        for (idx, src), tr in zip(batch, translated):
             name_ja = str(tr.get("name", "")).strip() or src["name"]
             info_ja = str(tr.get("info", "")).strip() or src["info"]
-            translated_rows.append(
-                {
-                    "zodiac": src["zodiac"],
-                    "name": name_ja,
-                    "info": info_ja,
-                    "name_src": src["name"],
-                    "info_src": src["info"],
-                    "name_ja": name_ja,
-                    "info_ja": info_ja,
-                }
-            )
-
-        time.sleep(0.2)
-
-    replace_table(conn, target_table, translated_rows)
-    write_csv(csv_path, translated_rows, source_lang)
+            row = {
+                "source": source_hash(src),
+                "zodiac": src["zodiac"],
+                "name": name_ja,
+                "info": info_ja,
+                "name_src": src["name"],
+                "info_src": src["info"],
+                "name_ja": name_ja,
+                "info_ja": info_ja,
+            }
+            results[idx] = row
+            # Rows that fell back to source text stay out of the journal so a resume retries them.
+            if tr["name"] and tr["info"]:
+                finished.append(row)
+        journal.append(target_table, finished)
+
+    return [results[idx] for idx in range(len(source_rows))]
 
 
 def main() -> int:
@@ -171,8 +276,12 @@ def main() -> int:
     parser.add_argument("--db", default=DB_DEFAULT)
     parser.add_argument("--env", default=ENV_DEFAULT, help="Path to .env file")
     parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY"))
+    parser.add_argument("--api-base", default=OPENAI_API_BASE, help="OpenAI-compatible API base URL")
     parser.add_argument("--model", default=MODEL_DEFAULT)
-    parser.add_argument("--batch-size", type=int, default=6)
+    parser.add_argument("--rpm", type=float, default=None, help="Requests per minute (default: from API headers)")
+    parser.add_argument("--tpm", type=float, default=None, help="Tokens per minute (default: from API headers)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Maximum rows per request")
+    parser.add_argument("--token-budget", type=int, default=2500, help="Estimated source tokens per request")
     parser.add_argument(
         "--csv-info",
         default="scripts/zodiac_info_ja.csv",
@@ -183,6 +292,15 @@ def main() -> int:
         default="scripts/zodiac_garden_ja.csv",
         help="CSV output for ZODIAC_GARDEN",
     )
+    parser.add_argument("--cache", default=CACHE_DEFAULT, help="Translation cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse translations from earlier runs")
+    parser.add_argument("--cache-max-mb", type=float, default=None, help="Evict cache entries beyond this size")
+    parser.add_argument("--journal", default=JOURNAL_DEFAULT, help="Per-batch checkpoint journal")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Replay the journal of an interrupted run and skip its finished batches",
+    )
     args = parser.parse_args()
 
     load_env_file(args.env)
@@ -192,31 +310,50 @@ def main() -> int:
     if not args.api_key:
         raise SystemExit("Missing OPENAI_API_KEY or --api-key")
 
+    limiter = RateLimiter(args.rpm, args.tpm)
+    client = openai_client(args.api_key, args.api_base, limiter=limiter)
+    cache = open_cache(None if args.no_cache else args.cache, args.cache_max_mb)
+    jobs = [
+        ("ZODIAC_INFO_ENG", "ZODIAC_INFO_JA", "EN", args.csv_info),
+        ("ZODIAC_GARDEN_RU", "ZODIAC_GARDEN_JA", "RU", args.csv_garden),
+    ]
+    journal = Journal(args.journal, args.resume)
     conn = sqlite3.connect(args.db)
     try:
-        translate_table(
-            conn,
-            args.api_key,
-            args.model,
-            "ZODIAC_INFO_ENG",
-            "ZODIAC_INFO_JA",
-            "EN",
-            args.csv_info,
-            args.batch_size,
-        )
-        translate_table(
-            conn,
-            args.api_key,
-            args.model,
-            "ZODIAC_GARDEN_RU",
-            "ZODIAC_GARDEN_JA",
-            "RU",
-            args.csv_garden,
-            args.batch_size,
-        )
+        sources = {source_table: fetch_rows(conn, source_table) for source_table, _, _, _ in jobs}
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            futures = [
+                pool.submit(
+                    translate_table,
+                    client,
+                    args.model,
+                    source_table,
+                    target_table,
+                    source_lang,
+                    sources[source_table],
+                    args.token_budget,
+                    args.batch_size,
+                    cache,
+                    journal,
+                )
+                for source_table, target_table, source_lang, _ in jobs
+            ]
+            results = [future.result() for future in futures]
+
+        commit_tables(conn, [(target_table, rows) for (_, target_table, _, _), rows in zip(jobs, results)])
+        for (_, _, source_lang, csv_path), rows in zip(jobs, results):
+            write_csv(csv_path, rows, source_lang)
+        journal.close(remove=True)
+    except BaseException:
+        journal.close()
+        raise
     finally:
         conn.close()
+        client.close()
+        cache.close()
 
+    print(cache.stats())
+    print(limiter.stats())
     print("Done.")
     return 0
 
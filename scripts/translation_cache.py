@@ -0,0 +1,137 @@
+"""Persistent, content-addressed translation cache shared by the translate scripts.
+
+- Entries are keyed on model, source language, target language, prompt
+  version and a SHA-256 of the source text, so a prompt or model change never
+  reuses stale output.
+- The cache is a single SQLite file; least recently used entries are evicted
+  once the stored translations exceed ``max_bytes``. The running total is
+  read once at open and kept up to date, so a put never scans the table.
+- Hits only record their ``last_used`` time in memory; the times are written
+  every TOUCH_BATCH hits and with the next put or close, not committed per
+  lookup.
+- Hit/miss counters are kept per process and printed by the scripts at exit.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+CACHE_DEFAULT = "scripts/.translation_cache.sqlite"
+MAX_BYTES_DEFAULT = 64 * 1024 * 1024
+TOUCH_BATCH = 512
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    def __init__(self, path: str = CACHE_DEFAULT, max_bytes: int = MAX_BYTES_DEFAULT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "key TEXT PRIMARY KEY, model TEXT, source_lang TEXT, target_lang TEXT, "
+            "prompt_version TEXT, source_hash TEXT, translation TEXT, size INTEGER, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0]
+        self._touched: dict[str, float] = {}
+
+    @staticmethod
+    def make_key(model: str, source_lang: str, target_lang: str, prompt_version: str, source_hash: str) -> str:
+        raw = "\x1f".join([model, source_lang, target_lang, prompt_version, source_hash])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, source_lang: str, target_lang: str, prompt_version: str, text: str) -> str | None:
+        key = self.make_key(model, source_lang, target_lang, prompt_version, text_hash(text))
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+                self._conn.commit()
+            return row[0]
+
+    def put(
+        self, model: str, source_lang: str, target_lang: str, prompt_version: str, text: str, translation: str
+    ) -> None:
+        source_hash = text_hash(text)
+        key = self.make_key(model, source_lang, target_lang, prompt_version, source_hash)
+        size = len(translation.encode("utf-8"))
+        with self._lock:
+            self._flush_touched()
+            old = self._conn.execute("SELECT size FROM translations WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations "
+                "(key, model, source_lang, target_lang, prompt_version, source_hash, translation, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, source_lang, target_lang, prompt_version, source_hash, translation, size, time.time()),
+            )
+            self._total += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE translations SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self) -> None:
+        if self._total <= self.max_bytes:
+            return
+        cur = self._conn.execute("SELECT key, size FROM translations ORDER BY last_used ASC")
+        stale = []
+        for key, size in cur:
+            if self._total <= self.max_bytes:
+                break
+            stale.append((key,))
+            self._total -= size
+        self._conn.executemany("DELETE FROM translations WHERE key = ?", stale)
+
+    def scope(self, model: str, source_lang: str, target_lang: str, prompt_version: str) -> "CacheScope":
+        return CacheScope(self, model, source_lang, target_lang, prompt_version)
+
+    def stats(self) -> str:
+        return f"Cache {self.path}: {self.hits} hits, {self.misses} misses"
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+class CacheScope:
+    """A cache view bound to one model, language pair and prompt version."""
+
+    def __init__(self, cache: TranslationCache, model: str, source_lang: str, target_lang: str, prompt_version: str):
+        self.cache = cache
+        self.parts = (model, source_lang, target_lang, prompt_version)
+
+    def get(self, text: str) -> str | None:
+        return self.cache.get(*self.parts, text)
+
+    def put(self, text: str, translation: str) -> None:
+        self.cache.put(*self.parts, text, translation)
+
+
+def open_cache(path: str | None, max_mb: float | None = None) -> TranslationCache:
+    """Open the cache at `path`; `None` gives a per-run in-memory cache."""
+    max_bytes = int(max_mb * 1024 * 1024) if max_mb else MAX_BYTES_DEFAULT
+    return TranslationCache(path or ":memory:", max_bytes)
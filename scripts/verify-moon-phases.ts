@@ -0,0 +1,65 @@
+import fs from 'fs';
+import path from 'path';
+import lune from 'lune';
+import { lastIndexAtOrBefore } from '../src/domain/moon/lunar';
+
+// Float rounding between JS and Python math; a real mismatch is minutes.
+const TOLERANCE_MS = 1;
+
+const exportPath = process.argv[2] ?? path.resolve(__dirname, '../build/moon_phases.json');
+if (!fs.existsSync(exportPath)) {
+  console.error(`${exportPath} not found. Run: python scripts/moon_phases.py export --json ${exportPath}`);
+  process.exit(1);
+}
+const data = JSON.parse(fs.readFileSync(exportPath, 'utf-8')) as {
+  columns: string[];
+  rows: Array<[number, number, number, number, number, number]>;
+};
+
+let failures = 0;
+const report = (message: string) => {
+  if (failures < 20) {
+    console.error(message);
+  }
+  failures += 1;
+};
+
+// The lookup lunar.ts uses instead of phase_hunt: the last lunation whose mean new moon is <= date.
+const meanNew = data.rows.map((row) => row[1]);
+const tableNewMoon = (ms: number) => data.rows[lastIndexAtOrBefore(meanNew, ms)]?.[2];
+
+data.rows.slice(0, -1).forEach((row, index) => {
+  const [k, mean, newMoon, q1, full, q3] = row;
+  const next = data.rows[index + 1] as (typeof data.rows)[number];
+  const phases = lune.phase_hunt(new Date((mean + next[1]) / 2));
+  const expected: Array<[string, number, Date]> = [
+    ['new', newMoon, phases.new_date],
+    ['first quarter', q1, phases.q1_date],
+    ['full', full, phases.full_date],
+    ['last quarter', q3, phases.q3_date],
+    ['next new', next[2], phases.nextnew_date],
+  ];
+  for (const [name, stored, actual] of expected) {
+    if (Math.abs(stored - actual.valueOf()) > TOLERANCE_MS) {
+      report(`[K ${k}] ${name}: table ${stored}, lune ${actual.valueOf()}`);
+    }
+  }
+
+  if (index === 0) {
+    return;
+  }
+  for (const sample of [mean - 1000, mean + 1000, newMoon]) {
+    const fromLune = lune.phase_hunt(new Date(sample)).new_date.valueOf();
+    const fromTable = tableNewMoon(sample);
+    if (fromTable === undefined || Math.abs(fromTable - fromLune) > TOLERANCE_MS) {
+      report(`[K ${k}] phase_hunt(${sample}): table ${fromTable}, lune ${fromLune}`);
+    }
+  }
+});
+
+if (failures > 0) {
+  console.error(`\nMoon phase verification failed with ${failures} issue(s).`);
+  process.exit(1);
+}
+
+console.log(`All ${data.rows.length} lunations match lune.`);
@@ -0,0 +1,13 @@
+// Must match search_key in scripts/city_search.py: NFKC, lower case, no Latin/Cyrillic
+// diacritics, katakana as hiragana, single spaces.
+export const citySearchKey = (text: string) =>
+  text
+    .normalize('NFKC')
+    .toLowerCase()
+    .normalize('NFD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .normalize('NFC')
+    .replace(/[\u30a1-\u30f6]/g, (c) => String.fromCharCode(c.charCodeAt(0) - 0x60))
+    .trim()
+    .split(/\s+/)
+    .join(' ');
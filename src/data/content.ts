@@ -1,4 +1,7 @@
+import { citySearchKey } from './citySearch';
 import { executeSql } from './db';
+import type { MoonPhaseTable } from '../domain/moon/lunar';
+import type { MoonSignTable } from '../domain/zodiac/zodiac';
 
 export type AppLocale = 'en' | 'ru' | 'ja';
 
@@ -50,7 +53,7 @@ export const getCityByName = async (name: string, locale: AppLocale): Promise<Ci
 
   if (result.rows.length === 0) return null;
 
-  const row = result.rows.item(0) as { NAME: string; LATITUDE: string; LONGITUDE: string };
+  const row = result.rows.item(0) as { NAME: string; LATITUDE: number | string; LONGITUDE: number | string };
   return {
     name: row.NAME,
     latitude: Number(row.LATITUDE),
@@ -58,20 +61,19 @@ export const getCityByName = async (name: string, locale: AppLocale): Promise<Ci
   };
 };
 
-const getGardenZodiacInfo = async (zodiac: string, locale: AppLocale): Promise<string | null> => {
-  const tableName = locale === 'ja' ? 'ZODIAC_GARDEN_JA' : locale === 'ru' ? 'ZODIAC_GARDEN_RU' : null;
-  if (!tableName) return null;
+const gardenTableFor = (locale: AppLocale) => {
+  if (locale === 'ru') return 'ZODIAC_GARDEN_RU';
+  if (locale === 'ja') return 'ZODIAC_GARDEN_JA';
+  return null;
+};
 
-  const result = await runSql(
-    `select INFO from ${tableName} where ZODIAC = ? collate nocase limit 1`,
-    [zodiac]
-  );
+const MOON_DAY_COLUMNS =
+  'MOON_DATE_NUMBER, DAY_CHARACTERISTICS, INFLUENCE_ON_PERSONALITY, BUSINESS, HEALTH, HAIRCUT, RELATIONS, MARRIAGE, BIRTHDAY, RECOMMENDATIONS, WARNINGS, DREAMS, MANICURE, DIET, SHOPPING';
 
-  if (result.rows.length === 0) return null;
-
-  const row = result.rows.item(0) as { INFO: string };
-  return row.INFO;
-};
+// Appends the zodiac garden note to the day's garden text in the same statement,
+// matching the former `${garden ?? ''}\n\n${zodiacInfo}`.trim() done in JS.
+const GARDEN_WITH_ZODIAC =
+  "case when g.INFO <> '' then trim(coalesce(m.GARDEN, '') || char(10, 10) || g.INFO, char(9, 10, 13, 32)) else m.GARDEN end as GARDEN";
 
 export const getMoonDayInfo = async (
   dayNumber: number,
@@ -79,15 +81,18 @@ export const getMoonDayInfo = async (
   zodiac?: string
 ): Promise<MoonDayInfo | null> => {
   const tableName = tableFor('MOON_DAY_INFO', locale);
-  const result = await runSql(
-    `select MOON_DATE_NUMBER, DAY_CHARACTERISTICS, INFLUENCE_ON_PERSONALITY, BUSINESS, HEALTH, HAIRCUT, RELATIONS, MARRIAGE, BIRTHDAY, RECOMMENDATIONS, WARNINGS, DREAMS, MANICURE, DIET, SHOPPING, GARDEN from ${tableName} where CAST(MOON_DATE_NUMBER AS INTEGER) = ? limit 1`,
-    [dayNumber]
-  );
+  const gardenTable = zodiac ? gardenTableFor(locale) : null;
+  const result = gardenTable
+    ? await runSql(
+        `select ${MOON_DAY_COLUMNS}, ${GARDEN_WITH_ZODIAC} from ${tableName} m left join ${gardenTable} g on g.ZODIAC = ? collate nocase where MOON_DATE_NUMBER = ? limit 1`,
+        [zodiac as string, dayNumber]
+      )
+    : await runSql(`select ${MOON_DAY_COLUMNS}, GARDEN from ${tableName} where MOON_DATE_NUMBER = ? limit 1`, [dayNumber]);
 
   if (result.rows.length === 0) return null;
 
   const row = result.rows.item(0) as {
-    MOON_DATE_NUMBER: string;
+    MOON_DATE_NUMBER: number | string;
     DAY_CHARACTERISTICS?: string;
     INFLUENCE_ON_PERSONALITY?: string;
     BUSINESS?: string;
@@ -105,15 +110,6 @@ export const getMoonDayInfo = async (
     GARDEN?: string;
   };
 
-  let garden = row.GARDEN;
-
-  if ((locale === 'ru' || locale === 'ja') && zodiac) {
-    const zodiacInfo = await getGardenZodiacInfo(zodiac, locale);
-    if (zodiacInfo) {
-      garden = `${garden ?? ''}\n\n${zodiacInfo}`.trim();
-    }
-  }
-
   return {
     dayNumber: Number(row.MOON_DATE_NUMBER),
     dayCharacteristics: row.DAY_CHARACTERISTICS,
@@ -130,16 +126,14 @@ export const getMoonDayInfo = async (
     manicure: row.MANICURE,
     diet: row.DIET,
     shopping: row.SHOPPING,
-    garden,
+    garden: row.GARDEN,
   };
 };
 
-export const getAllCities = async (locale: AppLocale): Promise<City[]> => {
-  const tableName = tableFor('CITIES', locale);
-  const result = await runSql(`select NAME, LATITUDE, LONGITUDE from ${tableName} group by NAME order by NAME asc`);
+const rowsToCities = (rows: { length: number; item: (index: number) => any }): City[] => {
   const cities: City[] = [];
-  for (let i = 0; i < result.rows.length; i += 1) {
-    const row = result.rows.item(i) as { NAME: string; LATITUDE: string; LONGITUDE: string };
+  for (let i = 0; i < rows.length; i += 1) {
+    const row = rows.item(i) as { NAME: string; LATITUDE: number | string; LONGITUDE: number | string };
     cities.push({
       name: row.NAME,
       latitude: Number(row.LATITUDE),
@@ -149,6 +143,66 @@ export const getAllCities = async (locale: AppLocale): Promise<City[]> => {
   return cities;
 };
 
+// CITY_LIST is getAllCities' former `group by NAME order by NAME` result, stored pre-sorted by
+// scripts/city_search.py, so the picker reads one primary-key range instead of grouping the table.
+export const getAllCities = async (locale: AppLocale): Promise<City[]> => {
+  const result = await runSql('select NAME, LATITUDE, LONGITUDE from CITY_LIST where LOCALE = ? order by POSITION', [
+    locale,
+  ]);
+  return rowsToCities(result.rows);
+};
+
+export { citySearchKey };
+
+// Cities whose search key contains the query's key, in getAllCities order. CITY_SEARCH stores
+// every suffix of each key, so "contains" is a prefix range on its primary key.
+export const searchCities = async (query: string, locale: AppLocale): Promise<City[]> => {
+  const key = citySearchKey(query);
+  if (!key) return getAllCities(locale);
+  const result = await runSql(
+    'select NAME, LATITUDE, LONGITUDE from CITY_LIST where LOCALE = ? and POSITION in ' +
+      '(select POSITION from CITY_SEARCH where LOCALE = ? and KEY >= ? and KEY < ?) order by POSITION',
+    [locale, locale, key, `${key}\u{10FFFF}`]
+  );
+  return rowsToCities(result.rows);
+};
+
+// RANGE_SQL in scripts/moon_phases.py: the lunations from the one in effect at `from` through the
+// first one starting after `to`, for calcMoonDays/calcMoonMonth (see moonPhaseRange).
+export const getMoonPhases = async (from: number, to: number): Promise<MoonPhaseTable> => {
+  const result = await runSql(
+    'select MEAN_NEW, NEW from MOON_PHASES where ' +
+      'MEAN_NEW >= coalesce((select max(MEAN_NEW) from MOON_PHASES where MEAN_NEW <= ?), ?) and ' +
+      'MEAN_NEW <= coalesce((select min(MEAN_NEW) from MOON_PHASES where MEAN_NEW > ?), ?) order by MEAN_NEW',
+    [from, from, to, to]
+  );
+  const phases: MoonPhaseTable = { meanNew: [], newMoon: [] };
+  for (let i = 0; i < result.rows.length; i += 1) {
+    const row = result.rows.item(i) as { MEAN_NEW: number; NEW: number };
+    phases.meanNew.push(Number(row.MEAN_NEW));
+    phases.newMoon.push(Number(row.NEW));
+  }
+  return phases;
+};
+
+// RANGE_SQL in scripts/moon_signs.py: the ingresses from the one in effect at `from` through the
+// first one after `to`, for calcMoonZodiac (see moonSignRange).
+export const getMoonSigns = async (from: number, to: number): Promise<MoonSignTable> => {
+  const result = await runSql(
+    'select START, SIGN from MOON_SIGNS where ' +
+      'START >= coalesce((select max(START) from MOON_SIGNS where START <= ?), ?) and ' +
+      'START <= coalesce((select min(START) from MOON_SIGNS where START > ?), ?) order by START',
+    [from, from, to, to]
+  );
+  const signs: MoonSignTable = { starts: [], signs: [] };
+  for (let i = 0; i < result.rows.length; i += 1) {
+    const row = result.rows.item(i) as { START: number; SIGN: number };
+    signs.starts.push(Number(row.START));
+    signs.signs.push(Number(row.SIGN));
+  }
+  return signs;
+};
+
 export const getZodiacInfo = async (zodiac: string, locale: AppLocale): Promise<ZodiacInfo | null> => {
   const tableName = tableFor('ZODIAC_INFO', locale);
   const result = await runSql(
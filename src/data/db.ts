@@ -23,6 +23,10 @@ const REQUIRED_TABLES = [
   'ZODIAC_INFO_ENG',
   'ZODIAC_INFO_RU',
   'ZODIAC_INFO_JA',
+  'CITY_LIST',
+  'CITY_SEARCH',
+  'MOON_PHASES',
+  'MOON_SIGNS',
 ];
 
 const copyDbAsset = async () => {
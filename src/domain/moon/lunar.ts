@@ -15,6 +15,40 @@ type LunarDayInternal = {
   end: Moment;
 };
 
+// Rows of MOON_PHASES (see getMoonPhases): each lunation's mean new moon and true new moon, in ms.
+export type MoonPhaseTable = {
+  meanNew: number[];
+  newMoon: number[];
+};
+
+// Index of the last element <= value in an ascending array, or -1.
+export const lastIndexAtOrBefore = (sorted: number[], value: number) => {
+  let lo = 0;
+  let hi = sorted.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if ((sorted[mid] as number) <= value) {
+      lo = mid + 1;
+    } else {
+      hi = mid;
+    }
+  }
+  return lo - 1;
+};
+
+// lune.phase_hunt(date).new_date: the true new moon of the last lunation whose mean new moon is not
+// after `date`. The table only answers when the following lunation is loaded too; otherwise a later
+// lunation could already have started, so lune is asked instead.
+const phaseHuntNew = (date: Date, phases?: MoonPhaseTable) => {
+  if (phases) {
+    const index = lastIndexAtOrBefore(phases.meanNew, date.getTime());
+    if (index >= 0 && index < phases.meanNew.length - 1) {
+      return new Date(phases.newMoon[index] as number);
+    }
+  }
+  return lune.phase_hunt(date).new_date;
+};
+
 const isDayBetween = (start: Moment, end: Moment, day: Moment | Date | string) => {
   const dayMoment = moment(day);
   return (
@@ -29,17 +63,17 @@ const daysRange = (startDate: Moment, numberOfDays: number) => {
   );
 };
 
-const recentNewMoon = (date: Moment | Date) => {
+const recentNewMoon = (date: Moment | Date, phases?: MoonPhaseTable) => {
   let endOfDate = moment(date).endOf('day').toDate();
   let startOfDate = moment(date).startOf('day').toDate();
 
-  let recentPhases = lune.phase_hunt(endOfDate);
+  let newDate = phaseHuntNew(endOfDate, phases);
 
-  if (recentPhases.new_date > endOfDate) {
-    recentPhases = lune.phase_hunt(startOfDate);
+  if (newDate > endOfDate) {
+    newDate = phaseHuntNew(startOfDate, phases);
   }
 
-  return moment(recentPhases.new_date);
+  return moment(newDate);
 };
 
 const daysBetween = (start: Moment, end: Moment | Date) => {
@@ -134,13 +168,13 @@ const getFormattedDays = (res: LunarDayInternal[]) => {
   }));
 };
 
-const getPrevlunarDaysInternal = (date: Moment, latitude: number, longitude: number) => {
+const getPrevlunarDaysInternal = (date: Moment, latitude: number, longitude: number, phases?: MoonPhaseTable) => {
   const prevDate = moment(date).add(-1, 'd').toDate();
-  return getLunarDaysInternal(prevDate, latitude, longitude);
+  return getLunarDaysInternal(prevDate, latitude, longitude, phases);
 };
 
-const getLunarDaysInternal = (date: Moment | Date, latitude: number, longitude: number) => {
-  const newMoon = recentNewMoon(date);
+const getLunarDaysInternal = (date: Moment | Date, latitude: number, longitude: number, phases?: MoonPhaseTable) => {
+  const newMoon = recentNewMoon(date, phases);
   const diffDays = daysBetween(newMoon, date);
   const initDate = moment(newMoon).startOf('day');
 
@@ -176,12 +210,12 @@ const getAllDaysInMonth = (month: number, year: number) =>
     .map((_, i) => new Date(year, month - 1, i + 1))
     .filter((v) => v.getMonth() === month - 1);
 
-const lunarDays = (date: any, latitude: number, longitude: number, timezone: string) => {
+const lunarDays = (date: any, latitude: number, longitude: number, timezone: string, phases?: MoonPhaseTable) => {
   const tzDate = typeof date === 'string'
     ? moment.tz(date, 'DD-MM-YYYY', timezone)
     : moment.tz(date, timezone);
-  const res = getLunarDaysInternal(tzDate, latitude, longitude);
-  const resPrev = getPrevlunarDaysInternal(tzDate, latitude, longitude);
+  const res = getLunarDaysInternal(tzDate, latitude, longitude, phases);
+  const resPrev = getPrevlunarDaysInternal(tzDate, latitude, longitude, phases);
   return getFormattedDays(getMissingDays(res, resPrev, tzDate));
 };
 
@@ -190,13 +224,14 @@ const allLunarDaysInMonth = (
   currentYear: number,
   latitude: number,
   longitude: number,
-  timezone: string
+  timezone: string,
+  phases?: MoonPhaseTable
 ) => {
   const allMonthDates = getAllDaysInMonth(currentMonth, currentYear);
   const lunarDates: LunarDay[][] = [];
 
   for (const date of allMonthDates) {
-    lunarDates.push(lunarDays(date, latitude, longitude, timezone));
+    lunarDates.push(lunarDays(date, latitude, longitude, timezone, phases));
   }
 
   return lunarDates;
@@ -209,20 +244,40 @@ export const lunarDaysForDayOrMonth = (
   latitude: number,
   longitude: number,
   timezone: string,
-  isMonth: boolean
+  isMonth: boolean,
+  phases?: MoonPhaseTable
 ): LunarDay[] | LunarDay[][] => {
   if (isMonth) {
-    return allLunarDaysInMonth(month, year, latitude, longitude, timezone);
+    return allLunarDaysInMonth(month, year, latitude, longitude, timezone, phases);
   }
-  return lunarDays(date, latitude, longitude, timezone);
+  return lunarDays(date, latitude, longitude, timezone, phases);
+};
+
+// Covers every instant calcMoonDays/calcMoonMonth look up a new moon for (they also read the
+// previous day, and month days are built in device time), with slack for the time zone offset.
+// Pass it to getMoonPhases and the result back in as `phases`; lookups outside it fall back to lune.
+export const moonPhaseRange = (date: Date, tz: string, isMonth: boolean) => {
+  const unit = isMonth ? 'month' : 'day';
+  // calcMoonMonth takes the month from the device clock (date.getMonth()), calcMoonDays the day in `tz`.
+  const base = isMonth ? moment(date) : moment(date).tz(tz);
+  return {
+    from: base.clone().startOf(unit).subtract(3, 'days').valueOf(),
+    to: base.clone().endOf(unit).add(2, 'days').valueOf(),
+  };
 };
 
-export const calcMoonDays = (date: Date, lat: number, lon: number, tz: string): LunarDay[] => {
+export const calcMoonDays = (date: Date, lat: number, lon: number, tz: string, phases?: MoonPhaseTable): LunarDay[] => {
   const day = moment(date).tz(tz).format('DD-MM-YYYY');
-  return lunarDaysForDayOrMonth(day, date.getMonth() + 1, date.getFullYear(), lat, lon, tz, false) as LunarDay[];
+  return lunarDaysForDayOrMonth(day, date.getMonth() + 1, date.getFullYear(), lat, lon, tz, false, phases) as LunarDay[];
 };
 
-export const calcMoonMonth = (date: Date, lat: number, lon: number, tz: string): LunarDay[][] => {
+export const calcMoonMonth = (
+  date: Date,
+  lat: number,
+  lon: number,
+  tz: string,
+  phases?: MoonPhaseTable
+): LunarDay[][] => {
   const day = moment(date).tz(tz).format('DD-MM-YYYY');
-  return lunarDaysForDayOrMonth(day, date.getMonth() + 1, date.getFullYear(), lat, lon, tz, true) as LunarDay[][];
+  return lunarDaysForDayOrMonth(day, date.getMonth() + 1, date.getFullYear(), lat, lon, tz, true, phases) as LunarDay[][];
 };
@@ -1,4 +1,4 @@
-import { LunarDay } from '../moon/lunar';
+import { lastIndexAtOrBefore, LunarDay } from '../moon/lunar';
 
 const SunCalc = {
   J2000: 2451545,
@@ -23,6 +23,12 @@ export const zodiacOrder = [
 
 export type Zodiac = (typeof zodiacOrder)[number];
 
+// Rows of MOON_SIGNS (see getMoonSigns): each ingress instant in ms and the zodiacOrder index it starts.
+export type MoonSignTable = {
+  starts: number[];
+  signs: number[];
+};
+
 const dateToJulianDate = (date: Date) => {
   const julianEpoch = new Date(Date.UTC(-4713, 10, 24, 12, 0, 0));
   return (date.getTime() - julianEpoch.getTime()) / (1000 * 60 * 60 * 24);
@@ -31,13 +37,29 @@ const dateToJulianDate = (date: Date) => {
 const mod = (a: number, b: number) => a - Math.floor(a / b) * b;
 const mod2Pi = (x: number) => mod(x, 2 * Math.PI);
 
-export const calcMoonZodiac = (moonDays: LunarDay[], moonDayIndex?: number): Zodiac => {
+// The instants calcMoonZodiac reads for these lunar days; pass them to getMoonSigns.
+export const moonSignRange = (moonDays: LunarDay[]) => {
+  const ends = moonDays.map((day) => day.end);
+  if (ends.length === 0) return { from: 0, to: 0 };
+  return { from: Math.min(...ends), to: Math.max(...ends) };
+};
+
+export const calcMoonZodiac = (moonDays: LunarDay[], moonDayIndex?: number, signs?: MoonSignTable): Zodiac => {
   let moonDay = moonDays[0];
   if (moonDayIndex != null) {
     const found = moonDays.find((item) => item.number === moonDayIndex);
     if (found) moonDay = found;
   }
 
+  // MOON_SIGNS holds the exact ingresses of the series below. A row is only trusted when the next
+  // ingress is loaded too; otherwise the Moon may already be in the next sign.
+  if (signs) {
+    const index = lastIndexAtOrBefore(signs.starts, moonDay.end);
+    if (index >= 0 && index < signs.starts.length - 1) {
+      return zodiacOrder[signs.signs[index] as number] as Zodiac;
+    }
+  }
+
   const date = new Date(moonDay.end);
   const julianDate = dateToJulianDate(date);
   const d = julianDate - 2447891.5;
@@ -0,0 +1,43 @@
+import assert from 'assert';
+import { citySearchKey } from '../src/data/citySearch';
+
+// Expected keys are search_key's output in scripts/city_search.py, which builds CITY_SEARCH;
+// a mismatch means the picker would miss cities the table does contain.
+const cases: Array<[string, string]> = [
+  // NFKC: full-width Latin, ideographic space, compatibility characters
+  ['ＴＯＫＹＯ', 'tokyo'],
+  ['Ｎｅｗ　Ｙｏｒｋ', 'new york'],
+  ['①', '1'],
+  ['ﬁ', 'fi'],
+  // Half-width katakana, including a voiced mark
+  ['ｱﾃﾈ', 'あてね'],
+  ['ｶﾞﾝﾏ', 'がんま'],
+  // Katakana to hiragana; hiragana and kanji unchanged
+  ['トウキョウ', 'とうきょう'],
+  ['ヴェネツィア', 'ゔぇねつぃあ'],
+  ['とうきょう', 'とうきょう'],
+  ['東京', '東京'],
+  // Diacritics: combining marks go, letters that are not decomposable stay
+  ['Zürich', 'zurich'],
+  ['Kraków', 'krakow'],
+  ['São Paulo', 'sao paulo'],
+  ['İstanbul', 'istanbul'],
+  ['ΑΘΉΝΑ', 'αθηνα'],
+  ['Ærøskøbing', 'ærøskøbing'],
+  ['Москва', 'москва'],
+  ['Ёлки', 'елки'],
+  ['Йошкар-Ола', 'иошкар-ола'],
+  // Whitespace
+  ['  New   York  ', 'new york'],
+  ['', ''],
+];
+
+for (const [input, expected] of cases) {
+  assert.strictEqual(citySearchKey(input), expected, `citySearchKey(${JSON.stringify(input)})`);
+}
+
+// A query typed in one form finds a name stored in another.
+assert.ok(citySearchKey('Athènes (アテネ)').includes(citySearchKey('ｱﾃﾈ')));
+assert.ok(citySearchKey('Zürich').startsWith(citySearchKey('ZUR')));
+
+console.log('citySearch tests passed');
@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import translate_zodiac_tables as tz  # noqa: E402
+from batching import BatchResponseError  # noqa: E402
+from translation_cache import open_cache  # noqa: E402
+
+ROWS = [
+    {"zodiac": "1", "name": "Aries", "info": "Fire sign"},
+    {"zodiac": "5", "name": "Leo", "info": "Bad row"},
+    {"zodiac": "9", "name": "Sagittarius", "info": "Archer"},
+]
+
+
+def fake_post(client, model, source_lang, rows):
+    if any(row["name"] == "Leo" for row in rows):
+        raise BatchResponseError("unparseable response")
+    return [{"name": f"ja-{row['name']}", "info": f"ja-{row['info']}"} for row in rows]
+
+
+def test_failed_item_is_not_journaled():
+    original = tz.openai_post
+    tz.openai_post = fake_post
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "journal.jsonl")
+            journal = tz.Journal(path, resume=False)
+            cache = open_cache(None)
+            try:
+                rows = tz.translate_table(
+                    None, "model", "ZODIAC_INFO_ENG", "ZODIAC_INFO_JA", "English", ROWS, 2500, None, cache, journal
+                )
+            finally:
+                journal.close()
+                cache.close()
+
+            # The failed row falls back to its source text but is not journaled.
+            assert [row["name"] for row in rows] == ["ja-Aries", "Leo", "ja-Sagittarius"]
+            with open(path, "r", encoding="utf-8") as f:
+                journaled = [row["zodiac"] for line in f for row in json.loads(line)["rows"]]
+            assert journaled == ["1", "9"]
+
+            resumed = tz.Journal(path, resume=True)
+            try:
+                assert resumed.lookup("ZODIAC_INFO_JA", ROWS[0]) is not None
+                assert resumed.lookup("ZODIAC_INFO_JA", ROWS[1]) is None
+            finally:
+                resumed.close()
+    finally:
+        tz.openai_post = original
+
+
+if __name__ == "__main__":
+    test_failed_item_is_not_journaled()
+    print("ok")
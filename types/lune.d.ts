@@ -1,3 +1,9 @@
 declare module 'lune' {
-  export function phase_hunt(date: Date): { new_date: Date };
+  export function phase_hunt(date: Date): {
+    new_date: Date;
+    q1_date: Date;
+    full_date: Date;
+    q3_date: Date;
+    nextnew_date: Date;
+  };
 }